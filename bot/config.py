@@ -3,8 +3,8 @@ from dataclasses import dataclass
 from os import getenv
 from dotenv import load_dotenv
 import logging
-from datetime import datetime
 from pathlib import Path
+from bot.utils import schedule_calendar
 
 def setup_logging():
     logging.basicConfig(
@@ -69,35 +69,11 @@ def format_date(date):
     try:
         # Если передана строка, преобразуем её в datetime
         if isinstance(date, str):
-            try:
-                # Пробуем формат '26-нояб' или '26-ноябрь'
-                if '-' in date:
-                    day, month = date.split('-')
-                    month_lower = month.lower()
-                    
-                    # Пробуем найти месяц в словаре (полное название или сокращение)
-                    month_num = MONTHS.get(month_lower)
-                    
-                    # Если не нашли, пробуем использовать первые 3 буквы
-                    if not month_num and len(month_lower) > 3:
-                        month_short = month_lower[:3]
-                        month_num = MONTHS.get(month_short)
-                        if month_num:
-                            logger.info(f"Использую сокращение месяца: {month} -> {month_short}")
-                    
-                    if month_num:
-                        date = datetime(datetime.now().year, month_num, int(day))
-                    else:
-                        logger.error(f"Месяц '{month}' не найден в словаре MONTHS")
-                        return date
-                else:
-                    try:
-                        date = datetime.strptime(date, '%Y-%m-%d')
-                    except ValueError:
-                        date = datetime.strptime(date, '%d.%m.%Y')
-            except ValueError as e:
-                logger.error(f"Не удалось распарсить дату: {date}, ошибка: {e}")
+            parsed = schedule_calendar.to_datetime(date)
+            if parsed is None:
+                logger.error(f"Не удалось распарсить дату: {date}")
                 return date
+            date = parsed
 
         # Теперь у нас точно datetime объект
         return f"{date.day} {MONTHS_FULL[date.month]} {date.year}"
@@ -130,6 +106,25 @@ class Config:
     
     # Список всех ID администраторов
     ADMIN_IDS: list = None
+
+    # Движок парсинга расписания: auto (HTTP с откатом на Selenium), http или selenium
+    PARSER_ENGINE: str = getenv("PARSER_ENGINE", "auto").strip().lower()
+    # Режим Selenium: datatables (все строки одним вызовом API DataTables) или paging (переключение страниц)
+    SELENIUM_MODE: str = getenv("SELENIUM_MODE", "datatables").strip().lower()
+
+    # Пул драйверов Chrome: пересоздание драйвера после N использований или превышения памяти (МБ)
+    CHROME_MAX_USES: int = int(getenv("CHROME_MAX_USES", 20))
+    CHROME_MAX_RSS_MB: int = int(getenv("CHROME_MAX_RSS_MB", 700))
+
+    # Резервное копирование БД: интервал (мин) и сколько копий хранить за часы, дни и недели
+    BACKUP_INTERVAL_MINUTES: int = int(getenv("BACKUP_INTERVAL_MINUTES", 60))
+    BACKUP_KEEP_HOURLY: int = int(getenv("BACKUP_KEEP_HOURLY", 24))
+    BACKUP_KEEP_DAILY: int = int(getenv("BACKUP_KEEP_DAILY", 7))
+    BACKUP_KEEP_WEEKLY: int = int(getenv("BACKUP_KEEP_WEEKLY", 4))
+
+    # Обслуживание БД в тихие часы: длительность прохода (сек) и период полной проверки целостности (дни)
+    MAINTENANCE_TIME_BUDGET: int = int(getenv("MAINTENANCE_TIME_BUDGET", 60))
+    INTEGRITY_CHECK_DAYS: int = int(getenv("INTEGRITY_CHECK_DAYS", 7))
     
     def __post_init__(self):
         if not self.BOT_TOKEN:
@@ -1,4 +1,24 @@
-from .sqlite_db2 import db
-from .db_adapter import db_adapter
+"""
+Экземпляры БД создаются при первом обращении к bot.database.db, async_db или db_adapter.
+Импорт модулей пакета (например, bot.database.sqlite_db2 в тестах) рабочую базу не открывает.
+"""
 
-__all__ = ['db', 'db_adapter'] 
\ No newline at end of file
+import importlib
+
+# Имя в пакете -> (модуль, атрибут модуля)
+_INSTANCES = {
+    'db': ('.async_db', 'sqlite_db'),
+    'async_db': ('.async_db', 'async_db'),
+    'db_adapter': ('.db_adapter', 'db_adapter'),
+}
+
+__all__ = ['db', 'async_db', 'db_adapter']
+
+
+def __getattr__(name):
+    if name not in _INSTANCES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _INSTANCES[name]
+    value = getattr(importlib.import_module(module_name, __name__), attribute)
+    globals()[name] = value
+    return value
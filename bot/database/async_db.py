@@ -0,0 +1,118 @@
+"""
+Copyright (c) 2023-2024 Gargun Daniil
+Telegram: @Daniilgargun (https://t.me/Daniilgargun)
+Contact ID: 1437368782
+All rights reserved.
+
+Несанкционированное использование, копирование или распространение
+данного программного обеспечения запрещено.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .sqlite_db2 import SQLiteDatabase, READ_POOL_SIZE
+
+# Экземпляр рабочей базы создается при первом импорте async_db (см. bot/database/__init__.py)
+sqlite_db = SQLiteDatabase.get_instance()
+
+logger = logging.getLogger(__name__)
+
+# Чтения, которые при загруженной структуре в памяти выполняются сразу, без потока БД:
+# метод SQLiteDatabase -> атрибут со снимком расписания или справочником пользователей
+MEMORY_READS = {
+    **dict.fromkeys((
+        'get_schedule_by_group', 'get_schedule_by_teacher', 'has_schedule',
+        'get_full_schedule', 'get_schedule_dates'
+    ), 'schedule_store'),
+    **dict.fromkeys(('select_user_ids', 'count_users'), 'user_directory')
+}
+
+
+class AsyncDatabase:
+    """
+    Асинхронный доступ к SQLiteDatabase.
+
+    Синхронные методы выполняются в выделенных потоках БД, event loop только ждет
+    результат. Повторы при блокировке БД делаются через asyncio.sleep, поэтому
+    заблокированная запись не останавливает обработку остальных сообщений.
+    """
+
+    def __init__(self, db, max_workers: int = READ_POOL_SIZE, max_retries: int = 5, base_delay: float = 0.1):
+        self.db = db
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        # В потоках БД синхронные повторы с time.sleep отключены
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="sqlite",
+            initializer=db.disable_sync_retries
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнение синхронной функции БД в потоке БД с неблокирующими повторами"""
+        loop = asyncio.get_running_loop()
+        retry_count = 0
+
+        while True:
+            try:
+                return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+            except sqlite3.OperationalError as e:
+                if "database is locked" in str(e).lower() and retry_count < self.max_retries:
+                    retry_count += 1
+                    delay = self.base_delay * (2 ** retry_count)  # Экспоненциальная задержка
+                    logger.warning(
+                        f"База данных заблокирована, повторная попытка {retry_count}/{self.max_retries} "
+                        f"через {delay:.2f} сек"
+                    )
+                    await asyncio.sleep(delay)
+                else:
+                    raise
+
+    async def iter_user_pages(self, batch_size: int = 500, columns=None, **filters):
+        """
+        Асинхронный обход пользователей страницами по user_id (keyset).
+        Каждая страница читается отдельным запросом в потоке БД, между страницами
+        соединения и блокировки не удерживаются
+        """
+        after_id = 0
+        while True:
+            page = await self.run(self.db.get_users_page, after_id, batch_size, columns, **filters)
+            if page:
+                yield page
+            if len(page) < batch_size:
+                break
+            after_id = page[-1]['user_id']
+
+    async def iter_users(self, batch_size: int = 500, columns=None, **filters):
+        """Обход пользователей по одному: async for user in async_db.iter_users(...)"""
+        async for page in self.iter_user_pages(batch_size, columns, **filters):
+            for user in page:
+                yield user
+
+    def __getattr__(self, name):
+        """Асинхронная обертка для любого метода SQLiteDatabase: await async_db.get_user(user_id)"""
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        async def wrapper(*args, **kwargs):
+            memory = MEMORY_READS.get(name)
+            if memory and getattr(self.db, memory) is not None:
+                # Ответ из памяти занимает микросекунды - переход в поток стоит дороже
+                return attr(*args, **kwargs)
+            return await self.run(attr, *args, **kwargs)
+
+        wrapper.__name__ = name
+        return wrapper
+
+    def shutdown(self):
+        """Остановка потоков БД"""
+        self._executor.shutdown(wait=True)
+
+
+# Создание асинхронного слоя для базы данных
+async_db = AsyncDatabase(sqlite_db)
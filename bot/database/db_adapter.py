@@ -10,8 +10,9 @@ All rights reserved.
 
 import logging
 import asyncio
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Sequence
 from bot.database import db as sqlite_db
+from bot.database.async_db import async_db
 from bot.config import logger
 from datetime import datetime
 
@@ -32,26 +33,15 @@ class DatabaseAdapter:
         if not self._initialized:
             logger.info("Начало инициализации адаптера базы данных")
             self.db = sqlite_db
+            # Асинхронный доступ: запросы выполняются в потоках БД, а не в event loop
+            self.async_db = async_db
             self._initialize_copyright_protection()
-            self._initialize_tables()
             self._initialized = True
             logger.info("Адаптер базы данных успешно инициализирован")
             
     def _initialize_copyright_protection(self):
         """Скрытая функция для защиты авторских прав"""
         try:
-            # Создаем таблицу для защиты авторских прав, если ее нет
-            query = """
-            CREATE TABLE IF NOT EXISTS copyright_info (
-                id INTEGER PRIMARY KEY,
-                author TEXT NOT NULL,
-                launch_time TEXT NOT NULL,
-                env_info TEXT NOT NULL,
-                instance_id TEXT NOT NULL
-            )
-            """
-            self.db.execute_query(query)
-            
             # Добавляем запись о запуске
             import os
             import uuid
@@ -88,35 +78,17 @@ class DatabaseAdapter:
             # Скрываем любые ошибки, чтобы не прерывать работу бота
             logger.debug(f"Copyright protection initialization: {str(e)}")
 
-    def _initialize_tables(self):
-        """Инициализация необходимых таблиц"""
-        try:
-            # Создаем таблицу для хранения графика учебного процесса
-            query = """
-            CREATE TABLE IF NOT EXISTS schedule_photos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                photo_id TEXT NOT NULL,
-                file_id TEXT NOT NULL,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1
-            )
-            """
-            self.db.execute_query(query)
-            logger.info("Таблица schedule_photos успешно инициализирована")
-        except Exception as e:
-            logger.error(f"Ошибка при инициализации таблиц: {e}")
-
     async def create_user(self, user_id: int) -> bool:
         """Создание нового пользователя с дефолтными значениями"""
         try:
             # Проверяем, существует ли пользователь
-            user_data = sqlite_db.get_user(user_id)
+            user_data = await self.async_db.get_user(user_id)
             if user_data:
                 logger.info(f"Пользователь {user_id} уже существует")
                 return True
                 
             # Создаем пользователя в SQLite
-            sqlite_db.create_user(
+            await self.async_db.create_user(
                 user_id=user_id,
                 username=None,
                 first_name=None,
@@ -133,7 +105,7 @@ class DatabaseAdapter:
         """Получение данных пользователя"""
         try:
             # Получаем пользователя из SQLite
-            user_data = sqlite_db.get_user(user_id)
+            user_data = await self.async_db.get_user(user_id)
             if user_data:
                 # Преобразуем данные в формат, ожидаемый приложением
                 result = {
@@ -146,7 +118,7 @@ class DatabaseAdapter:
                     'selected_teacher': user_data['selected_teacher'],
                     'notifications_enabled': user_data['notifications_enabled']
                 }
-                logger.info(f"Получены данные пользователя {user_id}")
+                logger.debug(f"Получены данные пользователя {user_id}")
                 return result
             logger.warning(f"Пользователь {user_id} не найден")
             return None
@@ -157,13 +129,13 @@ class DatabaseAdapter:
     async def user_exists(self, user_id: int) -> bool:
         """Проверка существования пользователя"""
         try:
-            user_data = sqlite_db.get_user(user_id)
+            user_data = await self.async_db.get_user(user_id)
             exists = user_data is not None
             
             # Если пользователь не существует, создаем его
             if not exists:
                 logger.info(f"Пользователь {user_id} не найден, создаем нового пользователя")
-                sqlite_db.create_user(
+                await self.async_db.create_user(
                     user_id=user_id,
                     username=None,
                     first_name=None,
@@ -172,7 +144,7 @@ class DatabaseAdapter:
                 )
                 exists = True
                 
-            logger.info(f"Проверка существования пользователя {user_id}: {'существует' if exists else 'не существует'}")
+            logger.debug(f"Проверка существования пользователя {user_id}: {'существует' if exists else 'не существует'}")
             return exists
         except Exception as e:
             logger.error(f"Ошибка при проверке существования пользователя {user_id}: {e}")
@@ -181,7 +153,7 @@ class DatabaseAdapter:
     async def update_user_role(self, user_id: int, role: str) -> bool:
         """Обновление роли пользователя"""
         try:
-            sqlite_db.update_user(user_id, role=role)
+            await self.async_db.update_user(user_id, role=role)
             logger.info(f"Роль пользователя {user_id} обновлена на {role}")
             return True
         except Exception as e:
@@ -191,7 +163,7 @@ class DatabaseAdapter:
     async def update_selected_teacher(self, user_id: int, teacher: str) -> bool:
         """Обновление выбранного преподавателя"""
         try:
-            sqlite_db.update_user_settings(user_id, selected_teacher=teacher)
+            await self.async_db.update_user_settings(user_id, selected_teacher=teacher)
             logger.info(f"Выбранный преподаватель пользователя {user_id} обновлен на {teacher}")
             return True
         except Exception as e:
@@ -201,7 +173,7 @@ class DatabaseAdapter:
     async def update_selected_group(self, user_id: int, group: str) -> bool:
         """Обновление выбранной группы"""
         try:
-            sqlite_db.update_user_settings(user_id, selected_group=group)
+            await self.async_db.update_user_settings(user_id, selected_group=group)
             logger.info(f"Выбранная группа пользователя {user_id} обновлена на {group}")
             return True
         except Exception as e:
@@ -211,7 +183,7 @@ class DatabaseAdapter:
     async def get_groups(self) -> List[str]:
         """Получение списка всех групп"""
         try:
-            groups = sqlite_db.get_all_groups()
+            groups = await self.async_db.get_all_groups()
             logger.info(f"Получен список групп: {len(groups)} групп")
             return groups
         except Exception as e:
@@ -221,7 +193,7 @@ class DatabaseAdapter:
     async def get_teachers(self) -> List[str]:
         """Получение списка всех преподавателей"""
         try:
-            teachers = sqlite_db.get_all_teachers()
+            teachers = await self.async_db.get_all_teachers()
             logger.info(f"Получен список преподавателей: {len(teachers)} преподавателей")
             return teachers
         except Exception as e:
@@ -231,18 +203,8 @@ class DatabaseAdapter:
     async def get_users_with_notifications(self) -> List[int]:
         """Получение списка ID пользователей с включенными уведомлениями"""
         try:
-            # Получаем пользователей с включенными уведомлениями
-            users = sqlite_db.execute_query(
-                """
-                SELECT u.user_id
-                FROM users u
-                JOIN user_settings us ON u.user_id = us.user_id
-                WHERE us.notifications_enabled = 1
-                """
-            )
-            
-            result = [user['user_id'] for user in users] if users else []
-                
+            # Выборка по справочнику пользователей в памяти (без него - запросом к SQLite)
+            result = await self.async_db.select_user_ids(notifications_enabled=True)
             logger.info(f"Получен список пользователей с уведомлениями: {len(result)} пользователей")
             return result
         except Exception as e:
@@ -252,7 +214,7 @@ class DatabaseAdapter:
     async def toggle_notifications(self, user_id: int, enabled: bool) -> bool:
         """Включение/выключение уведомлений для пользователя"""
         try:
-            sqlite_db.update_user_settings(user_id, notifications_enabled=enabled)
+            await self.async_db.update_user_settings(user_id, notifications_enabled=enabled)
             status = "включены" if enabled else "выключены"
             logger.info(f"Уведомления для пользователя {user_id} {status}")
             return True
@@ -263,34 +225,23 @@ class DatabaseAdapter:
     async def get_schedule(self) -> Optional[Dict[str, Any]]:
         """Получение текущего расписания"""
         try:
-            # Получаем все расписание из SQLite
-            all_groups = sqlite_db.get_all_groups()
-            all_schedule = {}
-            
-            for group in all_groups:
-                group_schedule = sqlite_db.get_schedule_by_group(group)
-                if group_schedule:
-                    # Группируем расписание по датам
-                    for lesson in group_schedule:
-                        date = lesson['date']
-                        if date not in all_schedule:
-                            all_schedule[date] = {}
-                        if group not in all_schedule[date]:
-                            all_schedule[date][group] = []
-                        all_schedule[date][group].append({
-                            'number': lesson['lesson_number'],
-                            'discipline': lesson['discipline'],
-                            'teacher': lesson['teacher_name'],
-                            'classroom': lesson['classroom'],
-                            'subgroup': lesson.get('subgroup', '0')
-                        })
-            
-            logger.info(f"Получено расписание для  {len(all_groups)} групп")
+            # Все расписание читается одним запросом и группируется по датам и группам
+            all_schedule = await self.async_db.get_full_schedule()
+            groups_count = len({group for groups in all_schedule.values() for group in groups})
+            logger.info(f"Получено расписание для  {groups_count} групп")
             return all_schedule
         except Exception as e:
             logger.error(f"Ошибка при получении расписания: {e}")
             return None
 
+    async def get_schedule_dates(self) -> Optional[List[Dict[str, Any]]]:
+        """Получение только списка дат расписания (без пар)"""
+        try:
+            return await self.async_db.get_schedule_dates()
+        except Exception as e:
+            logger.error(f"Ошибка при получении дат расписания: {e}")
+            return None
+
     async def update_schedule(self, schedule_data: Dict[str, Any]) -> bool:
         """Обновление расписания"""
         try:
@@ -301,10 +252,33 @@ class DatabaseAdapter:
             logger.error(f"Ошибка при обновлении расписания: {e}")
             return False
 
+    async def rollback_schedule(self) -> bool:
+        """Откат расписания к прошлому опубликованному поколению"""
+        try:
+            return await self.async_db.rollback_schedule()
+        except Exception as e:
+            logger.error(f"Ошибка при откате расписания: {e}")
+            return False
+
+    def get_query_stats(self, limit: int = 10) -> Dict[str, Any]:
+        """Статистика запросов к БД: итоги, самые затратные и последние медленные запросы"""
+        query_stats = self.db.query_stats
+        return {
+            'totals': query_stats.totals(),
+            'top': query_stats.top(limit),
+            'slow': query_stats.slow_queries(5),
+            'slow_threshold_ms': query_stats.slow_threshold_ms,
+            'user_writes': self.db.user_writes.get_stats()
+        }
+
+    def reset_query_stats(self) -> None:
+        """Сброс статистики запросов к БД"""
+        self.db.query_stats.reset()
+
     async def get_cached_groups(self) -> List[str]:
         """Получение кэшированного списка групп"""
         try:
-            groups = sqlite_db.get_all_groups()
+            groups = await self.async_db.get_all_groups()
             logger.info(f"Получен кэшированный список групп: {len(groups)} групп")
             return groups
         except Exception as e:
@@ -314,7 +288,7 @@ class DatabaseAdapter:
     async def get_cached_teachers(self) -> List[str]:
         """Получение кэшированного списка преподавателей"""
         try:
-            teachers = sqlite_db.get_all_teachers()
+            teachers = await self.async_db.get_all_teachers()
             logger.info(f"Получен кэшированный список преподавателей: {len(teachers)} преподавателей")
             return teachers
         except Exception as e:
@@ -324,40 +298,16 @@ class DatabaseAdapter:
     async def save_schedule_image(self, collection_name: str, image_data: dict) -> bool:
         """Сохранение данных изображения расписания"""
         try:
-            # Проверяем существование таблицы
-            table_exists = self.db.execute_query(
-                """
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name='schedule_images'
-                """
-            )
-            
-            if not table_exists:
-                # Создаем таблицу, если она не существует
-                query = """
-                CREATE TABLE IF NOT EXISTS schedule_images (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    type TEXT NOT NULL,
-                    file_id TEXT NOT NULL,
-                    file_unique_id TEXT NOT NULL,
-                    caption TEXT,
-                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT 1
-                )
-                """
-                self.db.execute_query(query)
-                logger.info("Создана таблица schedule_images")
-            
             # Деактивируем все предыдущие изображения этого типа
             query = "UPDATE schedule_images SET is_active = 0 WHERE type = ?"
-            self.db.execute_query(query, (collection_name,))
+            await self.async_db.execute_query(query, (collection_name,))
             
             # Сохраняем новое изображение
             query = """
             INSERT INTO schedule_images (type, file_id, file_unique_id, caption, uploaded_at, is_active)
             VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, 1)
             """
-            self.db.execute_query(
+            await self.async_db.execute_query(
                 query, 
                 (
                     collection_name, 
@@ -373,7 +323,7 @@ class DatabaseAdapter:
             WHERE type = ? AND is_active = 1 
             ORDER BY uploaded_at DESC LIMIT 1
             """
-            result = self.db.execute_query(verify_query, (collection_name,))
+            result = await self.async_db.execute_query(verify_query, (collection_name,))
             
             if result and len(result) > 0:
                 logger.info(f"Изображение для {collection_name} успешно сохранено")
@@ -391,18 +341,6 @@ class DatabaseAdapter:
     async def get_schedule_image(self, collection_name: str) -> Optional[Dict]:
         """Получение данных изображения расписания"""
         try:
-            # Проверяем существование таблицы
-            table_exists = self.db.execute_query(
-                """
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name='schedule_images'
-                """
-            )
-            
-            if not table_exists:
-                logger.warning(f"Таблица schedule_images не существует")
-                return None
-            
             # Получаем активное изображение указанного типа
             query = """
             SELECT file_id, file_unique_id, caption 
@@ -410,7 +348,7 @@ class DatabaseAdapter:
             WHERE type = ? AND is_active = 1 
             ORDER BY uploaded_at DESC LIMIT 1
             """
-            result = self.db.execute_query(query, (collection_name,))
+            result = await self.async_db.execute_query(query, (collection_name,))
             
             if not result or len(result) == 0:
                 logger.warning(f"Активное изображение для {collection_name} не найдено")
@@ -440,7 +378,7 @@ class DatabaseAdapter:
             FROM users u
             LEFT JOIN user_settings us ON u.user_id = us.user_id
             """
-            users = sqlite_db.execute_query(query)
+            users = await self.async_db.execute_query(query)
             result = []
             for user in users:
                 user_dict = dict(user)
@@ -452,6 +390,51 @@ class DatabaseAdapter:
             logger.error(f"Ошибка при получении списка пользователей: {e}")
             return []
 
+    async def iter_users(self, batch_size: int = 500, columns=None, **filters):
+        """
+        Постраничный обход пользователей без загрузки всех в память.
+        columns - нужные колонки, filters - role, group, notifications_enabled
+        """
+        async for user in self.async_db.iter_users(batch_size, columns, **filters):
+            yield user
+
+    async def iter_user_pages(self, batch_size: int = 500, columns=None, **filters):
+        """Постраничный обход пользователей: каждая итерация - список до batch_size пользователей"""
+        async for page in self.async_db.iter_user_pages(batch_size, columns, **filters):
+            yield page
+
+    async def select_user_ids(self, **filters) -> Sequence[int]:
+        """
+        ID пользователей для рассылки с фильтрами role, group, notifications_enabled, banned:
+        await db.select_user_ids(role='Студент', group='ГРУППА', notifications_enabled=True)
+        """
+        try:
+            return await self.async_db.select_user_ids(**filters)
+        except Exception as e:
+            logger.error(f"Ошибка при выборке пользователей: {e}")
+            return []
+
+    def get_user_directory_stats(self) -> Optional[Dict[str, Any]]:
+        """Размер справочника пользователей в памяти; None - справочник не загружен"""
+        directory = self.db.user_directory
+        return directory.get_stats() if directory is not None else None
+
+    async def count_users(self, **filters) -> int:
+        """Количество пользователей с фильтрами role, group, notifications_enabled, banned"""
+        try:
+            return await self.async_db.count_users(**filters)
+        except Exception as e:
+            logger.error(f"Ошибка при подсчете пользователей: {e}")
+            return 0
+
+    async def get_user_stats(self) -> Dict[str, Any]:
+        """Статистика пользователей для админ-панели из счетчиков user_stats (без обхода пользователей)"""
+        try:
+            return await self.async_db.get_user_stats()
+        except Exception as e:
+            logger.error(f"Ошибка при получении статистики пользователей: {e}")
+            return {'total': 0, 'notifications': 0, 'banned': 0, 'roles': {}, 'groups': {}}
+
     async def get_last_update_time(self) -> str:
         """Заглушка для получения времени последнего обновления кэша"""
         return datetime.now().strftime("%d.%m.%Y %H:%M:%S")
@@ -495,7 +478,7 @@ class DatabaseAdapter:
         """
         try:
             logger.info("🔄 Получение списка последних проверенных дат")
-            result = await self.db.get_last_checked_dates()
+            result = await self.async_db.get_last_checked_dates()
             
             if not result:
                 logger.info("ℹ️ Список последних проверенных дат пуст")
@@ -551,7 +534,7 @@ class DatabaseAdapter:
             dates_str = ','.join(valid_dates)
             
             # Обновляем в базе данных
-            result = await self.db.update_last_checked_dates(dates_str)
+            result = await self.async_db.update_last_checked_dates(dates_str)
             
             if result:
                 logger.info("✅ Список последних проверенных дат успешно обновлен")
@@ -572,19 +555,8 @@ class DatabaseAdapter:
     async def get_banned_users(self) -> list:
         """Получение списка забаненных пользователей"""
         try:
-            # Проверяем наличие колонки is_banned в таблице users
-            table_info = sqlite_db.execute_query("PRAGMA table_info(users)")
-            has_ban_column = any(row['name'] == 'is_banned' for row in table_info)
-            
-            if not has_ban_column:
-                # Добавляем колонку is_banned, если её нет
-                sqlite_db.execute_query("ALTER TABLE users ADD COLUMN is_banned BOOLEAN DEFAULT 0")
-                sqlite_db.execute_query("ALTER TABLE users ADD COLUMN ban_reason TEXT")
-                sqlite_db.execute_query("ALTER TABLE users ADD COLUMN ban_date TIMESTAMP")
-                logger.info("Добавлены колонки для бана пользователей")
-            
             # Получаем список забаненных пользователей
-            banned_users = sqlite_db.execute_query(
+            banned_users = await self.async_db.execute_query(
                 """
                 SELECT u.*, us.selected_group, us.selected_teacher 
                 FROM users u
@@ -607,25 +579,12 @@ class DatabaseAdapter:
     async def ban_user(self, user_id: int, reason: str = "Нарушение правил") -> bool:
         """Бан пользователя"""
         try:
-            # Проверяем наличие колонки is_banned в таблице users
-            table_info = sqlite_db.execute_query("PRAGMA table_info(users)")
-            has_ban_column = any(row['name'] == 'is_banned' for row in table_info)
-            
-            if not has_ban_column:
-                # Добавляем колонку is_banned, если её нет
-                sqlite_db.execute_query("ALTER TABLE users ADD COLUMN is_banned BOOLEAN DEFAULT 0")
-                sqlite_db.execute_query("ALTER TABLE users ADD COLUMN ban_reason TEXT")
-                sqlite_db.execute_query("ALTER TABLE users ADD COLUMN ban_date TIMESTAMP")
-                logger.info("Добавлены колонки для бана пользователей")
-            
-            # Баним пользователя
-            sqlite_db.execute_query(
-                """
-                UPDATE users 
-                SET is_banned = 1, ban_reason = ?, ban_date = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-                """,
-                (reason, user_id)
+            # Баним пользователя (ban_date в UTC, как CURRENT_TIMESTAMP)
+            await self.async_db.update_user(
+                user_id,
+                is_banned=1,
+                ban_reason=reason,
+                ban_date=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
             )
             
             logger.info(f"Пользователь {user_id} забанен. Причина: {reason}")
@@ -638,14 +597,7 @@ class DatabaseAdapter:
         """Разбан пользователя"""
         try:
             # Разбаниваем пользователя
-            sqlite_db.execute_query(
-                """
-                UPDATE users 
-                SET is_banned = 0, ban_reason = NULL
-                WHERE user_id = ?
-                """,
-                (user_id,)
-            )
+            await self.async_db.update_user(user_id, is_banned=0, ban_reason=None)
             
             logger.info(f"Пользователь {user_id} разбанен")
             return True
@@ -656,27 +608,13 @@ class DatabaseAdapter:
     async def is_user_banned(self, user_id: int) -> tuple:
         """Проверка бана пользователя с возвратом статуса и причины"""
         try:
-            # Проверяем наличие колонки is_banned в таблице users
-            table_info = sqlite_db.execute_query("PRAGMA table_info(users)")
-            has_ban_column = any(row['name'] == 'is_banned' for row in table_info)
-            
-            if not has_ban_column:
-                return False, None
-            
-            # Проверяем статус бана
-            result = sqlite_db.execute_query(
-                """
-                SELECT is_banned, ban_reason, ban_date 
-                FROM users 
-                WHERE user_id = ?
-                """,
-                (user_id,)
-            )
+            # Проверяем статус бана (get_user учитывает еще не записанный бан)
+            user_data = await self.async_db.get_user(user_id)
             
-            if not result or not result[0]['is_banned']:
+            if not user_data or not user_data['is_banned']:
                 return False, None
                 
-            return True, result[0]['ban_reason']
+            return True, user_data['ban_reason']
         except Exception as e:
             logger.error(f"Ошибка при проверке бана пользователя {user_id}: {e}")
             return False, None
@@ -686,21 +624,21 @@ class DatabaseAdapter:
         try:
             # Деактивируем все предыдущие фото
             query = "UPDATE schedule_photos SET is_active = 0"
-            self.db.execute_query(query)
+            await self.async_db.execute_query(query)
             
             # Сохраняем новое фото
             query = """
             INSERT INTO schedule_photos (photo_id, file_id, uploaded_at, is_active)
             VALUES (?, ?, CURRENT_TIMESTAMP, 1)
             """
-            self.db.execute_query(query, (photo_id, file_id))
+            await self.async_db.execute_query(query, (photo_id, file_id))
             
             # Проверяем, что фото действительно сохранилось
             verify_query = """
             SELECT photo_id, file_id FROM schedule_photos 
             WHERE photo_id = ? ORDER BY uploaded_at DESC LIMIT 1
             """
-            result = self.db.execute_query(verify_query, (photo_id,))
+            result = await self.async_db.execute_query(verify_query, (photo_id,))
             
             if result and len(result) > 0:
                 logger.info(f"График учебного процесса успешно сохранен: {photo_id}")
@@ -725,7 +663,7 @@ class DatabaseAdapter:
             ORDER BY uploaded_at DESC 
             LIMIT 1
             """
-            result = self.db.execute_query(query)
+            result = await self.async_db.execute_query(query)
             
             if not result or len(result) == 0:
                 logger.warning("Активный график учебного процесса не найден в базе данных")
@@ -0,0 +1,394 @@
+"""
+Copyright (c) 2023-2024 Gargun Daniil
+Telegram: @Daniilgargun (https://t.me/Daniilgargun)
+Contact ID: 1437368782
+All rights reserved.
+
+Несанкционированное использование, копирование или распространение 
+данного программного обеспечения запрещено.
+"""
+
+import sqlite3
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from bot.utils import schedule_calendar
+from .schema import (
+    DIMENSIONS, LESSON_DIMENSIONS, SNAPSHOT_TABLES, STAGING_SUFFIX, PREV_SUFFIX,
+    SCHEDULE_VIEW, USER_STATS_SCHEMA, REBUILD_USER_STATS, USER_TABLES
+)
+
+logger = logging.getLogger(__name__)
+
+# Миграции схемы: (версия, описание, метод SQLiteDatabase). Номер последней примененной
+# миграции хранится в PRAGMA user_version, каждая миграция выполняется один раз в своей транзакции.
+# Новая база создается сразу по schema.sql и получает последнюю версию
+SCHEMA_MIGRATIONS = [
+    (1, "таблицы отпечатков и журнала поколений расписания", '_migrate_schedule_journal'),
+    (2, "колонки iso_date и weekday в расписании", '_migrate_schedule_dates'),
+    (3, "расписание на справочниках с целочисленными ключами", '_migrate_normalized_schedule'),
+    (4, "индексы таблиц снимка расписания", '_sync_snapshot_indexes'),
+    (5, "таблицы изображений расписания и сведений о запусках", '_migrate_service_tables'),
+    (6, "новый формат таблицы last_checked_dates", '_migrate_last_checked_dates'),
+    (7, "колонки бана пользователей", '_migrate_ban_columns'),
+    (8, "инкрементальное освобождение страниц", '_migrate_incremental_vacuum'),
+    (9, "счетчики пользователей для админ-панели", '_migrate_user_stats'),
+]
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+class SchemaMigrations:
+    """
+    Миграции схемы и перенос таблиц пользователей в отдельный файл.
+    Часть SQLiteDatabase: работает с ее соединениями записи self.conn и self.users_conn
+    """
+
+    def _split_users_db(self) -> None:
+        """
+        Перенос таблиц пользователей из основного файла в файл пользователей.
+
+        Сначала таблицы, строки, индексы и триггеры одной транзакцией копируются в файл
+        пользователей, затем удаляются из основного файла. Если перенос прервался между
+        этими шагами, при следующем запуске копия уже есть и остается только удаление.
+        """
+        def has_users(conn):
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+            ).fetchone() is not None
+
+        if not has_users(self.conn):
+            return
+
+        start = time.perf_counter()
+        placeholders = ', '.join('?' * len(USER_TABLES))
+        objects = self.conn.execute(
+            f"""
+            SELECT type, name, sql FROM sqlite_master
+            WHERE tbl_name IN ({placeholders}) AND sql IS NOT NULL
+            ORDER BY type != 'table', rowid
+            """,
+            USER_TABLES
+        ).fetchall()
+
+        copied = 0
+        if not has_users(self.users_conn):
+            self.users_conn.execute("ATTACH DATABASE ? AS source", (self.db_path,))
+            try:
+                self.users_conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Строки копируются до создания триггеров, иначе счетчики user_stats удвоятся
+                    for object_type, name, sql in objects:
+                        if object_type == 'table':
+                            self.users_conn.execute(sql)
+                            copied += self.users_conn.execute(
+                                f"INSERT INTO main.{name} SELECT * FROM source.{name}"
+                            ).rowcount
+                    for object_type, name, sql in objects:
+                        if object_type != 'table':
+                            self.users_conn.execute(sql)
+                    self.users_conn.execute("COMMIT")
+                except Exception:
+                    self.users_conn.execute("ROLLBACK")
+                    raise
+            finally:
+                self.users_conn.execute("DETACH DATABASE source")
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for object_type, name, _ in reversed(objects):
+                self.conn.execute(f"DROP {object_type.upper()} IF EXISTS {name}")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        logger.info(
+            f"🗃️ Таблицы пользователей перенесены в {self.users_db_path}: "
+            f"{copied} строк за {(time.perf_counter() - start) * 1000:.1f} мс"
+        )
+
+    def _run_migrations(self) -> None:
+        """
+        Приведение схемы к версии SCHEMA_VERSION.
+        Читается PRAGMA user_version и применяются только миграции с большим номером,
+        поэтому при обычном запуске схема не проверяется.
+        """
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+        if version > SCHEMA_VERSION:
+            logger.warning(f"⚠️ Версия схемы БД {version} новее поддерживаемой ({SCHEMA_VERSION})")
+            return
+
+        if version == 0 and not self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+        ).fetchone():
+            self._create_schema()
+            return
+
+        vacuum_needed = False
+        for number, description, method in SCHEMA_MIGRATIONS:
+            if number <= version:
+                continue
+            start = time.perf_counter()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if getattr(self, method)():
+                    vacuum_needed = True
+                self.conn.execute(f"PRAGMA user_version = {number}")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                logger.error(f"❌ Ошибка миграции схемы {number} ({description})")
+                raise
+            logger.info(
+                f"🗃️ Применена миграция схемы {number}: {description} "
+                f"({(time.perf_counter() - start) * 1000:.1f} мс)"
+            )
+
+        if vacuum_needed:
+            self._vacuum_after_migration()
+
+    def _create_schema(self) -> None:
+        """Создание новой базы по schema.sql сразу с последней версией схемы"""
+        schema_path = Path(__file__).parent / "schema.sql"
+        if not schema_path.exists():
+            raise FileNotFoundError(f"Файл схемы БД не найден: {schema_path}")
+
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            script = f.read()
+        try:
+            user_stats = ";\n".join(USER_STATS_SCHEMA)
+            self.conn.executescript(
+                f"BEGIN IMMEDIATE;\n{script}\n{user_stats};\nPRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;"
+            )
+        except Exception:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Созданы новые таблицы в базе данных (версия схемы {SCHEMA_VERSION})")
+
+    def _migrate_schedule_journal(self) -> None:
+        """Таблицы отпечатков расписания и журнала поколений для баз, созданных до их появления"""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS schedule_fingerprints (
+                fingerprint_key TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS schedule_generations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                generation INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                lessons INTEGER,
+                build_ms REAL,
+                lock_hold_ms REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def _migrate_schedule_dates(self) -> None:
+        """Добавление колонок iso_date и weekday в расписание и их заполнение для старых баз"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(schedule)")]
+        if columns and 'iso_date' not in columns:
+            self.conn.execute("ALTER TABLE schedule ADD COLUMN iso_date TEXT")
+            self.conn.execute("ALTER TABLE schedule ADD COLUMN weekday INTEGER")
+
+            dates = [row[0] for row in self.conn.execute("SELECT DISTINCT date FROM schedule")]
+            self.conn.executemany(
+                "UPDATE schedule SET iso_date = ?, weekday = ? WHERE date = ?",
+                [
+                    (schedule_calendar.to_iso(date), schedule_calendar.weekday_of(date), date)
+                    for date in dates
+                ]
+            )
+            logger.info(f"Добавлены колонки iso_date и weekday, заполнено {len(dates)} дат расписания")
+
+    def _migrate_normalized_schedule(self) -> bool:
+        """
+        Перевод таблицы schedule со строковыми колонками на справочники с целочисленными ключами:
+        пары переносятся в таблицу lessons, а schedule становится представлением.
+        """
+        row = self.conn.execute("SELECT type FROM sqlite_master WHERE name = 'schedule'").fetchone()
+        if row and row[0] == 'view':
+            return False
+
+        start = time.perf_counter()
+        for table in ('disciplines', 'classrooms', 'lessons'):
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({SNAPSHOT_TABLES[table][0]})")
+
+        migrated_rows = 0
+        if row:
+            for column, table in LESSON_DIMENSIONS.items():
+                _, name_column = DIMENSIONS[table]
+                self.conn.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {table} ({name_column})
+                    SELECT DISTINCT {column} FROM schedule
+                    WHERE {column} IS NOT NULL AND {column} != ''
+                    """
+                )
+
+            migrated_rows = self.conn.execute(
+                """
+                INSERT INTO lessons
+                (lesson_id, date, iso_date, weekday, group_id, teacher_id, discipline_id, classroom_id,
+                 lesson_number, subgroup, created_at, updated_at)
+                SELECT s.schedule_id, s.date, s.iso_date, s.weekday,
+                       (SELECT group_id FROM groups WHERE group_name = s.group_name),
+                       (SELECT teacher_id FROM teachers WHERE full_name = s.teacher_name),
+                       (SELECT discipline_id FROM disciplines WHERE name = s.discipline),
+                       (SELECT classroom_id FROM classrooms WHERE name = s.classroom),
+                       s.lesson_number, COALESCE(s.subgroup, '0'), s.created_at, s.updated_at
+                FROM schedule s
+                ORDER BY s.schedule_id
+                """
+            ).rowcount
+            self.conn.execute("DROP TABLE schedule")
+
+        # Теневые таблицы старого формата для отката больше не подходят
+        for table in ('schedule', 'groups', 'teachers'):
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}{STAGING_SUFFIX}")
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}{PREV_SUFFIX}")
+
+        self.conn.execute(SCHEDULE_VIEW)
+
+        logger.info(
+            f"Расписание переведено на справочники с целочисленными ключами: "
+            f"перенесено {migrated_rows} пар за {(time.perf_counter() - start) * 1000:.1f} мс"
+        )
+        return True
+
+    def _vacuum_after_migration(self) -> None:
+        """
+        Сжатие файла БД после миграций, чтобы освободить место старой таблицы schedule.
+        В режиме WAL VACUUM пишет страницы в журнал, поэтому журнал сразу переносится
+        в файл и усекается - иначе файл БД не уменьшится до следующей контрольной точки
+        """
+        wal_path = self.db_path + "-wal"
+
+        def total_size():
+            return os.path.getsize(self.db_path) + (os.path.getsize(wal_path) if os.path.exists(wal_path) else 0)
+
+        size_before = total_size()
+        try:
+            start = time.perf_counter()
+            self.conn.execute("VACUUM")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logger.info(
+                f"База данных сжата после миграции: {size_before / 1024:.0f} КБ (с WAL) -> "
+                f"{total_size() / 1024:.0f} КБ за {(time.perf_counter() - start) * 1000:.0f} мс"
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Не удалось сжать базу данных после миграции: {e}")
+
+    def _sync_snapshot_indexes(self) -> None:
+        """
+        Приведение индексов рабочих таблиц снимка к списку SNAPSHOT_TABLES:
+        недостающие создаются, устаревшие индексы этих таблиц удаляются.
+        """
+        for table, (_, indexes) in SNAPSHOT_TABLES.items():
+            wanted = {name: columns for name, columns in indexes}
+            existing = {}
+            for row in self.conn.execute(f"PRAGMA index_list({table})"):
+                match = re.fullmatch(rf"idx_{table}(?:_g\d+)?_(\w+)", row[1])
+                if match:
+                    existing[match.group(1)] = row[1]
+
+            for name, index_name in existing.items():
+                if name not in wanted:
+                    self.conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+                    logger.info(f"Удален устаревший индекс {index_name}")
+
+            for name, columns in wanted.items():
+                if name not in existing:
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table}({columns})")
+                    logger.info(f"Создан индекс idx_{table}_{name}")
+
+    def _migrate_service_tables(self) -> None:
+        """Таблицы графика учебного процесса, изображений расписания и сведений о запусках"""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS schedule_photos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                photo_id TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_active BOOLEAN DEFAULT 1
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS schedule_images (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                file_unique_id TEXT NOT NULL,
+                caption TEXT,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_active BOOLEAN DEFAULT 1
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS copyright_info (
+                id INTEGER PRIMARY KEY,
+                author TEXT NOT NULL,
+                launch_time TEXT NOT NULL,
+                env_info TEXT NOT NULL,
+                instance_id TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_photos_photo ON schedule_photos(photo_id, uploaded_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_photos_active ON schedule_photos(is_active, uploaded_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_images_type ON schedule_images(type, is_active, uploaded_at)")
+
+    def _migrate_last_checked_dates(self) -> None:
+        """
+        Таблица last_checked_dates со списком дат в одной строке.
+        Старая версия (одна дата в строке) сохраняется как old_last_checked_dates, даты переносятся.
+        """
+        row = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'last_checked_dates'"
+        ).fetchone()
+        old_dates = []
+        if row and 'date TEXT PRIMARY KEY' in row[0]:
+            old_dates = [old_row[0] for old_row in self.conn.execute("SELECT date FROM last_checked_dates")]
+            self.conn.execute("ALTER TABLE last_checked_dates RENAME TO old_last_checked_dates")
+
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS last_checked_dates (
+                id INTEGER PRIMARY KEY,
+                dates TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        if old_dates:
+            self.conn.execute(
+                "INSERT INTO last_checked_dates (dates, updated_at) VALUES (?, CURRENT_TIMESTAMP)",
+                (','.join(old_dates),)
+            )
+            logger.info(f"✅ Таблица last_checked_dates переведена на новый формат. Перенесено {len(old_dates)} дат")
+
+    def _migrate_ban_columns(self) -> None:
+        """Колонки бана в таблице пользователей"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(users)")]
+        if 'is_banned' not in columns:
+            self.conn.execute("ALTER TABLE users ADD COLUMN is_banned BOOLEAN DEFAULT 0")
+            self.conn.execute("ALTER TABLE users ADD COLUMN ban_reason TEXT")
+            self.conn.execute("ALTER TABLE users ADD COLUMN ban_date TIMESTAMP")
+            logger.info("Добавлены колонки для бана пользователей")
+
+    def _migrate_incremental_vacuum(self) -> bool:
+        """
+        Включение auto_vacuum=INCREMENTAL для существующей базы.
+        Режим применяется только при VACUUM, поэтому миграция запрашивает сжатие после миграций.
+        """
+        return self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+
+    def _migrate_user_stats(self) -> None:
+        """Таблица user_stats с триггерами и начальный подсчет по существующим пользователям"""
+        for statement in USER_STATS_SCHEMA + REBUILD_USER_STATS:
+            self.conn.execute(statement)
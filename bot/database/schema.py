@@ -0,0 +1,243 @@
+"""
+Copyright (c) 2023-2024 Gargun Daniil
+Telegram: @Daniilgargun (https://t.me/Daniilgargun)
+Contact ID: 1437368782
+All rights reserved.
+
+Несанкционированное использование, копирование или распространение 
+данного программного обеспечения запрещено.
+"""
+
+# Описание таблиц в коде: общие для миграций, публикации снимков расписания и запросов
+
+# Таблицы файла пользователей: запись в них идет через соединение файла пользователей
+USER_TABLES = ('users', 'user_settings', 'user_stats')
+
+# Суффиксы теневых таблиц снимка расписания
+STAGING_SUFFIX = "_staging"
+PREV_SUFFIX = "_prev"
+
+# Справочники, на которые пары ссылаются по целочисленному ключу: таблица -> (колонка id, колонка имени)
+DIMENSIONS = {
+    'groups': ('group_id', 'group_name'),
+    'teachers': ('teacher_id', 'full_name'),
+    'disciplines': ('discipline_id', 'name'),
+    'classrooms': ('classroom_id', 'name')
+}
+
+# Колонка справочника в таблице lessons для каждого поля пары
+LESSON_DIMENSIONS = {
+    'group_name': 'groups',
+    'teacher_name': 'teachers',
+    'discipline': 'disciplines',
+    'classroom': 'classrooms'
+}
+
+# Таблицы, которые публикуются одним снимком: колонки и индексы (имя, колонки).
+# Внешние ключи не объявляются: при переименовании таблиц SQLite переписал бы их на таблицы прошлого поколения
+SNAPSHOT_TABLES = {
+    'groups': (
+        """
+        group_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_name TEXT UNIQUE NOT NULL,
+        course INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        """,
+        []
+    ),
+    'teachers': (
+        """
+        teacher_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        full_name TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        """,
+        []
+    ),
+    'disciplines': (
+        """
+        discipline_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        """,
+        []
+    ),
+    'classrooms': (
+        """
+        classroom_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        """,
+        []
+    ),
+    'lessons': (
+        """
+        lesson_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        iso_date TEXT,
+        weekday INTEGER,
+        group_id INTEGER,
+        teacher_id INTEGER,
+        discipline_id INTEGER,
+        classroom_id INTEGER,
+        lesson_number INTEGER,
+        subgroup TEXT DEFAULT '0',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        """,
+        [
+            ('date', 'date'),
+            # Покрывающие индексы: поиск, сортировка и все читаемые колонки без обращения к таблице
+            ('group_cover', 'group_id, iso_date, lesson_number, ' + 'date, weekday, subgroup, teacher_id, discipline_id, classroom_id'),
+            ('teacher_cover', 'teacher_id, iso_date, lesson_number, ' + 'date, weekday, subgroup, group_id, discipline_id, classroom_id'),
+            ('day_cover', 'iso_date, date, group_id, lesson_number, subgroup, teacher_id, discipline_id, classroom_id')
+        ]
+    )
+}
+
+# Представление со старыми колонками таблицы schedule, через него работает чтение расписания
+SCHEDULE_VIEW = """
+CREATE VIEW IF NOT EXISTS schedule AS
+SELECT
+    l.lesson_id AS schedule_id,
+    l.date,
+    g.group_name,
+    COALESCE(t.full_name, '') AS teacher_name,
+    l.lesson_number,
+    COALESCE(d.name, '') AS discipline,
+    COALESCE(c.name, '') AS classroom,
+    l.subgroup,
+    l.iso_date,
+    l.weekday,
+    l.group_id,
+    l.teacher_id,
+    l.created_at,
+    l.updated_at
+FROM lessons l
+LEFT JOIN groups g ON g.group_id = l.group_id
+LEFT JOIN teachers t ON t.teacher_id = l.teacher_id
+LEFT JOIN disciplines d ON d.discipline_id = l.discipline_id
+LEFT JOIN classrooms c ON c.classroom_id = l.classroom_id
+"""
+
+# Счетчики пользователей для админ-панели: число пользователей для каждого сочетания роли,
+# выбранной группы, уведомлений и бана. Счетчики ведут триггеры на users и user_settings,
+# поэтому статистика читается из нескольких сотен строк при любом числе пользователей.
+# Пользователь без строки настроек учитывается с пустой группой и выключенными уведомлениями.
+# Создаются вместе со схемой новой базы и миграцией 9
+USER_STATS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS user_stats (
+        role TEXT NOT NULL,
+        selected_group TEXT NOT NULL,
+        notifications_enabled INTEGER NOT NULL,
+        is_banned INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (role, selected_group, notifications_enabled, is_banned)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_users_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO user_stats (role, selected_group, notifications_enabled, is_banned, count)
+        SELECT COALESCE(NEW.role, ''), COALESCE(us.selected_group, ''),
+               COALESCE(us.notifications_enabled, 0) != 0, COALESCE(NEW.is_banned, 0) != 0, 1
+        FROM (SELECT NULL) LEFT JOIN user_settings us ON us.user_id = NEW.user_id
+        WHERE true
+        ON CONFLICT (role, selected_group, notifications_enabled, is_banned) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_users_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE user_stats SET count = count - 1
+        WHERE (role, selected_group, notifications_enabled, is_banned) = (
+            SELECT COALESCE(OLD.role, ''), COALESCE(us.selected_group, ''),
+                   COALESCE(us.notifications_enabled, 0) != 0, COALESCE(OLD.is_banned, 0) != 0
+            FROM (SELECT NULL) LEFT JOIN user_settings us ON us.user_id = OLD.user_id
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_users_update AFTER UPDATE OF role, is_banned ON users
+    WHEN COALESCE(OLD.role, '') != COALESCE(NEW.role, '')
+      OR (COALESCE(OLD.is_banned, 0) != 0) != (COALESCE(NEW.is_banned, 0) != 0)
+    BEGIN
+        UPDATE user_stats SET count = count - 1
+        WHERE (role, selected_group, notifications_enabled, is_banned) = (
+            SELECT COALESCE(OLD.role, ''), COALESCE(us.selected_group, ''),
+                   COALESCE(us.notifications_enabled, 0) != 0, COALESCE(OLD.is_banned, 0) != 0
+            FROM (SELECT NULL) LEFT JOIN user_settings us ON us.user_id = OLD.user_id
+        );
+        INSERT INTO user_stats (role, selected_group, notifications_enabled, is_banned, count)
+        SELECT COALESCE(NEW.role, ''), COALESCE(us.selected_group, ''),
+               COALESCE(us.notifications_enabled, 0) != 0, COALESCE(NEW.is_banned, 0) != 0, 1
+        FROM (SELECT NULL) LEFT JOIN user_settings us ON us.user_id = NEW.user_id
+        WHERE true
+        ON CONFLICT (role, selected_group, notifications_enabled, is_banned) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_settings_insert AFTER INSERT ON user_settings
+    WHEN EXISTS (SELECT 1 FROM users WHERE user_id = NEW.user_id)
+    BEGIN
+        UPDATE user_stats SET count = count - 1
+        WHERE (role, selected_group, notifications_enabled, is_banned) = (
+            SELECT COALESCE(role, ''), '', 0, COALESCE(is_banned, 0) != 0 FROM users WHERE user_id = NEW.user_id
+        );
+        INSERT INTO user_stats (role, selected_group, notifications_enabled, is_banned, count)
+        SELECT COALESCE(role, ''), COALESCE(NEW.selected_group, ''),
+               COALESCE(NEW.notifications_enabled, 0) != 0, COALESCE(is_banned, 0) != 0, 1
+        FROM users WHERE user_id = NEW.user_id
+        ON CONFLICT (role, selected_group, notifications_enabled, is_banned) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_settings_delete AFTER DELETE ON user_settings
+    WHEN EXISTS (SELECT 1 FROM users WHERE user_id = OLD.user_id)
+    BEGIN
+        UPDATE user_stats SET count = count - 1
+        WHERE (role, selected_group, notifications_enabled, is_banned) = (
+            SELECT COALESCE(role, ''), COALESCE(OLD.selected_group, ''),
+                   COALESCE(OLD.notifications_enabled, 0) != 0, COALESCE(is_banned, 0) != 0
+            FROM users WHERE user_id = OLD.user_id
+        );
+        INSERT INTO user_stats (role, selected_group, notifications_enabled, is_banned, count)
+        SELECT COALESCE(role, ''), '', 0, COALESCE(is_banned, 0) != 0, 1
+        FROM users WHERE user_id = OLD.user_id
+        ON CONFLICT (role, selected_group, notifications_enabled, is_banned) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_settings_update
+    AFTER UPDATE OF selected_group, notifications_enabled ON user_settings
+    WHEN (COALESCE(OLD.selected_group, '') != COALESCE(NEW.selected_group, '')
+      OR (COALESCE(OLD.notifications_enabled, 0) != 0) != (COALESCE(NEW.notifications_enabled, 0) != 0))
+      AND EXISTS (SELECT 1 FROM users WHERE user_id = NEW.user_id)
+    BEGIN
+        UPDATE user_stats SET count = count - 1
+        WHERE (role, selected_group, notifications_enabled, is_banned) = (
+            SELECT COALESCE(role, ''), COALESCE(OLD.selected_group, ''),
+                   COALESCE(OLD.notifications_enabled, 0) != 0, COALESCE(is_banned, 0) != 0
+            FROM users WHERE user_id = NEW.user_id
+        );
+        INSERT INTO user_stats (role, selected_group, notifications_enabled, is_banned, count)
+        SELECT COALESCE(role, ''), COALESCE(NEW.selected_group, ''),
+               COALESCE(NEW.notifications_enabled, 0) != 0, COALESCE(is_banned, 0) != 0, 1
+        FROM users WHERE user_id = NEW.user_id
+        ON CONFLICT (role, selected_group, notifications_enabled, is_banned) DO UPDATE SET count = count + 1;
+    END
+    """,
+]
+
+# Пересчет user_stats по таблицам пользователей (миграция, восстановление после расхождения)
+REBUILD_USER_STATS = [
+    "DELETE FROM user_stats",
+    """
+    INSERT INTO user_stats (role, selected_group, notifications_enabled, is_banned, count)
+    SELECT COALESCE(u.role, ''), COALESCE(us.selected_group, ''),
+           COALESCE(us.notifications_enabled, 0) != 0, COALESCE(u.is_banned, 0) != 0, COUNT(*)
+    FROM users u
+    LEFT JOIN user_settings us ON u.user_id = us.user_id
+    GROUP BY 1, 2, 3, 4
+    """
+]
@@ -6,7 +6,10 @@ CREATE TABLE IF NOT EXISTS users (
     last_name TEXT,
     role TEXT DEFAULT 'student',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_banned BOOLEAN DEFAULT 0,
+    ban_reason TEXT,
+    ban_date TIMESTAMP
 );
 
 -- Создание таблицы настроек пользователей
@@ -33,22 +36,59 @@ CREATE TABLE IF NOT EXISTS teachers (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Создание таблицы расписания
-CREATE TABLE IF NOT EXISTS schedule (
-    schedule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+-- Создание справочника дисциплин
+CREATE TABLE IF NOT EXISTS disciplines (
+    discipline_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Создание справочника аудиторий
+CREATE TABLE IF NOT EXISTS classrooms (
+    classroom_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Создание таблицы пар: строки хранятся в справочниках, здесь только целочисленные ключи
+CREATE TABLE IF NOT EXISTS lessons (
+    lesson_id INTEGER PRIMARY KEY AUTOINCREMENT,
     date TEXT NOT NULL,
-    group_name TEXT,
-    teacher_name TEXT,
+    iso_date TEXT,
+    weekday INTEGER,
+    group_id INTEGER,
+    teacher_id INTEGER,
+    discipline_id INTEGER,
+    classroom_id INTEGER,
     lesson_number INTEGER,
-    discipline TEXT NOT NULL,
-    classroom TEXT,
     subgroup TEXT DEFAULT '0',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (group_name) REFERENCES groups(group_name),
-    FOREIGN KEY (teacher_name) REFERENCES teachers(full_name)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Представление расписания со строковыми колонками для чтения
+CREATE VIEW IF NOT EXISTS schedule AS
+SELECT
+    l.lesson_id AS schedule_id,
+    l.date,
+    g.group_name,
+    COALESCE(t.full_name, '') AS teacher_name,
+    l.lesson_number,
+    COALESCE(d.name, '') AS discipline,
+    COALESCE(c.name, '') AS classroom,
+    l.subgroup,
+    l.iso_date,
+    l.weekday,
+    l.group_id,
+    l.teacher_id,
+    l.created_at,
+    l.updated_at
+FROM lessons l
+LEFT JOIN groups g ON g.group_id = l.group_id
+LEFT JOIN teachers t ON t.teacher_id = l.teacher_id
+LEFT JOIN disciplines d ON d.discipline_id = l.discipline_id
+LEFT JOIN classrooms c ON c.classroom_id = l.classroom_id;
+
 -- Создание таблицы обновлений расписания
 CREATE TABLE IF NOT EXISTS schedule_updates (
     update_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -57,15 +97,75 @@ CREATE TABLE IF NOT EXISTS schedule_updates (
     error_message TEXT
 );
 
+-- Создание таблицы отпечатков расписания (вся страница и отдельные даты)
+CREATE TABLE IF NOT EXISTS schedule_fingerprints (
+    fingerprint_key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Создание журнала поколений опубликованного расписания
+CREATE TABLE IF NOT EXISTS schedule_generations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    generation INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    lessons INTEGER,
+    build_ms REAL,
+    lock_hold_ms REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Создание таблицы последних проверенных дат расписания
+CREATE TABLE IF NOT EXISTS last_checked_dates (
+    id INTEGER PRIMARY KEY,
+    dates TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Создание таблицы графика учебного процесса
+CREATE TABLE IF NOT EXISTS schedule_photos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    photo_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN DEFAULT 1
+);
+
+-- Создание таблицы изображений расписания
+CREATE TABLE IF NOT EXISTS schedule_images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    file_unique_id TEXT NOT NULL,
+    caption TEXT,
+    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN DEFAULT 1
+);
+
+-- Создание таблицы сведений о запусках
+CREATE TABLE IF NOT EXISTS copyright_info (
+    id INTEGER PRIMARY KEY,
+    author TEXT NOT NULL,
+    launch_time TEXT NOT NULL,
+    env_info TEXT NOT NULL,
+    instance_id TEXT NOT NULL
+);
+
+-- Таблица счетчиков пользователей user_stats и ее триггеры создаются из USER_STATS_SCHEMA (schema.py)
+
 -- Создание индексов для оптимизации запросов
-CREATE INDEX IF NOT EXISTS idx_schedule_date ON schedule(date);
-CREATE INDEX IF NOT EXISTS idx_schedule_group ON schedule(group_name);
-CREATE INDEX IF NOT EXISTS idx_schedule_teacher ON schedule(teacher_name);
-
--- Создание триггера для обновления updated_at в таблице schedule
-CREATE TRIGGER IF NOT EXISTS update_schedule_timestamp 
-    AFTER UPDATE ON schedule
-BEGIN
-    UPDATE schedule SET updated_at = CURRENT_TIMESTAMP
-    WHERE schedule_id = NEW.schedule_id;
-END; 
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_schedule_photos_photo ON schedule_photos(photo_id, uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_schedule_photos_active ON schedule_photos(is_active, uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_schedule_images_type ON schedule_images(type, is_active, uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_lessons_date ON lessons(date);
+
+-- Покрывающие индексы для чтения расписания группы, преподавателя и всего расписания по дням
+CREATE INDEX IF NOT EXISTS idx_lessons_group_cover ON lessons(
+    group_id, iso_date, lesson_number, date, weekday, subgroup, teacher_id, discipline_id, classroom_id
+);
+CREATE INDEX IF NOT EXISTS idx_lessons_teacher_cover ON lessons(
+    teacher_id, iso_date, lesson_number, date, weekday, subgroup, group_id, discipline_id, classroom_id
+);
+CREATE INDEX IF NOT EXISTS idx_lessons_day_cover ON lessons(
+    iso_date, date, group_id, lesson_number, subgroup, teacher_id, discipline_id, classroom_id
+);
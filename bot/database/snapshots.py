@@ -0,0 +1,372 @@
+"""
+Copyright (c) 2023-2024 Gargun Daniil
+Telegram: @Daniilgargun (https://t.me/Daniilgargun)
+Contact ID: 1437368782
+All rights reserved.
+
+Несанкционированное использование, копирование или распространение 
+данного программного обеспечения запрещено.
+"""
+
+import logging
+import time
+from typing import Dict, List, Any, Tuple
+from bot.utils import schedule_calendar
+from .schema import DIMENSIONS, SNAPSHOT_TABLES, STAGING_SUFFIX, PREV_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleSnapshots:
+    """
+    Публикация расписания снимками (теневые таблицы и переименование) и откат к прошлому поколению.
+    Часть SQLiteDatabase: использует ее транзакции записи, пул чтения и снимок расписания в памяти
+    """
+
+    @staticmethod
+    def _collect_schedule_rows(schedule_data: Dict[str, Dict[str, List[Dict]]]) -> Dict[tuple, List[tuple]]:
+        """Новые записи расписания, сгруппированные по ключу (одинаковых ключей может быть несколько)"""
+        new_rows = {}
+        for date, groups in schedule_data.items():
+            # Дата одна для всех пар дня - разбираем ее один раз
+            date_iso = schedule_calendar.to_iso(date)
+            date_weekday = schedule_calendar.weekday_of(date)
+            for group_name, lessons in groups.items():
+                for lesson in lessons:
+                    key = (date, group_name, lesson.get('number', 0), lesson.get('subgroup', '0'))
+                    iso_date = lesson.get('iso_date') or date_iso
+                    weekday = lesson.get('weekday')
+                    if weekday is None:
+                        weekday = date_weekday
+                    values = (
+                        lesson.get('teacher', ''),
+                        lesson.get('discipline', ''),
+                        lesson.get('classroom', ''),
+                        iso_date,
+                        weekday
+                    )
+                    new_rows.setdefault(key, []).append(values)
+        return new_rows
+
+    @staticmethod
+    def _load_schedule_rows(cursor) -> Dict[tuple, List[tuple]]:
+        """Текущие записи расписания по ключу: (schedule_id, значения, created_at, updated_at)"""
+        old_rows = {}
+        for row in cursor.execute(
+            """
+            SELECT schedule_id, date, group_name, lesson_number, subgroup,
+                   teacher_name, discipline, classroom, iso_date, weekday,
+                   created_at, updated_at
+            FROM schedule
+            ORDER BY schedule_id
+            """
+        ):
+            key = (row[1], row[2], row[3], row[4])
+            old_rows.setdefault(key, []).append((row[0], (row[5], row[6], row[7], row[8], row[9]), row[10], row[11]))
+        return old_rows
+
+    @staticmethod
+    def _schedule_names(new_rows: Dict[tuple, List[tuple]]) -> Dict[str, set]:
+        """Группы, преподаватели, дисциплины и аудитории новых записей по таблицам справочников"""
+        names = {table: set() for table in DIMENSIONS}
+        for key, values_list in new_rows.items():
+            names['groups'].add(key[1])
+            for values in values_list:
+                names['teachers'].add(values[0])
+                names['disciplines'].add(values[1])
+                names['classrooms'].add(values[2])
+        return names
+
+    @staticmethod
+    def _lesson_values(key: tuple, values: tuple, ids: Dict[str, Dict[str, int]]) -> tuple:
+        """
+        Запись таблицы lessons по ключу и значениям пары:
+        (date, iso_date, weekday, group_id, teacher_id, discipline_id, classroom_id, lesson_number, subgroup)
+        """
+        date, group_name, lesson_number, subgroup = key
+        teacher, discipline, classroom, iso_date, weekday = values
+        return (
+            date, iso_date, weekday,
+            ids['groups'].get(group_name),
+            ids['teachers'].get(teacher),
+            ids['disciplines'].get(discipline),
+            ids['classrooms'].get(classroom),
+            lesson_number, subgroup
+        )
+
+    @staticmethod
+    def _pair_schedule_rows(new_rows: Dict[tuple, List[tuple]], old_rows: Dict[tuple, List[tuple]]):
+        """
+        Сопоставление новых и текущих записей по ключу.
+        Возвращает тройки (ключ, старая запись или None, новые значения или None).
+        """
+        for key in new_rows.keys() | old_rows.keys():
+            new_values = new_rows.get(key, [])
+            old_values = old_rows.get(key, [])
+
+            # Дубликаты ключа сопоставляем по порядку следования
+            for i in range(max(len(new_values), len(old_values))):
+                old = old_values[i] if i < len(old_values) else None
+                new = new_values[i] if i < len(new_values) else None
+                yield key, old, new
+
+    def _create_staging_table(self, cursor, table: str) -> str:
+        """Создание пустой теневой таблицы без индексов"""
+        columns, _ = SNAPSHOT_TABLES[table]
+        staging = table + STAGING_SUFFIX
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(f"CREATE TABLE {staging} ({columns})")
+        return staging
+
+    @staticmethod
+    def _index_staging_table(cursor, table: str, generation: int) -> None:
+        """Индексы теневой таблицы после вставки строк, имена индексов уникальны для поколения"""
+        _, indexes = SNAPSHOT_TABLES[table]
+        for index_name, index_columns in indexes:
+            cursor.execute(
+                f"CREATE INDEX idx_{table}_g{generation}_{index_name} ON {table}{STAGING_SUFFIX}({index_columns})"
+            )
+
+    @staticmethod
+    def _prepare_staging_names(conn, table: str, names) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, list]]:
+        """
+        Изменения справочника относительно рабочей таблицы. У сохранившихся имен остаются
+        прежние id, новые имена получают id после всех текущих (как AUTOINCREMENT).
+        Возвращает счетчики изменений, id имен и изменения {'deleted': [id], 'inserted': [(id, имя)]}.
+        """
+        id_column, column = DIMENSIONS[table]
+        new_names = {name for name in names if name}
+        old_ids = {row[1]: row[0] for row in conn.execute(f"SELECT {id_column}, {column} FROM {table}")}
+
+        next_id = max(old_ids.values(), default=0) + 1
+        added = [(next_id + offset, name) for offset, name in enumerate(sorted(new_names - old_ids.keys()))]
+        deleted = [old_ids[name] for name in old_ids.keys() - new_names]
+
+        counts = {
+            'inserted': len(added),
+            'deleted': len(deleted),
+            'unchanged': len(old_ids) - len(deleted)
+        }
+        ids = {name: old_ids[name] for name in new_names & old_ids.keys()}
+        ids.update((name, name_id) for name_id, name in added)
+        return counts, ids, {'deleted': deleted, 'inserted': added}
+
+    def _prepare_staging_lessons(self, conn, new_rows: Dict[tuple, List[tuple]],
+                                 ids: Dict[str, Dict[str, int]]) -> Tuple[Dict[str, int], Dict[str, list]]:
+        """
+        Изменения пар относительно рабочей таблицы: удаленные id, измененные и новые строки.
+        Неизменившиеся пары в изменения не попадают и копируются в теневую таблицу как есть
+        """
+        old_rows = self._load_schedule_rows(conn)
+
+        deleted, updated, added = [], [], []
+        counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        max_id = 0
+        for key, old, new in self._pair_schedule_rows(new_rows, old_rows):
+            if old is not None:
+                max_id = max(max_id, old[0])
+            if new is None:
+                counts['deleted'] += 1
+                deleted.append((old[0],))
+            elif old is None:
+                counts['inserted'] += 1
+                added.append(self._lesson_values(key, new, ids))
+            elif old[1] != new:
+                counts['updated'] += 1
+                updated.append(self._lesson_values(key, new, ids) + (old[0],))
+            else:
+                counts['unchanged'] += 1
+
+        # Новые пары получают id после всех текущих (как AUTOINCREMENT)
+        inserted = [(max_id + 1 + offset,) + values for offset, values in enumerate(added)]
+        counts['lessons'] = counts['unchanged'] + counts['updated'] + counts['inserted']
+        return counts, {'deleted': deleted, 'updated': updated, 'inserted': inserted}
+
+    def _write_staging_table(self, cursor, table: str, changes: Dict[str, list], generation: int) -> None:
+        """
+        Теневая таблица: копия рабочей таблицы средствами SQLite, к которой применяются только
+        изменения (удаление, обновление, вставка). Индексы строятся после изменения строк
+        """
+        staging = self._create_staging_table(cursor, table)
+        columns = ', '.join(row[1] for row in cursor.execute(f"PRAGMA table_info({staging})").fetchall())
+        cursor.execute(f"INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table}")
+        if table == 'lessons':
+            cursor.executemany(f"DELETE FROM {staging} WHERE lesson_id = ?", changes['deleted'])
+            cursor.executemany(
+                f"""
+                UPDATE {staging} SET date = ?, iso_date = ?, weekday = ?, group_id = ?, teacher_id = ?,
+                    discipline_id = ?, classroom_id = ?, lesson_number = ?, subgroup = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE lesson_id = ?
+                """,
+                changes['updated']
+            )
+            cursor.executemany(
+                f"""
+                INSERT INTO {staging}
+                (lesson_id, date, iso_date, weekday, group_id, teacher_id, discipline_id, classroom_id,
+                 lesson_number, subgroup)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                changes['inserted']
+            )
+        else:
+            id_column, column = DIMENSIONS[table]
+            cursor.executemany(f"DELETE FROM {staging} WHERE {id_column} = ?", [(name_id,) for name_id in changes['deleted']])
+            cursor.executemany(f"INSERT INTO {staging} ({id_column}, {column}) VALUES (?, ?)", changes['inserted'])
+        self._index_staging_table(cursor, table, generation)
+
+    def _record_lock_hold(self, generation: int, action: str, lock_hold_ms: float) -> None:
+        """Учет времени удержания блокировки записи при переключении поколений"""
+        self.publish_stats['generation'] = generation
+        self.publish_stats['lock_hold_ms'] = round(lock_hold_ms, 2)
+        self.publish_stats['max_lock_hold_ms'] = round(max(self.publish_stats['max_lock_hold_ms'], lock_hold_ms), 2)
+        self.publish_stats['publishes' if action == 'publish' else 'rollbacks'] += 1
+
+    def publish_schedule(self, schedule_data: Dict[str, Dict[str, List[Dict]]], groups: List[str],
+                         teachers: List[str], fingerprints: Dict[str, str] = None) -> Dict[str, Any]:
+        """
+        Публикация нового снимка расписания, групп и преподавателей.
+
+        Разница с текущим расписанием и все строки снимка готовятся через соединение
+        чтения. Теневые таблицы (*_staging) заполняются и индексируются короткими
+        транзакциями, по одной на таблицу, пока рабочие таблицы остаются доступны.
+        Затем транзакция переключения удаляет *_prev, переименовывает текущие таблицы
+        в *_prev, а теневые - в рабочие, и записывает отпечатки и журнал поколений;
+        только она учитывается как удержание блокировки записи.
+        Читатели видят либо старое, либо новое расписание целиком;
+        прошлое поколение остается для мгновенного отката через rollback_schedule().
+        """
+        try:
+            # Другие изменения расписания ждут публикацию, поэтому прочитанные строки не устареют до записи
+            with self._schedule_lock:
+                build_start = time.perf_counter()
+                new_rows = self._collect_schedule_rows(schedule_data)
+                names = self._schedule_names(new_rows)
+                names['groups'].update(groups)
+                names['teachers'].update(teachers)
+
+                with self._read_connection() as conn:
+                    generation = conn.execute(
+                        "SELECT COALESCE(MAX(generation), 0) + 1 FROM schedule_generations"
+                    ).fetchone()[0]
+
+                    counts, ids, changes = {}, {}, {}
+                    for table, table_names in names.items():
+                        counts[table], ids[table], changes[table] = self._prepare_staging_names(conn, table, table_names)
+                    lesson_counts, changes['lessons'] = self._prepare_staging_lessons(conn, new_rows, ids)
+                    counts.update(lesson_counts)
+
+                # Теневые таблицы пишутся и индексируются отдельными транзакциями до переключения:
+                # рабочие таблицы в это время читаются как обычно, записи пользователей не ждут всю сборку
+                staging_start = time.perf_counter()
+                for table in SNAPSHOT_TABLES:
+                    with self.transaction('publish_schedule_staging') as cursor:
+                        self._write_staging_table(cursor, table, changes[table], generation)
+                staging_ms = (time.perf_counter() - staging_start) * 1000
+                build_ms = (time.perf_counter() - build_start) * 1000
+
+                # Под блокировкой записи только переключение поколений
+                with self.transaction('publish_schedule') as cursor:
+                    lock_start = time.perf_counter()
+                    # Прошлое поколение больше не нужно - откат возможен только на одно поколение назад
+                    for table in SNAPSHOT_TABLES:
+                        cursor.execute(f"DROP TABLE IF EXISTS {table}{PREV_SUFFIX}")
+                    for table in SNAPSHOT_TABLES:
+                        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}{PREV_SUFFIX}")
+                        cursor.execute(f"ALTER TABLE {table}{STAGING_SUFFIX} RENAME TO {table}")
+
+                    if fingerprints is not None:
+                        cursor.execute("DELETE FROM schedule_fingerprints")
+                        cursor.executemany(
+                            "INSERT INTO schedule_fingerprints (fingerprint_key, hash) VALUES (?, ?)",
+                            list(fingerprints.items())
+                        )
+                    cursor.execute(
+                        "INSERT INTO schedule_generations (generation, action, lessons, build_ms) VALUES (?, 'publish', ?, ?)",
+                        (generation, counts['lessons'], round(build_ms, 2))
+                    )
+                # Удержание - транзакция переключения, включая COMMIT
+                lock_hold_ms = (time.perf_counter() - lock_start) * 1000
+
+                self.execute_query(
+                    "UPDATE schedule_generations SET lock_hold_ms = ? WHERE generation = ? AND action = 'publish'",
+                    (round(lock_hold_ms, 2), generation)
+                )
+                self.publish_stats['build_ms'] = round(build_ms, 2)
+                self._record_lock_hold(generation, 'publish', lock_hold_ms)
+                self.reload_schedule_store()
+
+            logger.info(
+                f"🔁 Опубликовано поколение расписания {generation}: пар {counts['lessons']} "
+                f"(добавлено {counts['inserted']}, изменено {counts['updated']}, удалено {counts['deleted']}), "
+                f"сборка {build_ms:.1f} мс (из них теневые таблицы {staging_ms:.1f} мс), "
+                f"блокировка записи при переключении {lock_hold_ms:.1f} мс"
+            )
+            return counts
+        except Exception as e:
+            logger.error(f"Ошибка при публикации расписания: {e}")
+            raise
+
+    @staticmethod
+    def _restored_generation(cursor) -> int:
+        """Номер поколения, которое станет рабочим после отката (текущее и прошлое меняются местами)"""
+        last = cursor.execute("SELECT generation FROM schedule_generations ORDER BY id DESC LIMIT 1").fetchone()
+        latest = cursor.execute(
+            "SELECT COALESCE(MAX(generation), 0) FROM schedule_generations WHERE action = 'publish'"
+        ).fetchone()[0]
+        if last and last[0] != latest:
+            # Сейчас рабочим уже является откаченное поколение - возвращаем последнее опубликованное
+            return latest
+        previous = cursor.execute(
+            "SELECT MAX(generation) FROM schedule_generations WHERE action = 'publish' AND generation < ?",
+            (latest,)
+        ).fetchone()[0]
+        return previous or 0
+
+    def rollback_schedule(self) -> bool:
+        """
+        Откат к прошлому поколению расписания.
+        Текущее и прошлое поколения меняются местами, отпечатки сбрасываются,
+        чтобы следующая проверка сайта заново опубликовала актуальное расписание.
+        """
+        try:
+            prev_tables = self.execute_query(
+                "SELECT COUNT(*) AS count FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+                    ', '.join('?' for _ in SNAPSHOT_TABLES)
+                ),
+                tuple(table + PREV_SUFFIX for table in SNAPSHOT_TABLES)
+            )
+            if not prev_tables or prev_tables[0]['count'] != len(SNAPSHOT_TABLES):
+                logger.warning("Нет прошлого поколения расписания для отката")
+                return False
+
+            with self._schedule_lock, self.transaction('rollback_schedule') as cursor:
+                swap_start = time.perf_counter()
+                for table in SNAPSHOT_TABLES:
+                    cursor.execute(f"ALTER TABLE {table} RENAME TO {table}{STAGING_SUFFIX}")
+                    cursor.execute(f"ALTER TABLE {table}{PREV_SUFFIX} RENAME TO {table}")
+                    cursor.execute(f"ALTER TABLE {table}{STAGING_SUFFIX} RENAME TO {table}{PREV_SUFFIX}")
+
+                cursor.execute("DELETE FROM schedule_fingerprints")
+                generation = self._restored_generation(cursor)
+                lessons = cursor.execute("SELECT COUNT(*) FROM lessons").fetchone()[0]
+                cursor.execute(
+                    "INSERT INTO schedule_generations (generation, action, lessons) VALUES (?, 'rollback', ?)",
+                    (generation, lessons)
+                )
+                rollback_id = cursor.lastrowid
+            # Удержание - вся транзакция записи, включая COMMIT
+            lock_hold_ms = (time.perf_counter() - swap_start) * 1000
+            self.execute_query(
+                "UPDATE schedule_generations SET lock_hold_ms = ? WHERE id = ?",
+                (round(lock_hold_ms, 2), rollback_id)
+            )
+
+            self._record_lock_hold(generation, 'rollback', lock_hold_ms)
+            self.reload_schedule_store()
+            logger.warning(f"↩️ Расписание откачено к поколению {generation}, блокировка записи {lock_hold_ms:.1f} мс")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при откате расписания: {e}")
+            return False
@@ -14,51 +14,153 @@ import os
 import threading
 import time
 import shutil
+import queue
+import re
+import itertools
 from pathlib import Path
+from contextlib import contextmanager
 from typing import Optional, Dict, List, Any, Tuple
 from datetime import datetime
+from bot.utils import schedule_calendar
+from bot.utils.query_stats import QueryStats
+from bot.utils.schedule_store import ScheduleStore, LOAD_QUERY as SCHEDULE_STORE_QUERY
+from bot.utils.user_directory import UserDirectory
+from .schema import DIMENSIONS, LESSON_DIMENSIONS, REBUILD_USER_STATS
+from .migrations import SchemaMigrations
+from .snapshots import ScheduleSnapshots
+from .user_writes import UserWriteQueue
 
 logger = logging.getLogger(__name__)
 
-# Глобальная блокировка для всех операций с БД
+# Глобальная блокировка для операций записи в БД (чтение идет через пул соединений без блокировки)
 DB_LOCK = threading.RLock()
 
-class SQLiteDatabase:
+# Отдельный файл для пользователей и их настроек (USERS_DB_PATH). Пусто - все таблицы в одном файле.
+# У файла пользователей свое соединение записи и своя блокировка USERS_DB_LOCK, поэтому
+# публикация расписания и запись настроек пользователей не ждут друг друга
+USERS_DB_PATH = os.getenv("USERS_DB_PATH", "")
+USERS_DB_LOCK = threading.RLock()
+
+# Имя, под которым файл пользователей подключается (ATTACH) к соединениям чтения
+USERS_SCHEMA = "users_db"
+
+# Запросы к таблицам файла пользователей (USER_TABLES) идут через соединение файла пользователей
+USER_TABLES_PATTERN = re.compile(r"\b(?:users|user_settings|user_stats)\b", re.IGNORECASE)
+
+# Количество соединений только для чтения
+READ_POOL_SIZE = 4
+
+# Колонки пары, которые читают обработчики (покрываются индексами idx_lessons_*_cover)
+LESSON_COLUMNS = "date, group_name, teacher_name, lesson_number, discipline, classroom, subgroup, iso_date, weekday"
+
+# Изменяемые колонки таблиц users и user_settings
+USER_FIELDS = ('username', 'first_name', 'last_name', 'role', 'is_banned', 'ban_reason', 'ban_date')
+USER_SETTINGS_FIELDS = ('selected_group', 'selected_teacher', 'notifications_enabled')
+
+# Колонки, доступные при постраничном обходе пользователей
+USER_SCAN_COLUMNS = {
+    'user_id': 'u.user_id',
+    **{field: f'u.{field}' for field in USER_FIELDS + ('created_at', 'last_active')},
+    **{field: f'us.{field}' for field in USER_SETTINGS_FIELDS}
+}
+
+# Колонки, которые хранит справочник пользователей в памяти (UserDirectory)
+USER_DIRECTORY_COLUMNS = ['role', 'selected_group', 'notifications_enabled', 'is_banned']
+
+
+class SQLiteDatabase(SchemaMigrations, ScheduleSnapshots):
+    """
+    Доступ к SQLite: соединение записи и пул чтения, пользователи и расписание.
+    Миграции схемы - migrations.py, публикация снимков расписания - snapshots.py,
+    отложенная запись пользователей - user_writes.py
+    """
     _instance = None
     
     @classmethod
-    def get_instance(cls, db_path=None):
+    def get_instance(cls, db_path=None, users_db_path=None):
         """Реализация паттерна Singleton для доступа к БД"""
         with DB_LOCK:
             if cls._instance is None:
                 # Используем значение по умолчанию, если путь не указан
                 if db_path is None:
                     db_path = "bot/database/bot_new.db"
-                cls._instance = cls(db_path)
+                if users_db_path is None:
+                    users_db_path = USERS_DB_PATH
+                cls._instance = cls(db_path, users_db_path)
             return cls._instance
     
-    def __init__(self, db_path: str = "bot/database/bot_new.db"):
-        """Инициализация базы данных SQLite"""
+    def __init__(self, db_path: str = "bot/database/bot_new.db", users_db_path: Optional[str] = None):
+        """
+        Инициализация базы данных SQLite.
+        users_db_path - отдельный файл для таблиц пользователей; None - все в файле db_path
+        """
         self.db_path = db_path
+        self.users_db_path = users_db_path or None
+        # Области записи: 'main' - расписание и служебные таблицы, 'users' - пользователи
+        self.scopes = ['main', 'users'] if self.users_db_path else ['main']
+        # Единственное соединение для записи (и отдельное для файла пользователей)
         self.conn = None
+        self.users_conn = None
+        # Пул соединений только для чтения (WAL позволяет читать параллельно с записью)
+        self._read_pool = queue.LifoQueue()
+        self._read_conns_created = 0
+        self._read_pool_lock = threading.Lock()
+        self._local = threading.local()
+        # Статистика публикаций снимков расписания
+        self.publish_stats = {
+            'generation': None,
+            'build_ms': None,
+            'lock_hold_ms': None,
+            'max_lock_hold_ms': 0.0,
+            'publishes': 0,
+            'rollbacks': 0
+        }
+        # Время выполнения запросов, ожидание и удержание DB_LOCK, медленные запросы
+        self.query_stats = QueryStats()
+        # Изменения пользователей пишутся пачками фоновым потоком
+        self.user_writes = UserWriteQueue(self)
+        # Снимок расписания в памяти, через него идет чтение расписания; None - чтение из SQLite
+        self.schedule_store: Optional[ScheduleStore] = None
+        self._store_generations = itertools.count(1)
+        # Изменения расписания идут по одному: публикация готовит снимок без блокировки записи,
+        # и прочитанные ею строки не должны устареть до записи
+        self._schedule_lock = threading.RLock()
+        # Справочник пользователей в памяти для выбора получателей рассылок; None - выборка из SQLite
+        self.user_directory: Optional[UserDirectory] = None
         self._ensure_db_directory()
         self._init_db()
+        self.reload_schedule_store()
+        self.reload_user_directory()
 
     def _ensure_db_directory(self) -> None:
         """Создание директории для базы данных, если она не существует"""
-        db_dir = os.path.dirname(self.db_path)
-        if not os.path.exists(db_dir):
-            os.makedirs(db_dir, exist_ok=True)
+        for path in (self.db_path, self.users_db_path):
+            db_dir = os.path.dirname(path) if path else None
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir, exist_ok=True)
+
+    @staticmethod
+    def _connect_writer(path: str) -> sqlite3.Connection:
+        """Соединение для записи с общими для всех файлов параметрами"""
+        conn = sqlite3.connect(
+            path, 
+            timeout=60.0,
+            check_same_thread=False,
+            isolation_level=None  # Автоматические транзакции
+        )
+        conn.row_factory = sqlite3.Row
+        # Свободные страницы возвращаются порциями (PRAGMA incremental_vacuum) при обслуживании.
+        # Для новой базы режим должен быть задан до перехода в WAL, для старой он включается миграцией
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")  # Читатели не блокируются записью
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
 
     def _init_db(self) -> None:
         """Инициализация базы данных и создание таблиц"""
         with DB_LOCK:
             try:
-                # Путь к схеме базы данных
-                schema_path = Path(__file__).parent / "schema.sql"
-                if not schema_path.exists():
-                    raise FileNotFoundError(f"Файл схемы БД не найден: {schema_path}")
-                
                 # Проверяем существование старой базы данных и копируем ее при необходимости
                 old_db_path = "bot/database/bot.db"
                 if os.path.exists(old_db_path) and not os.path.exists(self.db_path):
@@ -69,30 +171,19 @@ class SQLiteDatabase:
                         logger.warning(f"Не удалось скопировать старую БД: {e}")
                 
                 # Подключение к базе данных
-                self.conn = sqlite3.connect(
-                    self.db_path, 
-                    timeout=60.0,
-                    check_same_thread=False,
-                    isolation_level=None  # Автоматические транзакции
-                )
-                self.conn.row_factory = sqlite3.Row
-                
-                # Оптимизация параметров базы данных
-                self.conn.execute("PRAGMA journal_mode=DELETE")  # Отключаем WAL для избежания блокировок
-                self.conn.execute("PRAGMA synchronous=NORMAL")
+                self.conn = self._connect_writer(self.db_path)
+                # Большой кэш под массовую запись расписания
                 self.conn.execute("PRAGMA cache_size=10000")
-                self.conn.execute("PRAGMA busy_timeout=30000")
+                # При переименовании таблиц снимка представление schedule должно ссылаться
+                # на рабочие имена таблиц, а не следовать за переименованной таблицей
+                self.conn.execute("PRAGMA legacy_alter_table=ON")
                 
-                # Проверяем существование таблиц
-                table_exists = self.conn.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name='users'"
-                ).fetchone()
-                
-                # Создаем таблицы, если они не существуют
-                if not table_exists:
-                    with open(schema_path, 'r', encoding='utf-8') as f:
-                        self.conn.executescript(f.read())
-                    logger.info("Созданы новые таблицы в базе данных")
+                self._run_migrations()
+                if self.users_db_path:
+                    with USERS_DB_LOCK:
+                        if self.users_conn is None:
+                            self._init_users_db()
+                        self._split_users_db()
                 
                 logger.info("База данных SQLite успешно инициализирована")
                 
@@ -106,29 +197,181 @@ class SQLiteDatabase:
                     self.conn = None
                 raise
     
-    def _ensure_connection(self):
-        """Проверяет и восстанавливает соединение при необходимости"""
+    def _init_users_db(self) -> None:
+        """Соединение для записи в файл пользователей (вызывается под USERS_DB_LOCK)"""
+        self.users_conn = self._connect_writer(self.users_db_path)
+        # Записи пользователей короткие и точечные: небольшого кэша достаточно
+        self.users_conn.execute("PRAGMA cache_size=2000")
+
+    def disable_sync_retries(self) -> None:
+        """
+        Отключение блокирующих повторов (time.sleep) для текущего потока.
+        Используется потоками асинхронного слоя, который повторяет запросы сам через asyncio.sleep.
+        """
+        self._local.no_sync_retries = True
+
+    def _max_retries(self) -> int:
+        """Количество повторов при блокировке БД для текущего потока"""
+        return 0 if getattr(self._local, 'no_sync_retries', False) else 5
+
+    def _lock(self, scope: str = 'main'):
+        """Блокировка записи области: своя у файла пользователей, иначе DB_LOCK"""
+        return USERS_DB_LOCK if scope == 'users' and self.users_db_path else DB_LOCK
+
+    def _scope_of(self, query: str) -> str:
+        """Область записи запроса: запросы к таблицам пользователей идут в файл пользователей"""
+        if self.users_db_path and USER_TABLES_PATTERN.search(query):
+            return 'users'
+        return 'main'
+
+    def _ensure_connection(self, scope: str = 'main') -> sqlite3.Connection:
+        """Открывает соединение для записи области, если оно еще не открыто"""
+        if scope == 'users' and self.users_db_path:
+            with USERS_DB_LOCK:
+                if self.users_conn is None:
+                    self._init_users_db()
+                return self.users_conn
         with DB_LOCK:
             if self.conn is None:
                 self._init_db()
-                return
-                
+            return self.conn
+
+    def _reset_connection(self, scope: str = 'main'):
+        """Сброс потерянного соединения для записи, следующий запрос откроет новое"""
+        with self._lock(scope):
+            logger.warning("Соединение с базой данных утеряно. Восстанавливаем...")
+            attribute = 'users_conn' if scope == 'users' and self.users_db_path else 'conn'
             try:
-                # Проверяем соединение простым запросом
-                self.conn.execute("SELECT 1").fetchone()
-            except (sqlite3.Error, AttributeError):
-                logger.warning("Соединение с базой данных утеряно. Восстанавливаем...")
+                if getattr(self, attribute):
+                    getattr(self, attribute).close()
+            except:
+                pass
+            setattr(self, attribute, None)
+
+    def _create_read_connection(self) -> sqlite3.Connection:
+        """Открытие соединения только для чтения"""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=60.0, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA cache_size=10000")
+        conn.execute("PRAGMA busy_timeout=30000")
+        if self.users_db_path:
+            # Таблицы пользователей есть только в подключенном файле, поэтому запросы
+            # без имени схемы (в том числе JOIN с расписанием) находят их там
+            users_uri = Path(self.users_db_path).resolve().as_uri() + "?mode=ro"
+            conn.execute(f"ATTACH DATABASE ? AS {USERS_SCHEMA}", (users_uri,))
+        return conn
+
+    @contextmanager
+    def _read_connection(self, timer=None):
+        """
+        Соединение из пула чтения. Не берет DB_LOCK и не открывает транзакцию записи.
+        Время ожидания свободного соединения добавляется к timer.lock_wait.
+        """
+        wait_start = time.perf_counter()
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            with self._read_pool_lock:
+                can_create = self._read_conns_created < READ_POOL_SIZE
+                if can_create:
+                    self._read_conns_created += 1
+            if can_create:
                 try:
-                    if self.conn:
-                        self.conn.close()
+                    if self.conn is None:
+                        # Файл БД и схема создаются соединением для записи
+                        self._ensure_connection()
+                    conn = self._create_read_connection()
+                except Exception:
+                    with self._read_pool_lock:
+                        self._read_conns_created -= 1
+                    raise
+            else:
+                conn = self._read_pool.get(timeout=60)
+        if timer is not None:
+            timer.lock_wait += time.perf_counter() - wait_start
+
+        broken = False
+        try:
+            yield conn
+        except (sqlite3.OperationalError, sqlite3.IntegrityError):
+            raise
+        except sqlite3.Error:
+            # Соединение повреждено или закрыто - не возвращаем его в пул
+            broken = True
+            raise
+        finally:
+            if broken:
+                try:
+                    conn.close()
                 except:
                     pass
-                self.conn = None
-                self._init_db()
+                with self._read_pool_lock:
+                    self._read_conns_created -= 1
+            else:
+                self._read_pool.put(conn)
+
+    @staticmethod
+    def _is_read_query(query: str) -> bool:
+        """Запрос только читает данные и может выполняться через пул чтения"""
+        head = query.lstrip().upper()
+        return head.startswith('SELECT') or head.startswith('EXPLAIN')
+
+    @staticmethod
+    def _fetch_result(cursor) -> Optional[List[Dict[str, Any]]]:
+        """Преобразование результата запроса в список словарей (None, если строк нет)"""
+        if not cursor.description:
+            return None
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _execute_read(self, query: str, params: tuple, timer) -> Optional[List[Dict[str, Any]]]:
+        """Выполнение SELECT через пул соединений только для чтения"""
+        retry_count = 0
+        max_retries = self._max_retries()
+        base_delay = 0.1
+
+        while True:
+            try:
+                with self._read_connection(timer) as conn:
+                    return self._fetch_result(conn.execute(query, params))
+            except sqlite3.OperationalError as e:
+                if "database is locked" in str(e).lower() and retry_count < max_retries:
+                    retry_count += 1
+                    timer.retries = retry_count
+                    delay = base_delay * (2 ** retry_count)  # Экспоненциальная задержка
+                    logger.warning(f"База данных заблокирована для чтения, повторная попытка {retry_count}/{max_retries} через {delay:.2f} сек")
+                    time.sleep(delay)
+                else:
+                    logger.error(f"Ошибка при выполнении запроса: {e}")
+                    raise
+            except Exception as e:
+                logger.error(f"Ошибка при выполнении запроса: {e}")
+                raise
 
     def close(self) -> None:
-        """Закрытие соединения с базой данных"""
+        """Закрытие соединений с базой данных"""
+        # Накопленные изменения пользователей записываются до закрытия (вне DB_LOCK: поток записи его берет)
+        if not self.user_writes.close(timeout=30):
+            logger.error("❌ Не удалось дождаться записи изменений пользователей перед закрытием БД")
+
         with DB_LOCK:
+            while True:
+                try:
+                    read_conn = self._read_pool.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    read_conn.close()
+                except Exception as e:
+                    logger.error(f"Ошибка при закрытии соединения чтения: {e}")
+            with self._read_pool_lock:
+                self._read_conns_created = 0
+
             if self.conn:
                 try:
                     self.conn.close()
@@ -138,65 +381,193 @@ class SQLiteDatabase:
                 finally:
                     self.conn = None
 
-    def create_backup(self) -> None:
-        """Создание резервной копии базы данных"""
-        with DB_LOCK:
-            self._ensure_connection()
+        with USERS_DB_LOCK:
+            if self.users_conn:
+                try:
+                    self.users_conn.close()
+                    logger.info("Соединение с базой пользователей закрыто")
+                except Exception as e:
+                    logger.error(f"Ошибка при закрытии соединения с базой пользователей: {e}")
+                finally:
+                    self.users_conn = None
+
+    def scope_path(self, scope: str = 'main') -> str:
+        """Файл базы данных области записи"""
+        return self.users_db_path if scope == 'users' and self.users_db_path else self.db_path
+
+    def create_backup(self, backup_path: str, pages: int = 64, pause: float = 0.01, scope: str = 'main') -> Dict[str, Any]:
+        """
+        Онлайн-копия базы данных (файла области scope) через sqlite3 backup API.
+
+        Копирование идет порциями по pages страниц через соединение записи. Блокировка
+        записи удерживается только на время одной порции, между порциями запись продолжается;
+        изменения, сделанные через это же соединение, SQLite переносит в копию сам,
+        поэтому копирование не начинается заново.
+
+        Returns:
+            dict: длительность, суммарное и максимальное время блокировки записи, число порций
+        """
+        start = time.perf_counter()
+        steps = 0
+        blocked = 0.0
+        max_blocked = 0.0
+        step_start = None
+        lock = self._lock(scope)
+
+        def progress(status, remaining, total):
+            nonlocal steps, blocked, max_blocked, step_start
+            step_ms = (time.perf_counter() - step_start) * 1000
+            steps += 1
+            blocked += step_ms
+            max_blocked = max(max_blocked, step_ms)
+            # Отпускаем запись между порциями
+            lock.release()
             try:
-                # Создаем директорию для резервных копий
-                backup_dir = os.path.join(os.path.dirname(self.db_path), "backups")
-                os.makedirs(backup_dir, exist_ok=True)
-                
-                # Имя файла с текущей датой и временем
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_path = os.path.join(backup_dir, f"bot_{timestamp}.db")
-                
-                # Закрываем соединение перед копированием
-                self.conn.execute("PRAGMA wal_checkpoint(FULL)")
-                
-                # Простое копирование файла
-                shutil.copy2(self.db_path, backup_path)
-                logger.info(f"Резервная копия базы данных создана: {backup_path}")
-                
-                # Очистка старых резервных копий (оставляем последние 5)
-                backup_files = sorted([
-                    os.path.join(backup_dir, f) 
-                    for f in os.listdir(backup_dir) 
-                    if f.endswith('.db')
-                ])
-                
-                if len(backup_files) > 5:
-                    for old_file in backup_files[:-5]:
-                        os.remove(old_file)
-                        logger.info(f"Удалена устаревшая резервная копия: {old_file}")
-                        
-            except Exception as e:
-                logger.error(f"Ошибка при создании резервной копии: {e}")
+                if remaining and pause:
+                    time.sleep(pause)
+            finally:
+                lock.acquire()
+                step_start = time.perf_counter()
+
+        target = sqlite3.connect(backup_path)
+        try:
+            lock.acquire()
+            try:
+                conn = self._ensure_connection(scope)
+                step_start = time.perf_counter()
+                conn.backup(target, pages=pages, progress=progress)
+                step_ms = (time.perf_counter() - step_start) * 1000
+                blocked += step_ms
+                max_blocked = max(max_blocked, step_ms)
+            finally:
+                lock.release()
+        finally:
+            target.close()
+
+        return {
+            'duration_ms': (time.perf_counter() - start) * 1000,
+            'blocked_ms': blocked,
+            'max_blocked_ms': max_blocked,
+            'steps': steps
+        }
+
+    def get_storage_stats(self, scope: str = 'main') -> Dict[str, Any]:
+        """Число страниц, свободные страницы и размеры файлов базы и WAL"""
+        schema = USERS_SCHEMA if scope == 'users' and self.users_db_path else 'main'
+        # Прагмы читаются через соединение чтения: файл пользователей подключен к нему как users_db
+        with self._read_connection() as conn:
+            stats = {
+                pragma: conn.execute(f"PRAGMA {schema}.{pragma}").fetchone()[0]
+                for pragma in ('page_count', 'freelist_count', 'page_size')
+            }
+        db_path = self.scope_path(scope)
+        wal_path = db_path + "-wal"
+        stats['db_kb'] = round(os.path.getsize(db_path) / 1024) if os.path.exists(db_path) else 0
+        stats['wal_kb'] = round(os.path.getsize(wal_path) / 1024) if os.path.exists(wal_path) else 0
+        return stats
+
+    def optimize(self, scope: str = 'main') -> None:
+        """PRAGMA optimize с ограничением объема анализа, чтобы не держать запись долго"""
+        with self._lock(scope):
+            conn = self._ensure_connection(scope)
+            conn.executescript("PRAGMA analysis_limit=400; PRAGMA optimize;")
+
+    def incremental_vacuum(self, pages: int, scope: str = 'main') -> int:
+        """
+        Возврат до pages свободных страниц файловой системе одной короткой транзакцией.
+        Возвращает число освобожденных страниц.
+        """
+        with self._lock(scope):
+            conn = self._ensure_connection(scope)
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not before:
+                return 0
+            try:
+                # execute() выполняет только первый шаг прагмы и освобождает одну страницу
+                conn.executescript(f"BEGIN IMMEDIATE; PRAGMA incremental_vacuum({int(pages)}); COMMIT;")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def checkpoint(self, mode: str = 'PASSIVE', scope: str = 'main') -> Dict[str, int]:
+        """
+        Контрольная точка WAL без ожидания читателей: если файл занят,
+        переносится только доступная часть журнала.
+        """
+        with self._lock(scope):
+            conn = self._ensure_connection(scope)
+            conn.execute("PRAGMA busy_timeout=0")
+            try:
+                busy, log, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            finally:
+                conn.execute("PRAGMA busy_timeout=30000")
+        return {'busy': busy, 'log': log, 'checkpointed': checkpointed}
+
+    def integrity_check(self, full: bool = False, time_budget: float = 30.0, scope: str = 'main') -> Optional[str]:
+        """
+        Проверка целостности на соединении чтения (запись не блокируется).
+        quick_check по умолчанию, integrity_check при full=True. Возвращает 'ok',
+        текст найденных ошибок или None, если проверка не уложилась в time_budget секунд.
+        """
+        deadline = time.monotonic() + time_budget
+        pragma = "integrity_check" if full else "quick_check"
+        schema = USERS_SCHEMA if scope == 'users' and self.users_db_path else 'main'
+        with self._read_connection() as conn:
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+            try:
+                rows = conn.execute(f"PRAGMA {schema}.{pragma}(20)").fetchall()
+            except sqlite3.OperationalError as e:
+                if "interrupted" in str(e).lower():
+                    return None
+                raise
+            finally:
+                conn.set_progress_handler(None, 0)
+        return '; '.join(row[0] for row in rows)
 
     def execute_query(self, query: str, params: tuple = ()) -> Optional[List[Dict[str, Any]]]:
         """Выполнение SQL-запроса с повторными попытками при блокировке"""
+        timer = self.query_stats.start(query)
+        try:
+            result = self._execute_query(query, params, timer)
+        except Exception:
+            self.query_stats.finish(timer, error=True)
+            raise
+        self.query_stats.finish(timer, rows=len(result) if result else 0)
+        return result
+
+    def _execute_query(self, query: str, params: tuple, timer) -> Optional[List[Dict[str, Any]]]:
+        transaction_conn = getattr(self._local, 'transaction_conn', None)
+
+        # Чтение идет через пул соединений без глобальной блокировки
+        if self._is_read_query(query) and transaction_conn is None:
+            return self._execute_read(query, params, timer)
+
+        # Запрос внутри уже открытой транзакции transaction() в этом потоке
+        if transaction_conn is not None:
+            return self._fetch_result(transaction_conn.execute(query, params))
+
+        scope = self._scope_of(query)
+        conn = None
         retry_count = 0
-        max_retries = 5
+        max_retries = self._max_retries()
         base_delay = 0.5
         result = None
+        reconnected = False
         
         while retry_count <= max_retries:
             try:
-                with DB_LOCK:
-                    self._ensure_connection()
+                with timer.locked(self._lock(scope)):
+                    conn = self._ensure_connection(scope)
                     
-                    cursor = self.conn.cursor()
+                    cursor = conn.cursor()
                     cursor.execute("BEGIN IMMEDIATE")
                     
                     cursor.execute(query, params)
+                    result = self._fetch_result(cursor)
                     
-                    if query.strip().upper().startswith('SELECT'):
-                        rows = cursor.fetchall()
-                        if rows and cursor.description:
-                            columns = [column[0] for column in cursor.description]
-                            result = [dict(zip(columns, row)) for row in rows]
-                    
-                    self.conn.execute("COMMIT")
+                    conn.execute("COMMIT")
                     
                 return result
                 
@@ -205,23 +576,33 @@ class SQLiteDatabase:
                 
                 # Попытка отката транзакции
                 try:
-                    self.conn.execute("ROLLBACK")
+                    conn.execute("ROLLBACK")
                 except:
                     pass
                 
                 if "database is locked" in error_msg and retry_count < max_retries:
                     retry_count += 1
+                    timer.retries = retry_count
                     delay = base_delay * (2 ** retry_count)  # Экспоненциальная задержка
                     logger.warning(f"База данных заблокирована, повторная попытка {retry_count}/{max_retries} через {delay:.2f} сек")
                     time.sleep(delay)
                 else:
                     logger.error(f"Ошибка при выполнении запроса: {e}")
                     raise
+
+            except (sqlite3.ProgrammingError, sqlite3.InterfaceError) as e:
+                # Соединение закрыто или испорчено - переоткрываем и повторяем
+                self._reset_connection(scope)
+                if not reconnected:
+                    reconnected = True
+                    continue
+                logger.error(f"Ошибка при выполнении запроса: {e}")
+                raise
                     
             except Exception as e:
                 # Попытка отката транзакции
                 try:
-                    self.conn.execute("ROLLBACK")
+                    conn.execute("ROLLBACK")
                 except:
                     pass
                     
@@ -235,22 +616,40 @@ class SQLiteDatabase:
         """Выполнение множества SQL-запросов с одинаковой структурой"""
         if not params_list:
             return
+
+        timer = self.query_stats.start(query)
+        try:
+            self._execute_many(query, params_list, timer)
+        except Exception:
+            self.query_stats.finish(timer, error=True)
+            raise
+        self.query_stats.finish(timer)
+
+    def _execute_many(self, query: str, params_list: List[tuple], timer) -> None:
+        # Запросы внутри уже открытой транзакции transaction() в этом потоке
+        transaction_conn = getattr(self._local, 'transaction_conn', None)
+        if transaction_conn is not None:
+            transaction_conn.executemany(query, params_list)
+            return
             
+        scope = self._scope_of(query)
+        conn = None
         retry_count = 0
-        max_retries = 5
+        max_retries = self._max_retries()
         base_delay = 0.5
+        reconnected = False
         
         while retry_count <= max_retries:
             try:
-                with DB_LOCK:
-                    self._ensure_connection()
+                with timer.locked(self._lock(scope)):
+                    conn = self._ensure_connection(scope)
                     
-                    cursor = self.conn.cursor()
+                    cursor = conn.cursor()
                     cursor.execute("BEGIN IMMEDIATE")
                     
                     cursor.executemany(query, params_list)
                     
-                    self.conn.execute("COMMIT")
+                    conn.execute("COMMIT")
                     
                 return
                 
@@ -259,23 +658,33 @@ class SQLiteDatabase:
                 
                 # Попытка отката транзакции
                 try:
-                    self.conn.execute("ROLLBACK")
+                    conn.execute("ROLLBACK")
                 except:
                     pass
                 
                 if "database is locked" in error_msg and retry_count < max_retries:
                     retry_count += 1
+                    timer.retries = retry_count
                     delay = base_delay * (2 ** retry_count)  # Экспоненциальная задержка
                     logger.warning(f"База данных заблокирована, повторная попытка {retry_count}/{max_retries} через {delay:.2f} сек")
                     time.sleep(delay)
                 else:
                     logger.error(f"Ошибка при выполнении множества запросов: {e}")
                     raise
+
+            except (sqlite3.ProgrammingError, sqlite3.InterfaceError) as e:
+                # Соединение закрыто или испорчено - переоткрываем и повторяем
+                self._reset_connection(scope)
+                if not reconnected:
+                    reconnected = True
+                    continue
+                logger.error(f"Ошибка при выполнении множества запросов: {e}")
+                raise
                     
             except Exception as e:
                 # Попытка отката транзакции
                 try:
-                    self.conn.execute("ROLLBACK")
+                    conn.execute("ROLLBACK")
                 except:
                     pass
                     
@@ -285,25 +694,69 @@ class SQLiteDatabase:
         # Если все попытки исчерпаны
         raise sqlite3.OperationalError("Не удалось выполнить запросы из-за блокировки базы данных")
 
-    # Методы для работы с пользователями
-    def create_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None, role: str = 'student') -> None:
-        """Создание нового пользователя"""
-        query = """
-        INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, role)
-        VALUES (?, ?, ?, ?, ?)
+    @contextmanager
+    def transaction(self, name: str, scope: str = 'main'):
         """
-        self.execute_query(query, (user_id, username, first_name, last_name, role))
-        
-        # Создаем настройки пользователя
-        query = """
-        INSERT OR IGNORE INTO user_settings (user_id)
-        VALUES (?)
+        Транзакция BEGIN IMMEDIATE для нескольких запросов.
+        При исключении внутри блока все изменения откатываются.
+        name - имя транзакции в статистике запросов,
+        scope='users' - транзакция в файле пользователей (при раздельных файлах)
         """
-        self.execute_query(query, (user_id,))
+        retry_count = 0
+        max_retries = self._max_retries()
+        base_delay = 0.5
+        timer = self.query_stats.start(f"<транзакция {name}>")
+        failed = True
+
+        try:
+            with timer.locked(self._lock(scope)):
+                while True:
+                    conn = self._ensure_connection(scope)
+                    try:
+                        conn.execute("BEGIN IMMEDIATE")
+                        break
+                    except sqlite3.OperationalError as e:
+                        if "database is locked" in str(e).lower() and retry_count < max_retries:
+                            retry_count += 1
+                            timer.retries = retry_count
+                            delay = base_delay * (2 ** retry_count)  # Экспоненциальная задержка
+                            logger.warning(f"База данных заблокирована, повторная попытка {retry_count}/{max_retries} через {delay:.2f} сек")
+                            time.sleep(delay)
+                        else:
+                            logger.error(f"Ошибка при начале транзакции: {e}")
+                            raise
+
+                cursor = conn.cursor()
+                self._local.transaction_conn = conn
+                try:
+                    yield cursor
+                    conn.execute("COMMIT")
+                    failed = False
+                except Exception as e:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except:
+                        pass
+                    logger.error(f"Ошибка в транзакции, изменения отменены: {e}")
+                    raise
+                finally:
+                    self._local.transaction_conn = None
+        finally:
+            self.query_stats.finish(timer, error=failed)
+
+    # Методы для работы с пользователями
+    def create_user(self, user_id: int, username: str = None, first_name: str = None, last_name: str = None, role: str = 'student') -> None:
+        """Создание нового пользователя (запись отложена, см. UserWriteQueue)"""
+        self.user_writes.put(user_id, create=(username, first_name, last_name, role))
+        directory = self.user_directory
+        if directory is not None:
+            directory.add(user_id, role)
         logger.info(f"Пользователь {user_id} создан")
 
     def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        """Получение информации о пользователе"""
+        """Получение информации о пользователе с учетом еще не записанных изменений"""
+        # Очередь читается до запроса: изменение, записанное между ними, уже будет в прочитанной строке
+        pending = self.user_writes.pending_for(user_id)
         query = """
         SELECT u.*, us.selected_group, us.selected_teacher, us.notifications_enabled
         FROM users u
@@ -311,109 +764,392 @@ class SQLiteDatabase:
         WHERE u.user_id = ?
         """
         result = self.execute_query(query, (user_id,))
-        return result[0] if result else None
+        user = result[0] if result else None
+
+        for change in pending:
+            if user is None:
+                if change.create is None:
+                    continue
+                # Пользователь еще не записан: строка со значениями по умолчанию из schema.sql
+                username, first_name, last_name, role = change.create
+                now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+                user = {
+                    'user_id': user_id, 'username': username, 'first_name': first_name,
+                    'last_name': last_name, 'role': role, 'created_at': now, 'last_active': now,
+                    'is_banned': 0, 'ban_reason': None, 'ban_date': None,
+                    'selected_group': None, 'selected_teacher': None, 'notifications_enabled': 1
+                }
+            user.update(change.user)
+            user.update(change.settings)
+        return user
 
     def update_user(self, user_id: int, **kwargs) -> None:
-        """Обновление данных пользователя"""
-        valid_fields = {'username', 'first_name', 'last_name', 'role'}
-        update_fields = {k: v for k, v in kwargs.items() if k in valid_fields}
+        """Обновление данных пользователя (запись отложена, см. UserWriteQueue)"""
+        update_fields = {k: v for k, v in kwargs.items() if k in USER_FIELDS}
         
         if not update_fields:
             return
 
-        query = f"""
-        UPDATE users
-        SET {', '.join(f'{k} = ?' for k in update_fields)}
-        WHERE user_id = ?
-        """
-        params = tuple(update_fields.values()) + (user_id,)
-        self.execute_query(query, params)
+        self.user_writes.put(user_id, user=update_fields)
+        directory = self.user_directory
+        if directory is not None:
+            directory.update(user_id, **update_fields)
         logger.info(f"Данные пользователя {user_id} обновлены")
 
     def update_user_settings(self, user_id: int, **kwargs) -> None:
-        """Обновление настроек пользователя"""
-        valid_fields = {'selected_group', 'selected_teacher', 'notifications_enabled'}
-        update_fields = {k: v for k, v in kwargs.items() if k in valid_fields}
+        """Обновление настроек пользователя (запись отложена, см. UserWriteQueue)"""
+        update_fields = {k: v for k, v in kwargs.items() if k in USER_SETTINGS_FIELDS}
         
         if not update_fields:
             return
 
-        query = f"""
-        UPDATE user_settings
-        SET {', '.join(f'{k} = ?' for k in update_fields)}
-        WHERE user_id = ?
-        """
-        params = tuple(update_fields.values()) + (user_id,)
-        self.execute_query(query, params)
+        self.user_writes.put(user_id, settings=update_fields)
+        directory = self.user_directory
+        if directory is not None:
+            directory.update(user_id, **update_fields)
         logger.info(f"Настройки пользователя {user_id} обновлены")
 
+    def flush_user_writes(self, timeout: Optional[float] = None) -> bool:
+        """Запись всех накопленных изменений пользователей"""
+        return self.user_writes.flush(timeout)
+
     def delete_user(self, user_id: int) -> None:
         """Удаление пользователя"""
+        # Запись, начатая до удаления, завершается раньше DELETE; ожидающие изменения отменяются
+        self.user_writes.discard(user_id)
+        self.user_writes.flush()
         query = "DELETE FROM users WHERE user_id = ?"
         self.execute_query(query, (user_id,))
+        directory = self.user_directory
+        if directory is not None:
+            directory.remove(user_id)
         logger.info(f"Пользователь {user_id} удален")
 
+    def reload_user_directory(self) -> Optional[UserDirectory]:
+        """
+        Полная загрузка справочника пользователей в память (при запуске и после массовых
+        изменений в обход методов пользователей). Дальше справочник обновляют create_user,
+        update_user, update_user_settings и delete_user; при ошибке выборки идут в SQLite
+        """
+        try:
+            start = time.perf_counter()
+            # Накопленные изменения должны попасть в прочитанные строки
+            self.flush_user_writes()
+            rows = self.iter_users(batch_size=5000, columns=USER_DIRECTORY_COLUMNS)
+            if self.user_directory is None:
+                self.user_directory = UserDirectory(rows)
+            else:
+                self.user_directory.replace(rows)
+            stats = self.user_directory.get_stats()
+            logger.info(
+                f"👥 Пользователи загружены в память: {stats['users']}, групп {stats['groups']}, "
+                f"{stats['total_kb']:.0f} КБ, загрузка {(time.perf_counter() - start) * 1000:.1f} мс"
+            )
+            return self.user_directory
+        except Exception as e:
+            self.user_directory = None
+            logger.error(f"Ошибка при загрузке пользователей в память: {e}")
+            return None
+
+    def select_user_ids(self, **filters) -> List[int]:
+        """
+        ID пользователей с фильтрами role, group, notifications_enabled, banned.
+        Выборка идет по справочнику в памяти, без него - запросом к SQLite
+        """
+        directory = self.user_directory
+        if directory is not None:
+            return directory.select(**filters)
+        return [user['user_id'] for user in self.iter_users(batch_size=5000, columns=['user_id'], **filters)]
+
+    @staticmethod
+    def _user_filters(role=None, group: str = None, notifications_enabled: bool = None,
+                      banned: bool = None) -> Tuple[List[str], list]:
+        """Условия WHERE для выборок пользователей; role - одно значение или список"""
+        conditions, params = [], []
+        if role is not None:
+            roles = [role] if isinstance(role, str) else list(role)
+            conditions.append(f"u.role IN ({', '.join('?' * len(roles))})")
+            params.extend(roles)
+        if group is not None:
+            conditions.append("us.selected_group = ?")
+            params.append(group)
+        if notifications_enabled is not None:
+            conditions.append("us.notifications_enabled = ?")
+            params.append(int(notifications_enabled))
+        if banned is not None:
+            conditions.append("u.is_banned = ?")
+            params.append(int(banned))
+        return conditions, params
+
+    def get_users_page(self, after_id: int = 0, limit: int = 500, columns=None, **filters) -> List[Dict[str, Any]]:
+        """
+        Страница пользователей с user_id > after_id по возрастанию user_id (keyset).
+        columns - нужные колонки из USER_SCAN_COLUMNS (user_id возвращается всегда),
+        filters - role, group, notifications_enabled.
+        """
+        columns = [column for column in (columns or USER_SCAN_COLUMNS) if column != 'user_id']
+        unknown = set(columns) - set(USER_SCAN_COLUMNS)
+        if unknown:
+            raise ValueError(f"Неизвестные колонки пользователей: {', '.join(sorted(unknown))}")
+
+        conditions, params = self._user_filters(**filters)
+        query = f"""
+        SELECT {', '.join(f'{USER_SCAN_COLUMNS[column]} AS {column}' for column in ['user_id'] + columns)}
+        FROM users u
+        LEFT JOIN user_settings us ON u.user_id = us.user_id
+        WHERE {' AND '.join(['u.user_id > ?'] + conditions)}
+        ORDER BY u.user_id
+        LIMIT ?
+        """
+        return self.execute_query(query, (after_id, *params, limit)) or []
+
+    def iter_users(self, batch_size: int = 500, columns=None, **filters):
+        """
+        Обход пользователей страницами по user_id: в памяти одна страница, каждая страница -
+        отдельный короткий запрос чтения. Изменения из очереди записи не учитываются.
+        """
+        after_id = 0
+        while True:
+            page = self.get_users_page(after_id, batch_size, columns, **filters)
+            yield from page
+            if len(page) < batch_size:
+                break
+            after_id = page[-1]['user_id']
+
+    def count_users(self, **filters) -> int:
+        """Количество пользователей с фильтрами role, group, notifications_enabled, banned"""
+        directory = self.user_directory
+        if directory is not None:
+            return directory.count(**filters)
+        conditions, params = self._user_filters(**filters)
+        query = """
+        SELECT COUNT(*) AS count
+        FROM users u
+        LEFT JOIN user_settings us ON u.user_id = us.user_id
+        """
+        if conditions:
+            query += f"WHERE {' AND '.join(conditions)}"
+        result = self.execute_query(query, tuple(params))
+        return result[0]['count'] if result else 0
+
+    def get_user_stats(self) -> Dict[str, Any]:
+        """
+        Сводная статистика пользователей из счетчиков user_stats: всего, с уведомлениями,
+        забаненных, по ролям и по выбранным группам внутри каждой роли
+        """
+        rows = self.execute_query(
+            "SELECT role, selected_group, notifications_enabled, is_banned, count FROM user_stats WHERE count > 0"
+        ) or []
+        stats = {'total': 0, 'notifications': 0, 'banned': 0, 'roles': {}, 'groups': {}}
+        for row in rows:
+            count = row['count']
+            stats['total'] += count
+            stats['notifications'] += count if row['notifications_enabled'] else 0
+            stats['banned'] += count if row['is_banned'] else 0
+            stats['roles'][row['role']] = stats['roles'].get(row['role'], 0) + count
+            if row['selected_group']:
+                groups = stats['groups'].setdefault(row['role'], {})
+                groups[row['selected_group']] = groups.get(row['selected_group'], 0) + count
+        return stats
+
+    def rebuild_user_stats(self) -> None:
+        """Пересчет счетчиков user_stats по таблицам пользователей"""
+        self.user_writes.flush()
+        with self.transaction('rebuild_user_stats', 'users') as cursor:
+            for statement in REBUILD_USER_STATS:
+                cursor.execute(statement)
+        logger.info("Счетчики пользователей пересчитаны")
+
+    @staticmethod
+    def _intern_names(cursor, table: str, names) -> Dict[str, int]:
+        """Id справочника для каждого имени; отсутствующие имена добавляются. Пустые имена не хранятся"""
+        id_column, name_column = DIMENSIONS[table]
+        names = {name for name in names if name}
+        if not names:
+            return {}
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {table} ({name_column}) VALUES (?)",
+            [(name,) for name in sorted(names)]
+        )
+        return {
+            row[1]: row[0]
+            for row in cursor.execute(f"SELECT {id_column}, {name_column} FROM {table}")
+            if row[1] in names
+        }
+
     # Методы для работы с расписанием
     def add_schedule(self, date: str, group_name: str, teacher_name: str, 
                     lesson_number: int, discipline: str, classroom: str, 
                     subgroup: str = '0') -> None:
         """Добавление записи в расписание"""
-        # Проверяем/добавляем группу
-        self.execute_query(
-            "INSERT OR IGNORE INTO groups (group_name) VALUES (?)",
-            (group_name,)
-        )
-        
-        # Проверяем/добавляем преподавателя
-        self.execute_query(
-            "INSERT OR IGNORE INTO teachers (full_name) VALUES (?)",
-            (teacher_name,)
-        )
-        
-        # Добавляем запись в расписание
-        query = """
-        INSERT INTO schedule 
-        (date, group_name, teacher_name, lesson_number, discipline, classroom, subgroup)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        self.execute_query(query, (
-            date, group_name, teacher_name, lesson_number, 
-            discipline, classroom, subgroup
-        ))
+        with self._schedule_lock, self.transaction('add_schedule') as cursor:
+            # Проверяем/добавляем группу, преподавателя, дисциплину и аудиторию
+            ids = {
+                column: self._intern_names(cursor, table, [value]).get(value)
+                for column, table, value in (
+                    ('group_id', 'groups', group_name),
+                    ('teacher_id', 'teachers', teacher_name),
+                    ('discipline_id', 'disciplines', discipline),
+                    ('classroom_id', 'classrooms', classroom)
+                )
+            }
+
+            # Добавляем запись в расписание
+            cursor.execute(
+                """
+                INSERT INTO lessons
+                (date, iso_date, weekday, group_id, teacher_id, discipline_id, classroom_id, lesson_number, subgroup)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    date, schedule_calendar.to_iso(date), schedule_calendar.weekday_of(date),
+                    ids['group_id'], ids['teacher_id'], ids['discipline_id'], ids['classroom_id'],
+                    lesson_number, subgroup
+                )
+            )
+        self.reload_schedule_store()
         logger.info(f"Добавлено расписание для группы {group_name} на {date}")
 
-    def get_schedule_by_group(self, group_name: str, date: str = None) -> List[Dict[str, Any]]:
-        """Получение расписания для группы"""
-        query = """
-        SELECT *
+    def reload_schedule_store(self) -> Optional[ScheduleStore]:
+        """
+        Пересборка снимка расписания в памяти после изменения расписания в БД.
+        Новый снимок строится целиком и заменяет старый одной операцией присваивания;
+        при ошибке снимок отключается и чтение идет из SQLite
+        """
+        try:
+            store = ScheduleStore(
+                self.execute_query(SCHEDULE_STORE_QUERY) or [],
+                generation=next(self._store_generations)
+            )
+            self.schedule_store = store
+            stats = store.get_stats()
+            logger.info(
+                f"🗂️ Расписание загружено в память (снимок {stats['generation']}): пар {stats['lessons']}, групп {stats['groups']}, "
+                f"преподавателей {stats['teachers']}, дат {stats['dates']}, строк {stats['strings']}, "
+                f"{stats['arrays_kb'] + stats['strings_kb']:.0f} КБ, сборка {stats['build_ms']:.1f} мс"
+            )
+            return store
+        except Exception as e:
+            self.schedule_store = None
+            logger.error(f"Ошибка при загрузке расписания в память: {e}")
+            return None
+
+    def get_schedule_by_group(self, group_name: str, date: str = None, weekday: int = None) -> List[Dict[str, Any]]:
+        """Получение расписания для группы (weekday: 0 - понедельник)"""
+        store = self.schedule_store
+        if store is not None:
+            return store.by_group(group_name, date, weekday)
+        query = f"""
+        SELECT {LESSON_COLUMNS}
         FROM schedule
-        WHERE group_name = ?
+        WHERE group_id = (SELECT group_id FROM groups WHERE group_name = ?)
         """
         params = [group_name]
         
         if date:
             query += " AND date = ?"
             params.append(date)
+
+        if weekday is not None:
+            query += " AND weekday = ?"
+            params.append(weekday)
             
-        query += " ORDER BY date, lesson_number"
+        query += " ORDER BY iso_date, lesson_number"
         return self.execute_query(query, tuple(params)) or []
 
-    def get_schedule_by_teacher(self, teacher_name: str, date: str = None) -> List[Dict[str, Any]]:
-        """Получение расписания для преподавателя"""
-        query = """
-        SELECT *
+    def get_schedule_by_teacher(self, teacher_name: str, date: str = None, weekday: int = None) -> List[Dict[str, Any]]:
+        """Получение расписания для преподавателя (weekday: 0 - понедельник)"""
+        store = self.schedule_store
+        if store is not None:
+            return store.by_teacher(teacher_name, date, weekday)
+        query = f"""
+        SELECT {LESSON_COLUMNS}
         FROM schedule
-        WHERE teacher_name = ?
+        WHERE teacher_id = (SELECT teacher_id FROM teachers WHERE full_name = ?)
         """
         params = [teacher_name]
         
         if date:
             query += " AND date = ?"
             params.append(date)
+
+        if weekday is not None:
+            query += " AND weekday = ?"
+            params.append(weekday)
             
-        query += " ORDER BY date, lesson_number"
+        query += " ORDER BY iso_date, lesson_number"
         return self.execute_query(query, tuple(params)) or []
 
+    def iter_schedule(self, batch_size: int = 500):
+        """
+        Потоковое чтение всего расписания одним упорядоченным запросом.
+        Строки отдаются пачками через fetchmany, соединение чтения занято до конца обхода.
+        """
+        with self._read_connection() as conn:
+            cursor = conn.execute(
+                """
+                SELECT date, group_name, lesson_number, discipline, teacher_name, classroom, subgroup
+                FROM schedule
+                ORDER BY iso_date, date, group_id, lesson_number
+                """
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def get_full_schedule(self) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Все расписание в виде {дата: {группа: [пары]}}, сгруппированное за один проход"""
+        store = self.schedule_store
+        if store is not None:
+            return store.full_schedule()
+        schedule = {}
+        current_date = current_group = None
+        lessons = None
+        for row in self.iter_schedule():
+            if row['date'] != current_date or row['group_name'] != current_group:
+                current_date, current_group = row['date'], row['group_name']
+                lessons = schedule.setdefault(current_date, {}).setdefault(current_group, [])
+            lessons.append({
+                'number': row['lesson_number'],
+                'discipline': row['discipline'],
+                'teacher': row['teacher_name'],
+                'classroom': row['classroom'],
+                'subgroup': row['subgroup'] or '0'
+            })
+        return schedule
+
+    def get_schedule_dates(self) -> List[Dict[str, Any]]:
+        """Список дат расписания без самих пар: [{'date': '17-июнь', 'iso_date': '2025-06-17'}]"""
+        store = self.schedule_store
+        if store is not None:
+            return store.schedule_dates()
+        query = """
+        SELECT date, iso_date
+        FROM schedule
+        GROUP BY iso_date, date
+        ORDER BY iso_date, date
+        """
+        return self.execute_query(query) or []
+
+    def has_schedule(self, group_name: str = None, teacher_name: str = None) -> bool:
+        """Есть ли в базе хотя бы одна пара для группы или преподавателя"""
+        store = self.schedule_store
+        if store is not None:
+            return store.has_group(group_name) if group_name else store.has_teacher(teacher_name)
+        if group_name:
+            result = self.execute_query(
+                "SELECT 1 FROM lessons WHERE group_id = (SELECT group_id FROM groups WHERE group_name = ?) LIMIT 1",
+                (group_name,)
+            )
+        else:
+            result = self.execute_query(
+                "SELECT 1 FROM lessons WHERE teacher_id = (SELECT teacher_id FROM teachers WHERE full_name = ?) LIMIT 1",
+                (teacher_name,)
+            )
+        return bool(result)
+
     def update_schedule(self, schedule_id: int, **kwargs) -> None:
         """Обновление записи в расписании"""
         valid_fields = {'date', 'group_name', 'teacher_name', 'lesson_number', 
@@ -423,93 +1159,53 @@ class SQLiteDatabase:
         if not update_fields:
             return
 
-        query = f"""
-        UPDATE schedule
-        SET {', '.join(f'{k} = ?' for k in update_fields)}
-        WHERE schedule_id = ?
-        """
-        params = tuple(update_fields.values()) + (schedule_id,)
-        self.execute_query(query, params)
+        with self._schedule_lock, self.transaction('update_schedule') as cursor:
+            # Строковые поля хранятся в справочниках, в паре - только их id
+            for column, table in LESSON_DIMENSIONS.items():
+                if column in update_fields:
+                    value = update_fields.pop(column)
+                    update_fields[DIMENSIONS[table][0]] = (
+                        self._intern_names(cursor, table, [value]).get(value)
+                    )
+
+            if 'date' in update_fields:
+                update_fields['iso_date'] = schedule_calendar.to_iso(update_fields['date'])
+                update_fields['weekday'] = schedule_calendar.weekday_of(update_fields['date'])
+
+            query = f"""
+            UPDATE lessons
+            SET {', '.join(f'{k} = ?' for k in update_fields)}, updated_at = CURRENT_TIMESTAMP
+            WHERE lesson_id = ?
+            """
+            cursor.execute(query, tuple(update_fields.values()) + (schedule_id,))
+        self.reload_schedule_store()
         logger.info(f"Расписание с ID {schedule_id} обновлено")
 
     def delete_schedule(self, schedule_id: int) -> None:
         """Удаление записи из расписания"""
-        query = "DELETE FROM schedule WHERE schedule_id = ?"
-        self.execute_query(query, (schedule_id,))
+        query = "DELETE FROM lessons WHERE lesson_id = ?"
+        with self._schedule_lock:
+            self.execute_query(query, (schedule_id,))
+        self.reload_schedule_store()
         logger.info(f"Расписание с ID {schedule_id} удалено")
 
     def clear_schedule(self, date: str = None) -> None:
         """Очистка всего расписания или на конкретную дату"""
-        if date:
-            query = "DELETE FROM schedule WHERE date = ?"
-            self.execute_query(query, (date,))
-            logger.info(f"Расписание на {date} очищено")
-        else:
-            query = "DELETE FROM schedule"
-            self.execute_query(query)
-            logger.info("Все расписание очищено")
+        with self._schedule_lock:
+            if date:
+                query = "DELETE FROM lessons WHERE date = ?"
+                self.execute_query(query, (date,))
+                logger.info(f"Расписание на {date} очищено")
+            else:
+                query = "DELETE FROM lessons"
+                self.execute_query(query)
+                logger.info("Все расписание очищено")
+        self.reload_schedule_store()
 
-    def save_groups(self, groups: List[str]) -> None:
-        """Сохранение списка групп в базу данных"""
-        try:
-            # Очищаем текущий список групп
-            self.execute_query("DELETE FROM groups")
-            
-            # Добавляем новые группы
-            query = "INSERT INTO groups (group_name) VALUES (?)"
-            self.execute_many(query, [(group,) for group in groups])
-            logger.info(f"Сохранено {len(groups)} групп в SQLite")
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении групп: {e}")
-            raise
-
-    def save_teachers(self, teachers: List[str]) -> None:
-        """Сохранение списка преподавателей в базу данных"""
-        try:
-            # Очищаем текущий список преподавателей
-            self.execute_query("DELETE FROM teachers")
-            
-            # Добавляем новых преподавателей
-            query = "INSERT INTO teachers (full_name) VALUES (?)"
-            self.execute_many(query, [(teacher,) for teacher in teachers])
-            logger.info(f"Сохранено {len(teachers)} преподавателей в SQLite")
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении преподавателей: {e}")
-            raise
-
-    def save_schedule(self, schedule_data: Dict[str, Dict[str, List[Dict]]]) -> None:
-        """Сохранение расписания в базу данных"""
-        try:
-            # Очищаем текущее расписание
-            self.execute_query("DELETE FROM schedule")
-            
-            # Подготавливаем данные для вставки
-            schedule_records = []
-            for date, groups in schedule_data.items():
-                for group_name, lessons in groups.items():
-                    for lesson in lessons:
-                        record = (
-                            date,
-                            group_name,
-                            lesson.get('teacher', ''),
-                            lesson.get('number', 0),
-                            lesson.get('discipline', ''),
-                            lesson.get('classroom', ''),
-                            lesson.get('subgroup', '0')
-                        )
-                        schedule_records.append(record)
-            
-            # Вставляем записи
-            query = """
-            INSERT INTO schedule 
-            (date, group_name, teacher_name, lesson_number, discipline, classroom, subgroup)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """
-            self.execute_many(query, schedule_records)
-            logger.info(f"Сохранено {len(schedule_records)} записей расписания в SQLite")
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении расписания: {e}")
-            raise
+    def get_schedule_fingerprints(self) -> Dict[str, str]:
+        """Получение сохраненных отпечатков расписания {ключ: хеш}"""
+        result = self.execute_query("SELECT fingerprint_key, hash FROM schedule_fingerprints")
+        return {row['fingerprint_key']: row['hash'] for row in result} if result else {}
 
     def get_all_groups(self) -> List[str]:
         """Получение списка всех групп"""
@@ -523,77 +1219,14 @@ class SQLiteDatabase:
         result = self.execute_query(query)
         return [row['full_name'] for row in result] if result else []
     
-    async def get_last_checked_dates(self):
+    def get_last_checked_dates(self):
         """Получение списка последних проверенных дат в формате списка"""
         try:
-            # Проверяем, существует ли таблица old_last_checked_dates (старая версия)
-            old_table_exists = self.execute_query(
-                """
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name='last_checked_dates' AND sql LIKE '%date TEXT PRIMARY KEY%'
-                """
-            )
-            
-            if old_table_exists:
-                logger.warning("🔄 Обнаружена старая версия таблицы last_checked_dates. Выполняется миграция...")
-                # Получаем данные из старой таблицы
-                old_dates = self.execute_query("SELECT date FROM last_checked_dates")
-                old_dates_list = [row['date'] for row in old_dates] if old_dates else []
-                
-                # Переименовываем старую таблицу
-                self.execute_query("ALTER TABLE last_checked_dates RENAME TO old_last_checked_dates")
-                
-                # Создаем новую таблицу
-                self.execute_query(
-                    """
-                    CREATE TABLE IF NOT EXISTS last_checked_dates (
-                        id INTEGER PRIMARY KEY,
-                        dates TEXT,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                    """
-                )
-                
-                # Переносим данные в новую таблицу, если они есть
-                if old_dates_list:
-                    dates_str = ','.join(old_dates_list)
-                    self.execute_query(
-                        """
-                        INSERT INTO last_checked_dates (dates, updated_at)
-                        VALUES (?, CURRENT_TIMESTAMP)
-                        """,
-                        (dates_str,)
-                    )
-                    
-                logger.info(f"✅ Миграция таблицы last_checked_dates успешно выполнена. Перенесено {len(old_dates_list)} дат")
-            
-            # Проверяем, существует ли таблица новой версии
-            table_exists = self.execute_query(
-                """
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name='last_checked_dates'
-                """
-            )
-            
-            if not table_exists:
-                # Создаем таблицу, если она не существует
-                self.execute_query(
-                    """
-                    CREATE TABLE IF NOT EXISTS last_checked_dates (
-                        id INTEGER PRIMARY KEY,
-                        dates TEXT,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                    """
-                )
-                logger.info("🏗️ Создана таблица last_checked_dates")
-                return []
-            
-            # Пробуем получить данные по новой схеме
+            # Получаем последнюю запись со списком дат
             result = self.execute_query(
                 """
                 SELECT dates FROM last_checked_dates
-                ORDER BY updated_at DESC
+                ORDER BY updated_at DESC, id DESC
                 LIMIT 1
                 """
             )
@@ -613,7 +1246,7 @@ class SQLiteDatabase:
             logger.error(f"🔍 Трассировка: {traceback.format_exc()}")
             return []
 
-    async def update_last_checked_dates(self, dates_str):
+    def update_last_checked_dates(self, dates_str):
         """
         Обновление списка последних проверенных дат
         
@@ -624,27 +1257,6 @@ class SQLiteDatabase:
             bool: True в случае успеха, False в случае ошибки
         """
         try:
-            # Проверяем, существует ли таблица last_checked_dates
-            table_exists = self.execute_query(
-                """
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name='last_checked_dates'
-                """
-            )
-            
-            if not table_exists:
-                # Создаем таблицу, если она не существует
-                self.execute_query(
-                    """
-                    CREATE TABLE IF NOT EXISTS last_checked_dates (
-                        id INTEGER PRIMARY KEY,
-                        dates TEXT,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                    """
-                )
-                logger.info("🏗️ Создана таблица last_checked_dates")
-            
             # Вставляем новую запись
             self.execute_query(
                 """
@@ -660,7 +1272,7 @@ class SQLiteDatabase:
                 DELETE FROM last_checked_dates
                 WHERE id NOT IN (
                     SELECT id FROM last_checked_dates
-                    ORDER BY updated_at DESC
+                    ORDER BY updated_at DESC, id DESC
                     LIMIT 5
                 )
                 """
@@ -675,23 +1287,9 @@ class SQLiteDatabase:
     def get_users_with_notifications(self) -> List[int]:
         """Получение списка ID пользователей с включенными уведомлениями"""
         try:
-            # Получаем пользователей с включенными уведомлениями
-            result = self.execute_query(
-                """
-                SELECT u.user_id
-                FROM users u
-                JOIN user_settings us ON u.user_id = us.user_id
-                WHERE us.notifications_enabled = 1
-                """
-            )
-            
-            user_ids = [row['user_id'] for row in result] if result else []
-                
+            user_ids = self.select_user_ids(notifications_enabled=True)
             logger.info(f"Получен список пользователей с уведомлениями: {len(user_ids)} пользователей")
             return user_ids
         except Exception as e:
             logger.error(f"Ошибка при получении пользователей с уведомлениями: {e}")
-            return []
-
-# Создание экземпляра базы данных
-db = SQLiteDatabase.get_instance() 
\ No newline at end of file
+            return [] 
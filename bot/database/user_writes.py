@@ -0,0 +1,220 @@
+"""
+Copyright (c) 2023-2024 Gargun Daniil
+Telegram: @Daniilgargun (https://t.me/Daniilgargun)
+Contact ID: 1437368782
+All rights reserved.
+
+Несанкционированное использование, копирование или распространение 
+данного программного обеспечения запрещено.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Dict, List, Any
+
+if TYPE_CHECKING:
+    from .sqlite_db2 import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# Отложенная запись изменений пользователей: изменения копятся USER_WRITE_DELAY_MS мс
+# (или до USER_WRITE_BATCH штук) и записываются одной транзакцией
+USER_WRITE_DELAY = float(os.getenv("USER_WRITE_DELAY_MS", 5)) / 1000
+USER_WRITE_BATCH = int(os.getenv("USER_WRITE_BATCH", 200))
+
+
+class _PendingUser:
+    """Незаписанные изменения одного пользователя; поздние значения заменяют ранние"""
+
+    __slots__ = ('create', 'user', 'settings')
+
+    def __init__(self):
+        self.create = None
+        self.user = {}
+        self.settings = {}
+
+    def copy(self) -> '_PendingUser':
+        pending = _PendingUser()
+        pending.create = self.create
+        pending.user = dict(self.user)
+        pending.settings = dict(self.settings)
+        return pending
+
+
+class UserWriteQueue:
+    """
+    Очередь отложенной записи (write-behind) изменений пользователей.
+
+    Создание пользователя и изменения users/user_settings не пишутся сразу, а
+    накапливаются по user_id и раз в delay секунд (или при batch_size изменениях)
+    записываются фоновым потоком одной транзакцией BEGIN IMMEDIATE. get_user накладывает
+    незаписанные изменения на прочитанную строку, поэтому пользователь сразу видит
+    свои изменения. flush() дожидается записи всего накопленного.
+    """
+
+    def __init__(self, db: 'SQLiteDatabase', delay: float = USER_WRITE_DELAY, batch_size: int = USER_WRITE_BATCH):
+        self.db = db
+        self.delay = delay
+        self.batch_size = max(1, batch_size)
+        self._cond = threading.Condition()
+        self._pending: Dict[int, _PendingUser] = {}
+        self._in_flight: Dict[int, _PendingUser] = {}
+        self._changes = 0
+        self._flush_waiters = 0
+        self._thread = None
+        self._closed = False
+        self.stats = {
+            'enqueued': 0,
+            'batches': 0,
+            'written': 0,
+            'max_batch': 0,
+            'failures': 0
+        }
+
+    def put(self, user_id: int, create: tuple = None, user: Dict[str, Any] = None,
+            settings: Dict[str, Any] = None) -> None:
+        """Добавление изменения пользователя в очередь"""
+        with self._cond:
+            if not self._closed:
+                pending = self._pending.get(user_id)
+                if pending is None:
+                    pending = self._pending[user_id] = _PendingUser()
+                if create is not None and pending.create is None:
+                    pending.create = create
+                pending.user.update(user or {})
+                pending.settings.update(settings or {})
+                self._changes += 1
+                self.stats['enqueued'] += 1
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="user-writes", daemon=True)
+                    self._thread.start()
+                self._cond.notify_all()
+                return
+
+        # После закрытия очереди изменения пишутся сразу
+        pending = _PendingUser()
+        pending.create = create
+        pending.user = dict(user or {})
+        pending.settings = dict(settings or {})
+        self._write_batch({user_id: pending})
+
+    def pending_for(self, user_id: int) -> List[_PendingUser]:
+        """Незаписанные изменения пользователя: сначала записываемые сейчас, затем ожидающие"""
+        with self._cond:
+            return [
+                pending.copy()
+                for pending in (self._in_flight.get(user_id), self._pending.get(user_id))
+                if pending is not None
+            ]
+
+    def discard(self, user_id: int) -> None:
+        """Отмена ожидающих изменений пользователя (перед удалением)"""
+        with self._cond:
+            self._pending.pop(user_id, None)
+
+    def _run(self) -> None:
+        """Фоновый поток: сбор изменений за паузу и запись одной транзакцией"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+
+                # Окно группировки: ждем еще изменений, пока не наберется пачка или не попросили flush
+                deadline = time.monotonic() + self.delay
+                while self._changes < self.batch_size and not self._flush_waiters and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch, self._pending, self._changes = self._pending, {}, 0
+                self._in_flight = batch
+
+            try:
+                self._write_batch(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = {}
+                    self._cond.notify_all()
+
+    def _write_batch(self, batch: Dict[int, _PendingUser]) -> None:
+        """Запись пачки изменений; если транзакция не удалась, пользователи пишутся по одному"""
+        written, failed = len(batch), 0
+        try:
+            self._apply(batch)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при записи {len(batch)} изменений пользователей, запись по одному: {e}")
+            written = 0
+            for user_id, pending in batch.items():
+                try:
+                    self._apply({user_id: pending})
+                    written += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"❌ Изменения пользователя {user_id} не записаны: {e}")
+
+        # Статистику читают get_stats() и flush() из других потоков
+        with self._cond:
+            self.stats['batches'] += 1
+            self.stats['written'] += written
+            self.stats['failures'] += failed
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+
+    def _apply(self, batch: Dict[int, _PendingUser]) -> None:
+        """Одна транзакция: создание пользователей, затем UPDATE, сгруппированные по набору колонок"""
+        creates = [(user_id,) + pending.create for user_id, pending in batch.items() if pending.create]
+        updates = {}
+        for user_id, pending in batch.items():
+            for table, fields in (('users', pending.user), ('user_settings', pending.settings)):
+                if fields:
+                    updates.setdefault((table, tuple(fields)), []).append(tuple(fields.values()) + (user_id,))
+
+        with self.db.transaction('user_writes', 'users') as cursor:
+            if creates:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, username, first_name, last_name, role) VALUES (?, ?, ?, ?, ?)",
+                    creates
+                )
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO user_settings (user_id) VALUES (?)",
+                    [(row[0],) for row in creates]
+                )
+            for (table, columns), params in updates.items():
+                cursor.executemany(
+                    f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE user_id = ?",
+                    params
+                )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание записи всех накопленных изменений; False, если не успели за timeout"""
+        with self._cond:
+            if not self._pending and not self._in_flight:
+                return True
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+            finally:
+                self._flush_waiters -= 1
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Запись накопленных изменений и остановка фонового потока"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика отложенной записи"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending) + len(self._in_flight)
+        return stats
@@ -1,29 +1,54 @@
+import inspect
 from functools import wraps
 from aiogram.types import Message
 from bot.database.db_adapter import db_adapter as db
+from bot.middleware.user_context import USER_CONTEXT_KEY
 from bot.config import logger
 
 def user_exists_check():
     def decorator(func):
+        signature = inspect.signature(func)
+        # Обработчик сам принимает user_context - передаем его дальше
+        passes_context = USER_CONTEXT_KEY in signature.parameters
+
         @wraps(func)
         async def wrapper(message: Message, *args, **kwargs):
             user_id = message.from_user.id
-            
+            user_context = kwargs.get(USER_CONTEXT_KEY) if passes_context else kwargs.pop(USER_CONTEXT_KEY, None)
+
             try:
-                # Проверяем существование пользователя в БД
-                if not await db.user_exists(user_id):
+                # Проверяем существование пользователя: по контексту из LoadUserMiddleware или запросом к БД
+                if user_context is not None:
+                    exists = await user_context.ensure_exists()
+                else:
+                    exists = await db.user_exists(user_id)
+
+                if not exists:
                     logger.info(f"Пользователь {user_id} не найден в БД")
                     await message.answer(
                         "⚠️ Для использования бота необходимо выполнить команду /start"
                     )
                     return
-                
+
                 # Если пользователь существует, выполняем основную функцию
                 return await func(message, *args, **kwargs)
-                
+
             except Exception as e:
                 logger.error(f"Ошибка при проверке пользователя {user_id}: {e}")
                 await message.answer("❌ Произошла ошибка. Попробуйте позже.")
-                
+
+        if not passes_context:
+            # aiogram передает обработчику только аргументы из его сигнатуры (после inspect.unwrap),
+            # поэтому обертка объявляет user_context сама и скрывает сигнатуру исходной функции
+            del wrapper.__wrapped__
+            parameters = list(signature.parameters.values())
+            position = len(parameters)
+            if parameters and parameters[-1].kind == inspect.Parameter.VAR_KEYWORD:
+                position -= 1
+            parameters.insert(position, inspect.Parameter(
+                USER_CONTEXT_KEY, inspect.Parameter.KEYWORD_ONLY, default=None
+            ))
+            wrapper.__signature__ = signature.replace(parameters=parameters)
+
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
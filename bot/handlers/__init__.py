@@ -12,6 +12,9 @@ from aiogram import Router
 from bot.handlers.start import router as start_router
 from bot.handlers.user import user_router
 from bot.handlers.admin import admin_router
+from bot.middleware.user_context import LoadUserMiddleware
+from bot.middleware.rate_limit import RateLimitMiddleware
+from bot.middleware.spam_protection import SpamProtection
 
 # Создаем главный роутер
 main_router = Router()
@@ -24,6 +27,20 @@ main_router.include_router(admin_router)
 def register_handlers(dp):
     """Регистрация всех обработчиков"""
     dp.include_router(main_router)
+
+    # Пользователь, его настройки и бан читаются один раз на обновление и передаются обработчикам
+    user_loader = LoadUserMiddleware()
+    dp.message.outer_middleware(user_loader)
+    dp.callback_query.outer_middleware(user_loader)
+
+    # Ограничение частоты запросов (GCRA) - внутренний middleware после загрузчика пользователя.
+    # Одна корзина на пользователя для сообщений и нажатий кнопок
+    rate_limiter = RateLimitMiddleware()
+    dp.message.middleware(rate_limiter)
+    dp.callback_query.middleware(rate_limiter)
+
+    # Защита от спама с баном - только для сообщений, бан берется из user_context загрузчика
+    dp.message.middleware(SpamProtection())
     
     # Заменяем Firebase на SQLite
     from bot.services.database import Database
@@ -8,10 +8,13 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from bot.database.db_adapter import db_adapter as db
 from bot.services.parser import ScheduleParser
+from bot.services.reply_cache import reply_cache
 from datetime import datetime, timedelta
 import psutil
 import os
+import html
 from bot.utils.validators import InputValidator
+from bot.utils.admin_stats import format_stats_text, format_users_text
 from bot.services.logger import security_logger
 from bot.services.monitoring import monitor
 import asyncio
@@ -48,43 +51,18 @@ async def admin_stats(callback: CallbackQuery):
         return
 
     try:
-        # Получаем статистику пользователей
-        users = await db.get_all_users()
-        total_users = len(users)
-        
-        # Считаем пользователей с уведомлениями
-        notif_users = len([u for u in users if u.get('notifications_enabled', False)])
-
-        # Считаем пользователей по ролям
-        students = len([u for u in users if u.get('role') in ['Студент', 'student']])
-        teachers = len([u for u in users if u.get('role') in ['Преподаватель', 'teacher']])
+        # Статистика пользователей из счетчиков в БД
+        user_stats = await db.get_user_stats()
 
         # Время работы бота
         bot_start_time = os.path.getctime(os.path.abspath(__file__))
         uptime = datetime.now() - datetime.fromtimestamp(bot_start_time)
-        uptime_days = uptime.days
-        uptime_hours = uptime.seconds // 3600 
-        uptime_minutes = (uptime.seconds % 3600) // 60
         
         # Кэш
         cached_groups = len(await db.get_cached_groups())
         cached_teachers = len(await db.get_cached_teachers())
 
-        stats_text = (
-            "📊 <b>Детальная статистика бота</b>\n\n"
-            f"⏱️ <b>Время работы:</b>\n"
-            f"   • Дней: {uptime_days}\n"
-            f"   • Часов: {uptime_hours}\n"
-            f"   • Минут: {uptime_minutes}\n\n"
-            f"👥 <b>Пользователи:</b>\n"
-            f"   • Всего: {total_users}\n"
-            f"   • Студентов: {students}\n"
-            f"   • Преподавателей: {teachers}\n"
-            f"   • С уведомлениями: {notif_users}\n\n"
-            f"💾 <b>Кэш:</b>\n"
-            f"   • Групп: {cached_groups}\n"
-            f"   • Преподавателей: {cached_teachers}"
-        )
+        stats_text = format_stats_text(user_stats, uptime, cached_groups, cached_teachers)
         
         back_button = [[InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_admin")]]
         await callback.message.edit_text(
@@ -103,35 +81,9 @@ async def admin_users(callback: CallbackQuery):
         return
 
     try:
-        users = await db.get_all_users()
-        
-        # Подсчет статистики по группам
-        group_stats = {}
-        total_students = 0
-        total_teachers = 0
-        
-        for user in users:
-            role = user.get('role')
-            if role in ['Студент', 'student']:
-                total_students += 1
-                group = user.get('selected_group')
-                if group:
-                    group_stats[group] = group_stats.get(group, 0) + 1
-            elif role in ['Преподаватель', 'teacher']:
-                total_teachers += 1
-
-        # Формируем текст статистики
-        users_text = "👥 Статистика пользователей\n\n"
-        
-        users_text += "📊 Распределение по группам:\n"
-        for group in sorted(group_stats.keys()):
-            users_text += f"• {group}: {group_stats[group]} чел.\n"
-        
-        users_text += f"\n📈 Общая статистика:\n"
-        users_text += f"• Всего пользователей: {len(users)}\n"
-        users_text += f"• Студентов: {total_students}\n"
-        users_text += f"• Преподавателей: {total_teachers}\n"
-        users_text += f"• Количество групп: {len(group_stats)}\n"
+        # Статистика по группам из счетчиков в БД
+        user_stats = await db.get_user_stats()
+        users_text = format_users_text(user_stats)
         
         back_button = [[InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_admin")]]
         await callback.message.edit_text(
@@ -143,6 +95,77 @@ async def admin_users(callback: CallbackQuery):
         await callback.answer("❌ Произошла ошибка")
 
 
+def _short_sql(query: str, length: int = 90) -> str:
+    """Сокращенный текст запроса для сообщения"""
+    text = query if len(query) <= length else query[:length - 1] + "…"
+    return html.escape(text)
+
+@admin_router.callback_query(lambda c: c.data in ("admin_db", "admin_db_reset"))
+async def admin_db(callback: CallbackQuery):
+    if not config.is_admin(callback.from_user.id):
+        await callback.answer("⛔️ У вас нет доступа к этой команде", show_alert=True)
+        return
+
+    try:
+        if callback.data == "admin_db_reset":
+            db.reset_query_stats()
+
+        stats = db.get_query_stats(limit=8)
+        totals = stats['totals']
+        user_writes = stats['user_writes']
+        replies = reply_cache.get_stats()
+        directory = db.get_user_directory_stats()
+        directory_text = (
+            f"{directory['users']} чел., групп {directory['groups']}, {directory['total_kb']:g} КБ"
+            if directory else "не загружен, выборки из SQLite"
+        )
+
+        db_text = (
+            f"🗄 <b>Запросы к БД</b> (с {totals['since'].strftime('%d.%m %H:%M')})\n\n"
+            f"• Вызовов: {totals['calls']}, запросов: {totals['statements']}\n"
+            f"• Время выполнения: {totals['total_ms']:.0f} мс\n"
+            f"• Ожидание блокировки: {totals['lock_wait_ms']:.0f} мс, удержание: {totals['lock_hold_ms']:.0f} мс\n"
+            f"• Повторов: {totals['retries']}, ошибок: {totals['errors']}, медленных: {totals['slow']}\n"
+            f"• Отложенная запись пользователей: {user_writes['written']} записей в {user_writes['batches']} транзакциях "
+            f"(макс. {user_writes['max_batch']}), в очереди {user_writes['pending']}, ошибок {user_writes['failures']}\n"
+            f"• Кэш ответов с расписанием: попаданий {replies['hits']}, промахов {replies['misses']} "
+            f"({replies['hit_rate']:g}%), без кэша {replies['bypass']}, ответов {replies['entries']}, "
+            f"снимок {replies['generation']}, прогрев {replies['warm_ms'] or 0:.0f} мс\n"
+            f"• Справочник пользователей в памяти: {directory_text}\n\n"
+            f"📈 <b>Топ по суммарному времени:</b>\n"
+        )
+        for number, item in enumerate(stats['top'], 1):
+            db_text += (
+                f"{number}. <code>{_short_sql(item['query'])}</code>\n"
+                f"   {item['calls']} выз. · всего {item['total_ms']:.0f} мс · ср. {item['avg_ms']:.2f} мс · "
+                f"p95 ≤ {item['p95_ms']:g} мс · макс. {item['max_ms']:.0f} мс\n"
+                f"   блокировка: ожидание {item['lock_wait_ms']:.0f} мс, удержание {item['lock_hold_ms']:.0f} мс · "
+                f"повторов {item['retries']} · строк {item['rows']}\n"
+            )
+        if not stats['top']:
+            db_text += "Запросов пока не было\n"
+
+        if stats['slow']:
+            db_text += f"\n🐢 <b>Медленные запросы (от {stats['slow_threshold_ms']:.0f} мс):</b>\n"
+            for item in stats['slow']:
+                db_text += (
+                    f"• {item['time'].strftime('%H:%M:%S')} {item['ms']:.0f} мс "
+                    f"(ожидание {item['lock_wait_ms']:.0f} мс): <code>{_short_sql(item['query'], 60)}</code>\n"
+                )
+
+        keyboard = [
+            [InlineKeyboardButton(text="♻️ Сбросить", callback_data="admin_db_reset")],
+            [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_admin")]
+        ]
+        await callback.message.edit_text(
+            db_text,
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard),
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при получении статистики запросов к БД: {e}")
+        await callback.answer("❌ Произошла ошибка при получении статистики БД")
+
 @admin_router.callback_query(lambda c: c.data == "admin_update")
 async def admin_update(callback: CallbackQuery):
     if not config.is_admin(callback.from_user.id):
@@ -165,10 +188,25 @@ async def admin_update(callback: CallbackQuery):
             )
             return
 
+        if not parser.last_result_changed:
+            update_text = (
+                "🟰 Расписание на сайте не изменилось, обновление не требуется.\n\n"
+                f"📊 Статистика:\n"
+                f"• Групп: {len(groups_list)}\n"
+                f"• Преподавателей: {len(teachers_list)}"
+            )
+            back_button = [[InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_admin")]]
+            await callback.message.edit_text(
+                update_text,
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=back_button)
+            )
+            return
+
         # Обновляем расписание в базе данных
         await db.update_schedule(schedule_data)
         # Обновляем время последнего обновления кэша
         await db.update_cache_time()
+        await reply_cache.warm()
         
         update_text = (
             "✅ Расписание успешно обновлено!\n\n"
@@ -198,8 +236,7 @@ async def admin_broadcast(callback: CallbackQuery, state: FSMContext):
         return
 
     try:
-        users = await db.get_all_users()
-        user_count = len(users) if users else 0
+        user_count = await db.count_users()
 
         await callback.message.edit_text(
             f"📨 Отправка сообщения всем пользователям\n\n"
@@ -228,10 +265,8 @@ async def admin_send_id(callback: CallbackQuery, state: FSMContext):
         await callback.answer("⛔️ У вас нет доступа к этой команде", show_alert=True)
         return
 
-    # Получаем список всех пользователей
-    users = await db.get_all_users()
-    
-    if not users:
+    # Проверяем, что в базе есть пользователи
+    if not await db.count_users():
         await callback.message.edit_text(
             "❌ В базе данных нет пользователей",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
@@ -709,22 +744,25 @@ async def process_broadcast_message(message: Message, state: FSMContext):
         return
 
     try:
-        users = await db.get_all_users()
+        # Получатели выбираются из справочника пользователей в памяти одним массивом id
+        user_ids = await db.select_user_ids()
+        total_users = len(user_ids)
         sent_count = 0
         error_count = 0
+        processed = 0
         batch_size = 30  # Размер пачки для одновременной отправки
         
         progress_msg = await message.answer("⏳ Начинаю рассылку...")
 
-        # Разбиваем пользователей на пачки
-        for i in range(0, len(users), batch_size):
-            batch = users[i:i + batch_size]
+        for start in range(0, total_users, batch_size):
+            batch = user_ids[start:start + batch_size]
+            processed += len(batch)
             tasks = []
             
             # Создаем задачи для каждого пользователя в пачке
-            for user in batch:
+            for user_id in batch:
                 try:
-                    user_id = int(user['user_id'])
+                    user_id = int(user_id)
                     # Используем copy_message для сохранения оригинального форматирования
                     task = message.bot.copy_message(
                         chat_id=user_id,
@@ -748,9 +786,9 @@ async def process_broadcast_message(message: Message, state: FSMContext):
                 # Обновляем прогресс
                 await progress_msg.edit_text(
                     f"⏳ Прогресс рассылки:\n"
-                    f"• Отправлено: {sent_count}/{len(users)}\n"
+                    f"• Отправлено: {sent_count}/{total_users}\n"
                     f"• Ошибок: {error_count}\n"
-                    f"• Прогресс: {((i + len(batch)) / len(users) * 100):.1f}%"
+                    f"• Прогресс: {(min(processed / total_users, 1) * 100 if total_users else 100):.1f}%"
                 )
                 
                 # Небольшая пауза между пачками
@@ -764,10 +802,10 @@ async def process_broadcast_message(message: Message, state: FSMContext):
         await progress_msg.edit_text(
             f"✅ Рассылка завершена\n\n"
             f"📊 Статистика:\n"
-            f"• Всего пользователей: {len(users)}\n"
+            f"• Всего пользователей: {processed}\n"
             f"• Успешно отправлено: {sent_count}\n"
             f"• Ошибок: {error_count}\n"
-            f"• Процент успеха: {(sent_count/len(users)*100 if len(users) > 0 else 0):.1f}%"
+            f"• Процент успеха: {(sent_count/processed*100 if processed > 0 else 0):.1f}%"
         )
 
         logger.info(f"Рассылка завершена. Отправлено: {sent_count}, Ошибок: {error_count}")
@@ -5,7 +5,7 @@ import re
 from datetime import datetime
 import pytz
 from random import choice
-from bot.services.database import Database
+from bot.database.db_adapter import db_adapter as db
 from bot.config import logger
 import asyncio
 
@@ -99,17 +99,16 @@ async def send_new_year_greetings(bot):
             "Желаю вам исполнения всех желаний, особенно тех, что связаны с успешной сдачей сессий и получением автоматов! 🌟\n\n"
             "Ваш помощник по расписанию БТK"
         )
-        db = Database()
-        users = await db.get_all_users()
-        
-        tasks = []
-        for user in users:
-            try:
-                user_id = int(user['user_id'])
-                tasks.append(bot.send_message(chat_id=user_id, text=greeting))
-                logger.info(f"Подготовлено новогоднее поздравление пользователю {user_id}")
-            except Exception as e:
-                logger.error(f"Ошибка при подготовке поздравления пользователю {user_id}: {e}")
-        
-        # Отправляем все сообщения одновременно
-        await asyncio.gather(*tasks)
\ No newline at end of file
+        # Получатели берутся из справочника пользователей в памяти, поздравления отправляются по 100 за раз
+        user_ids = await db.select_user_ids()
+        for start in range(0, len(user_ids), 100):
+            tasks = []
+            for user_id in user_ids[start:start + 100]:
+                try:
+                    tasks.append(bot.send_message(chat_id=int(user_id), text=greeting))
+                    logger.info(f"Подготовлено новогоднее поздравление пользователю {user_id}")
+                except Exception as e:
+                    logger.error(f"Ошибка при подготовке поздравления пользователю {user_id}: {e}")
+            
+            # Отправляем сообщения страницы одновременно
+            await asyncio.gather(*tasks, return_exceptions=True)
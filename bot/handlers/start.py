@@ -4,19 +4,20 @@ from aiogram.types import Message
 from bot.keyboards.keyboards import get_start_keyboard
 from bot.database.db_adapter import db_adapter as db
 from bot.config import logger
+from bot.middleware.user_context import UserContext
 
 router = Router()
 
 @router.message(CommandStart())
-async def command_start_handler(message: Message) -> None:
+async def command_start_handler(message: Message, user_context: UserContext = None) -> None:
     user_id = message.from_user.id
     username = message.from_user.username
     
     try:
         logger.info(f"Получена команда /start от пользователя {user_id} (@{username})")
         
-        # Проверяем существует ли пользователь в БД
-        exists = await db.user_exists(user_id)
+        # Проверяем существует ли пользователь в БД (по загруженному LoadUserMiddleware, без него - запросом)
+        exists = user_context.exists if user_context is not None else await db.user_exists(user_id)
         logger.info(f"Проверка существования пользователя {user_id}: {exists}")
         
         if not exists:
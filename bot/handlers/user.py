@@ -14,8 +14,9 @@ from bot.keyboards.keyboards import (
 from bot.database.db_adapter import db_adapter as db
 from bot.services.parser import ScheduleParser
 from bot.config import logger, WEEKDAYS, config
-from bot.middlewares import ScheduleFormatter
+from bot.services.reply_cache import reply_cache
 from bot.decorators import user_exists_check
+from bot.middleware.user_context import UserContext, get_user_data
 from bot.utils.april_fools import get_survival_stats, get_mercy_button, handle_mercy_request, is_april_fools_day
 import os
 from datetime import datetime, timedelta
@@ -185,10 +186,10 @@ async def back_to_main_menu(message: Message, state: FSMContext):
     )
 @user_router.message(F.text == "⚙️ Настройки")
 @user_exists_check()
-async def settings_menu(message: Message, state: FSMContext):
+async def settings_menu(message: Message, state: FSMContext, user_context: UserContext = None):
     """Обработчик меню настроек"""
     user_id = message.from_user.id
-    user_data = await db.get_user(user_id)
+    user_data = await get_user_data(user_id, user_context)
     
     if not user_data:
         logger.error(f"Не удалось получить данные пользователя {user_id}")
@@ -219,10 +220,10 @@ async def settings_menu(message: Message, state: FSMContext):
     )
 
 @user_router.callback_query(lambda c: c.data == "toggle_notifications")
-async def toggle_notifications_callback(callback: CallbackQuery):
+async def toggle_notifications_callback(callback: CallbackQuery, user_context: UserContext = None):
     """Обработчик включения/выключения уведомлений"""
     user_id = callback.from_user.id
-    user_data = await db.get_user(user_id)
+    user_data = await get_user_data(user_id, user_context)
     
     if not user_data:
         await callback.answer("❌ Ошибка получения данных пользователя")
@@ -339,10 +340,10 @@ async def process_admin_message(message: Message, state: FSMContext):
 
 @user_router.message(F.text == "расписание")
 @user_exists_check()
-async def schedule_start(message: Message, state: FSMContext):
+async def schedule_start(message: Message, state: FSMContext, user_context: UserContext = None):
     user_id = message.from_user.id
     logger.info(f"Пользователь {user_id} запросил расписание")
-    user_data = await db.get_user(user_id)
+    user_data = await get_user_data(user_id, user_context)
     
     # Если пользователь не найден, но должен существовать (так как прошел user_exists_check),
     # попробуем создать его еще раз
@@ -437,7 +438,7 @@ async def process_role_selection(message: Message, state: FSMContext):
         await state.set_state(ScheduleStates.waiting_for_teacher)
 
 @user_router.message(ScheduleStates.waiting_for_group)
-async def process_group_selection(message: Message, state: FSMContext):
+async def process_group_selection(message: Message, state: FSMContext, user_context: UserContext = None):
     user_id = message.from_user.id
 
     logger.info(f"Пользователь {user_id} выбрал группу: {message.text}")
@@ -446,8 +447,10 @@ async def process_group_selection(message: Message, state: FSMContext):
     # Сбрасываем состояние
     await state.clear()
     
-    # Получаем данные пользователя для отображения в настройках
-    user_data = await db.get_user(user_id)
+    # Получаем данные пользователя для отображения в настройках (контекст загружен до изменения группы)
+    user_data = await get_user_data(user_id, user_context)
+    if user_context is not None and user_data:
+        user_data['selected_group'] = message.text
     
     # Показываем сообщение об успешном обновлении
     await message.answer(f"✅ Группа успешно изменена на <b>{message.text}</b>")
@@ -477,7 +480,7 @@ async def process_group_selection(message: Message, state: FSMContext):
     )
 
 @user_router.message(ScheduleStates.waiting_for_teacher)
-async def process_teacher_selection(message: Message, state: FSMContext):
+async def process_teacher_selection(message: Message, state: FSMContext, user_context: UserContext = None):
     user_id = message.from_user.id
 
     logger.info(f"Пользователь {user_id} выбрал преподавателя: {message.text}")
@@ -486,8 +489,10 @@ async def process_teacher_selection(message: Message, state: FSMContext):
     # Сбрасываем состояние
     await state.clear()
     
-    # Получаем данные пользователя для отображения в настройках
-    user_data = await db.get_user(user_id)
+    # Получаем данные пользователя для отображения в настройках (контекст загружен до изменения преподавателя)
+    user_data = await get_user_data(user_id, user_context)
+    if user_context is not None and user_data:
+        user_data['selected_teacher'] = message.text
     
     # Показываем сообщение об успешном обновлении
     await message.answer(f"✅ Преподаватель успешно изменен на <b>{message.text}</b>")
@@ -517,17 +522,19 @@ async def process_teacher_selection(message: Message, state: FSMContext):
     )
 
 @user_router.message(ScheduleStates.waiting_for_day)
-async def process_day_selection(message: Message, state: FSMContext):
+async def process_day_selection(message: Message, state: FSMContext, user_context: UserContext = None):
     user_id = message.from_user.id
-    user_data = await db.get_user(user_id)
-    parser = ScheduleParser()
+    user_data = await get_user_data(user_id, user_context)
+    if not user_data:
+        await message.answer("❌ Не удалось получить данные пользователя")
+        return
     
     if message.text == "Показать всё расписание":
-        schedule_data = await parser.get_full_schedule(user_data)
-        if not schedule_data:
-            await message.answer("❌ Расписание не найдено")
+        # Готовый текст берется из кэша ответов, при промахе строится и сохраняется
+        response, found = await reply_cache.full_reply(user_data)
+        if not found:
+            await message.answer(response)
             return
-        response = ScheduleFormatter.format_full_schedule(schedule_data, user_data)
         
         # Добавляем первоапрельскую статистику выживаемости, если сегодня 1 апреля
         if is_april_fools_day():
@@ -541,39 +548,19 @@ async def process_day_selection(message: Message, state: FSMContext):
         # Определяем тип дня для статистики выживаемости
         day_type = "weekend" if message.text == "Суббота" else "lecture"
 
-        schedule_data = await parser.get_schedule_for_day(message.text.lower(), user_data)
+        response, found = await reply_cache.day_reply(message.text, user_data)
         
-        # Теперь schedule_data может быть словарем или строкой (сообщением об ошибке)
-        if isinstance(schedule_data, dict):
-            # Если расписание найдено и это словарь, форматируем его
-            if schedule_data:
-                response = ScheduleFormatter.format_schedule(schedule_data, message.text, user_data)
-                
-                # Добавляем первоапрельскую статистику выживаемости, если сегодня 1 апреля
-                if is_april_fools_day():
-                    response += get_survival_stats(day_type)
-                    # Добавляем кнопку "Просить пощады"
-                    await message.answer(response, reply_markup=get_mercy_button())
-                else:
-                    await message.answer(response)
+        if found:
+            # Добавляем первоапрельскую статистику выживаемости, если сегодня 1 апреля
+            if is_april_fools_day():
+                response += get_survival_stats(day_type)
+                # Добавляем кнопку "Просить пощады"
+                await message.answer(response, reply_markup=get_mercy_button())
             else:
-                # Если словарь пустой, значит занятий нет
-                resp_text = (
-                    f"ℹ️ Расписание на {message.text.lower()}\n\n"
-                    "В ближайшие дни занятий нет."
-                )
-                if is_april_fools_day():
-                    resp_text += get_survival_stats("weekend")
-                    await message.answer(resp_text, reply_markup=get_mercy_button())
-                else:
-                    await message.answer(resp_text)
-
-        elif isinstance(schedule_data, str):
-            # Если вернулось сообщение об ошибке
-            await message.answer(schedule_data)
+                await message.answer(response)
         else:
-            # На случай, если что-то пошло не так и вернулся неожиданный тип
-            await message.answer("❌ Произошла неизвестная ошибка при получении расписания.")
+            # Сообщение об ошибке или об отсутствии занятий
+            await message.answer(response)
     else:
         await message.answer("❌ Пожалуйста, выберите корректный день недели из меню")
         return
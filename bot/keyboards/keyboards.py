@@ -31,7 +31,8 @@ def get_admin_keyboard() -> InlineKeyboardMarkup:
             InlineKeyboardButton(text="📅 График учебы", callback_data="schedule_photo")
         ],
         [
-            InlineKeyboardButton(text="🔄 Обновить расписание", callback_data="admin_update")
+            InlineKeyboardButton(text="🔄 Обновить расписание", callback_data="admin_update"),
+            InlineKeyboardButton(text="🗄 БД", callback_data="admin_db")
         ],
         [
             InlineKeyboardButton(text="📨 Отправить всем", callback_data="admin_broadcast")
@@ -23,8 +23,12 @@ from bot.handlers import register_handlers
 from bot.utils.bot_commands import setup_commands
 from bot.utils.notifications import AdminNotifier
 from bot.database import db as sqlite_db
+from bot.database import async_db
 from bot.services.scheduler import start_scheduler
 from bot.services.notifications import NotificationManager
+from bot.services.backup import backup_service
+from bot.services.maintenance import maintenance_service
+from bot.services.reply_cache import reply_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -40,6 +44,8 @@ class BotApp:
         self.notification_manager = NotificationManager(self.bot)
         self.scheduler_task = None
         self.notification_task = None
+        self.backup_task = None
+        self.maintenance_task = None
         self.is_stopping = False
         self.stop_reason = "Штатное завершение работы"
         
@@ -79,6 +85,13 @@ class BotApp:
         logger.info("🔄 Запуск системы уведомлений и планировщика")
         self.scheduler_task = asyncio.create_task(start_scheduler(self.bot))
         logger.info("✅ Планировщик обновления расписания запущен успешно")
+
+        # Фоновое резервное копирование БД
+        self.backup_task = asyncio.create_task(backup_service.start())
+        # Обслуживание БД в тихие часы
+        self.maintenance_task = asyncio.create_task(maintenance_service.start())
+        # Ответы с расписанием из загруженного при старте снимка
+        await reply_cache.warm()
         
         # Запуск поллинга
         logger.info("🚀 Бот запущен и готов к работе")
@@ -144,6 +157,34 @@ class BotApp:
             except Exception as e:
                 logger.error(f"❌ Ошибка при остановке планировщика: {e}")
         
+        # Останавливаем резервное копирование до закрытия БД
+        if self.backup_task:
+            try:
+                self.backup_task.cancel()
+                backup_service.stop()
+                logger.info("✅ Резервное копирование остановлено")
+            except Exception as e:
+                logger.error(f"❌ Ошибка при остановке резервного копирования: {e}")
+        
+        if self.maintenance_task:
+            try:
+                self.maintenance_task.cancel()
+                maintenance_service.stop()
+                logger.info("✅ Обслуживание БД остановлено")
+            except Exception as e:
+                logger.error(f"❌ Ошибка при остановке обслуживания БД: {e}")
+        
+        # Запись накопленных изменений пользователей до закрытия БД
+        try:
+            logger.info("🔄 Запись отложенных изменений пользователей")
+            async_db.shutdown()
+            if sqlite_db.flush_user_writes(timeout=30):
+                logger.info(f"✅ Изменения пользователей записаны: {sqlite_db.user_writes.get_stats()}")
+            else:
+                logger.error("❌ Не все изменения пользователей записаны за 30 сек")
+        except Exception as e:
+            logger.error(f"❌ Ошибка при записи изменений пользователей: {e}")
+        
         # Закрытие соединения с базой данных
         try:
             logger.info("🔄 Закрытие соединения с базой данных")
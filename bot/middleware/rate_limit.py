@@ -1,33 +1,59 @@
+import time
+from typing import Any, Dict, Optional
+
 from aiogram import BaseMiddleware
 from aiogram.types import Message
-from cachetools import TTLCache
-from datetime import datetime
 from bot.config import logger
+from bot.utils.rate_limiter import GCRALimiter
+
+# Ключ общей корзины всех пользователей
+GLOBAL_KEY = None
+
 
 class RateLimitMiddleware(BaseMiddleware):
-    def __init__(self, rate_limit=5):  # 5 сообщений в секунду
-        self.cache = TTLCache(maxsize=10000, ttl=60.0)  # Хранить 60 секунд
+    """
+    Ограничение частоты запросов: корзина на каждого пользователя и общая корзина бота.
+    Состояние пользователя - одно число в GCRALimiter, устаревшие записи удаляются
+    очисткой, поэтому при любом числе пользователей никто не выпадает из ограничения.
+    """
+
+    def __init__(self, rate_limit=5, global_rate_limit: Optional[int] = None):
+        # rate_limit сообщений в секунду от пользователя, global_rate_limit - от всех вместе (None - без общего лимита)
+        self.users = GCRALimiter(rate=rate_limit)
+        self.global_bucket = GCRALimiter(rate=global_rate_limit) if global_rate_limit else None
         self.rate_limit = rate_limit
-        
+        self.stats = {
+            'allowed': 0,
+            'limited_user': 0,
+            'limited_global': 0
+        }
+
     async def __call__(self, handler, event: Message, data):
-        user_id = event.from_user.id
-        
-        # Получаем текущее время
-        now = datetime.now()
-        
-        # Получаем историю запросов пользователя
-        user_requests = self.cache.get(user_id, [])
-        
-        # Очищаем старые запросы (старше 1 секунды)
-        user_requests = [req for req in user_requests if (now - req).total_seconds() <= 1]
-        
-        if len(user_requests) >= self.rate_limit:
-            logger.warning(f"Rate limit exceeded for user {user_id}")
+        user = getattr(event, 'from_user', None)
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if self.users.retry_after(user.id, now):
+            self.stats['limited_user'] += 1
+            logger.warning(f"Rate limit exceeded for user {user.id}")
             await event.answer("⚠️ Слишком много запросов. Пожалуйста, подождите.")
             return
-        
-        # Добавляем текущий запрос
-        user_requests.append(now)
-        self.cache[user_id] = user_requests
-        
-        return await handler(event, data) 
\ No newline at end of file
+
+        if self.global_bucket is not None and self.global_bucket.retry_after(GLOBAL_KEY, now):
+            # При общей перегрузке не отвечаем: ответ сам был бы лишним запросом к API
+            self.stats['limited_global'] += 1
+            logger.warning(f"Global rate limit exceeded, update from user {user.id} dropped")
+            return
+
+        # Запрос учитывается только если его пропустили обе корзины
+        self.users.consume(user.id, now)
+        if self.global_bucket is not None:
+            self.global_bucket.consume(GLOBAL_KEY, now)
+        self.stats['allowed'] += 1
+
+        return await handler(event, data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Пропущенные и ограниченные запросы, число отслеживаемых пользователей"""
+        return {**self.stats, **self.users.get_stats()}
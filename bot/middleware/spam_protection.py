@@ -4,9 +4,15 @@ from cachetools import TTLCache
 from datetime import datetime, timedelta
 from bot.config import logger, config
 from bot.database.db_adapter import db_adapter as db
+from bot.middleware.user_context import USER_CONTEXT_KEY, get_user_data
 import logging
 
 class SpamProtection(BaseMiddleware):
+    """
+    Защита от спама для сообщений: бан и счетчик сообщений за минуту.
+    Регистрируется внутренним middleware после LoadUserMiddleware и берет бан из user_context
+    """
+
     def __init__(self):
         self.cache = TTLCache(maxsize=10000, ttl=60.0)
         self.message_limit = 20
@@ -37,8 +43,15 @@ class SpamProtection(BaseMiddleware):
             return True
         return False
 
-    async def is_banned(self, user_id: int) -> tuple[bool, str, datetime]:
-        """Проверка бана с возвратом статуса, причины и времени окончания"""
+    async def is_banned(self, user_id: int, user_context=None) -> tuple[bool, str, datetime]:
+        """
+        Проверка бана с возвратом статуса, причины и времени окончания.
+        user_context - пользователь, уже загруженный LoadUserMiddleware (тогда БД не запрашивается)
+        """
+        # Бан в памяти снят администратором: пользователь из БД уже не забанен
+        if user_context is not None and user_context.exists and not user_context.is_banned:
+            self.banned_users.pop(user_id, None)
+
         # Сначала проверяем в кэше
         if user_id in self.banned_users:
             ban_end, reason = self.banned_users[user_id]
@@ -47,8 +60,11 @@ class SpamProtection(BaseMiddleware):
                 return False, "", None
             return True, reason, ban_end
             
-        # Если не нашли в кэше, проверяем в базе данных
-        is_banned, reason = await db.is_user_banned(user_id)
+        # Если не нашли в кэше, проверяем по загруженному пользователю или в базе данных
+        if user_context is not None:
+            is_banned, reason = user_context.is_banned, user_context.ban_reason
+        else:
+            is_banned, reason = await db.is_user_banned(user_id)
         if is_banned:
             # Если пользователь забанен в базе, но не в кэше,
             # добавляем его в кэш с временем окончания через 30 минут
@@ -66,7 +82,8 @@ class SpamProtection(BaseMiddleware):
             return await handler(event, data)
 
         # Проверяем бан
-        is_banned, reason, ban_end = await self.is_banned(user_id)
+        user_context = data.get(USER_CONTEXT_KEY)
+        is_banned, reason, ban_end = await self.is_banned(user_id, user_context)
         if is_banned:
             time_left = ban_end - datetime.now()
             minutes_left = int(time_left.total_seconds() / 60)
@@ -76,7 +93,7 @@ class SpamProtection(BaseMiddleware):
                 if user_id not in self.admin_messages:
                     self.admin_messages.add(user_id)
                     # Получаем информацию о пользователе из базы данных
-                    user_data = await db.get_user(user_id)
+                    user_data = await get_user_data(user_id, user_context)
                     username = user_data.get('username', 'Нет username') if user_data else 'Нет данных'
                     
                     admin_message = (
@@ -142,7 +159,9 @@ class SpamProtection(BaseMiddleware):
             )
             return
             
-        self.cache[user_id] = user_data
+        # Окно счетчика отсчитывается от первого сообщения: повторная запись в TTLCache продлила бы его
+        if user_id not in self.cache:
+            self.cache[user_id] = user_data
         return await handler(event, data)
 
 class SecurityLogger:
@@ -0,0 +1,81 @@
+from typing import Any, Dict, Optional
+
+from aiogram import BaseMiddleware
+from bot.config import logger
+from bot.database.db_adapter import db_adapter as db
+
+# Ключ в data обработчика, под которым лежит UserContext
+USER_CONTEXT_KEY = 'user_context'
+
+# Поля пользователя в формате db_adapter.get_user
+USER_DATA_FIELDS = (
+    'user_id', 'username', 'first_name', 'last_name', 'role',
+    'selected_group', 'selected_teacher', 'notifications_enabled'
+)
+
+
+class UserContext:
+    """
+    Пользователь текущего обновления: строка users, настройки и бан,
+    прочитанные одним запросом в начале обработки.
+    """
+
+    __slots__ = ('user_id', 'row', 'user_data')
+
+    def __init__(self, user_id: int, row: Optional[Dict[str, Any]]):
+        self.user_id = user_id
+        self.row = row
+        # Словарь в формате db_adapter.get_user: обработчики читают и дополняют его вместо нового запроса
+        self.user_data = {field: row[field] for field in USER_DATA_FIELDS} if row else None
+
+    @classmethod
+    async def load(cls, user_id: int) -> 'UserContext':
+        """Чтение пользователя с настройками и баном (с учетом еще не записанных изменений)"""
+        return cls(user_id, await db.async_db.get_user(user_id))
+
+    @property
+    def exists(self) -> bool:
+        return self.row is not None
+
+    @property
+    def is_banned(self) -> bool:
+        return bool(self.row and self.row['is_banned'])
+
+    @property
+    def ban_reason(self) -> Optional[str]:
+        return self.row['ban_reason'] if self.row else None
+
+    async def ensure_exists(self) -> bool:
+        """Создание пользователя со значениями по умолчанию, если его еще нет в БД"""
+        if self.exists:
+            return True
+        if not await db.create_user(self.user_id):
+            return False
+        fresh = await self.load(self.user_id)
+        self.row, self.user_data = fresh.row, fresh.user_data
+        return self.exists
+
+
+class LoadUserMiddleware(BaseMiddleware):
+    """
+    Внешний middleware: один запрос к БД на обновление вместо отдельных проверок
+    бана, существования и чтения пользователя в каждом обработчике.
+    Обработчики и декораторы получают UserContext аргументом user_context.
+    """
+
+    async def __call__(self, handler, event, data):
+        user = data.get('event_from_user')
+        if user is not None:
+            try:
+                data[USER_CONTEXT_KEY] = await UserContext.load(user.id)
+            except Exception as e:
+                # Без контекста обработчики и декораторы читают пользователя сами
+                logger.error(f"Ошибка при загрузке пользователя {user.id}: {e}")
+        return await handler(event, data)
+
+
+async def get_user_data(user_id: int, user_context: Optional[UserContext] = None) -> Optional[Dict[str, Any]]:
+    """Данные пользователя из контекста обновления, без контекста - запросом к БД"""
+    if user_context is not None:
+        return user_context.user_data
+    return await db.get_user(user_id)
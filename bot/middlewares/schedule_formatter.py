@@ -2,7 +2,8 @@ import locale
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from bot.config import format_date, WEEKDAYS, MONTHS, logger
+from bot.config import format_date, WEEKDAYS, logger
+from bot.utils import schedule_calendar
 
 logger = logging.getLogger(__name__)
 
@@ -46,55 +47,8 @@ def _translate_day(day: str) -> str:
 def format_date(date_str: str) -> str:
     """Форматирование даты в формат '23-дек (понедельник)'"""
     try:
-        # Парсим дату формата "23-дек" или "01-март"
         if '-' in date_str:
-            day, month = date_str.split('-')
-            
-            # Преобразуем русские названия месяцев в сокращенные
-            month_mapping = {
-                'март': 'мар',
-                'май': 'мая',
-                'июнь': 'июн',
-                'июль': 'июл',
-                'август': 'авг',
-                'сентябрь': 'сен',
-                'октябрь': 'окт',
-                'ноябрь': 'нояб',
-                'декабрь': 'дек',
-                'январь': 'янв',
-                'февраль': 'фев',
-                'апрель': 'апр'
-            }
-            
-            # Если месяц полный - преобразуем в сокращенный
-            month = month_mapping.get(month.lower(), month.lower())
-            
-            # Создаем объект datetime
-            current_year = datetime.now().year
-            try:
-                date_obj = datetime.strptime(f"{day}-{month}-{current_year}", "%d-%b-%Y")
-            except ValueError:
-                # Если не получилось, пробуем другой формат
-                month_num = MONTHS.get(month, None)
-                if month_num:
-                    date_obj = datetime(current_year, month_num, int(day))
-                else:
-                    return date_str
-            
-            # Получаем день недели
-            weekday_ru = {
-                'Monday': 'понедельник',
-                'Tuesday': 'вторник',
-                'Wednesday': 'среда',
-                'Thursday': 'четверг',
-                'Friday': 'пятница',
-                'Saturday': 'суббота',
-                'Sunday': 'воскресенье'
-            }
-            weekday = weekday_ru[date_obj.strftime('%A')]
-            
-            # Форматируем дату в нужный формат
-            return f"{day}-{month} ({weekday})"
+            return schedule_calendar.format_with_weekday(date_str)
         return date_str
     except Exception as e:
         logger.error(f"Ошибка форматирования даты {date_str}: {e}")
@@ -104,16 +58,8 @@ class ScheduleFormatter:
     @staticmethod
     def _parse_date(date_str: str) -> datetime:
         """Преобразование строки даты в объект datetime"""
-        try:
-            if '-' in date_str:
-                day, month = date_str.split('-')
-                month_num = MONTHS.get(month.lower())
-                if month_num:
-                    return datetime(datetime.now().year, month_num, int(day))
-            return datetime.now()  # Возвращаем текущую дату если парсинг не удался
-        except Exception as e:
-            logger.error(f"Ошибка парсинга даты {date_str}: {e}")
-            return datetime.now()
+        # Возвращаем текущую дату если парсинг не удался
+        return schedule_calendar.to_datetime(date_str) or datetime.now()
 
     @staticmethod
     def format_schedule(schedule_data: Dict[str, List[Dict]] | str | None, day: str, user_data: dict) -> str:
@@ -209,32 +155,11 @@ class ScheduleFormatter:
     @staticmethod
     def _parse_date_from_formatted(formatted_date_str: str) -> datetime:
         """Парсинг даты из форматированной строки типа '23-дек (понедельник)'"""
-        try:
-            # Извлекаем часть с датой, например '23-дек'
-            date_part = formatted_date_str.split(' ')[0]
-            day, month_abbr = date_part.split('-')
-
-            # Находим номер месяца по сокращению
-            month_num = None
-            for m_name, m_num in MONTHS.items():
-                if m_name.startswith(month_abbr.lower()): # Проверяем по началу строки, для 'нояб' и 'ноябрь'
-                    month_num = m_num
-                    break
-            
-            if not month_num:
-                raise ValueError(f"Неизвестное сокращение месяца: {month_abbr}")
-
-            current_year = datetime.now().year
-            # Проверяем, не относится ли дата к следующему году (если месяц уже прошел в текущем году)
-            if month_num < datetime.now().month:
-                year = current_year + 1
-            else:
-                year = current_year
-
-            return datetime(year, month_num, int(day))
-        except Exception as e:
-            logger.error(f"Ошибка парсинга отформатированной даты {formatted_date_str}: {e}")
+        parsed = schedule_calendar.to_datetime(formatted_date_str)
+        if parsed is None:
+            logger.error(f"Ошибка парсинга отформатированной даты {formatted_date_str}")
             return datetime.min # Возвращаем минимальную дату для корректной сортировки ошибок
+        return parsed
 
     @staticmethod
     def _can_group_lessons(lesson1: dict, lesson2: dict) -> bool:
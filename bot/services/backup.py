@@ -0,0 +1,225 @@
+import asyncio
+import gzip
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bot.config import logger, config
+from bot.database import db as sqlite_db
+
+BACKUP_PREFIX = "bot_"
+# Префиксы копий по областям БД: при отдельном файле пользователей он копируется рядом
+BACKUP_PREFIXES = {'main': BACKUP_PREFIX, 'users': "users_"}
+BACKUP_SUFFIX = ".db.gz"
+BACKUP_TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+
+class BackupService:
+    """
+    Фоновое резервное копирование базы данных.
+
+    Копия снимается онлайн (sqlite3 backup API порциями страниц), сжимается gzip
+    и хранится по схеме ротации: последние копии за каждый час, день и неделю.
+    Бот во время копирования продолжает работать.
+    """
+
+    def __init__(self, db=sqlite_db, backup_dir: Optional[str] = None,
+                 interval_minutes: int = 60, keep_hourly: int = 24, keep_daily: int = 7, keep_weekly: int = 4,
+                 pages_per_step: int = 64, step_pause: float = 0.01):
+        self.db = db
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(db.db_path), "backups")
+        self.interval = max(1, interval_minutes) * 60
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+        self.pages_per_step = max(1, pages_per_step)
+        self.step_pause = step_pause
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        self.stats = {
+            'backups': 0,
+            'failures': 0,
+            'removed': 0,
+            'last_backup': None,
+            'last_path': None,
+            'duration_ms': None,
+            'blocked_ms': None,
+            'max_blocked_ms': None,
+            'steps': None,
+            'size_kb': None,
+            'compressed_kb': None
+        }
+
+    def _backup_file(self, scope: str, now: datetime) -> Dict:
+        """Сжатая копия одного файла БД; возвращает путь, размеры и время блокировки записи"""
+        name = f"{BACKUP_PREFIXES[scope]}{now.strftime(BACKUP_TIME_FORMAT)}"
+        raw_path = os.path.join(self.backup_dir, f"{name}.db.tmp")
+        backup_path = os.path.join(self.backup_dir, f"{name}{BACKUP_SUFFIX}")
+        try:
+            result = self.db.create_backup(raw_path, pages=self.pages_per_step, pause=self.step_pause, scope=scope)
+
+            # Сжатие идет уже без обращения к базе
+            with open(raw_path, 'rb') as source, gzip.open(backup_path + ".tmp", 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            os.replace(backup_path + ".tmp", backup_path)
+
+            result.update({
+                'path': backup_path,
+                'size_kb': os.path.getsize(raw_path) / 1024,
+                'compressed_kb': os.path.getsize(backup_path) / 1024
+            })
+            return result
+        finally:
+            for path in (raw_path, backup_path + ".tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def create_backup(self) -> Optional[str]:
+        """Снятие сжатой резервной копии каждого файла БД и ротация старых копий (выполняется в потоке)"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        now = datetime.now()
+
+        try:
+            start = time.perf_counter()
+            results = [self._backup_file(scope, now) for scope in self.db.scopes]
+            result = {
+                'blocked_ms': sum(item['blocked_ms'] for item in results),
+                'max_blocked_ms': max(item['max_blocked_ms'] for item in results),
+                'steps': sum(item['steps'] for item in results)
+            }
+            backup_path = results[0]['path']
+            size_kb = sum(item['size_kb'] for item in results)
+            compressed_kb = sum(item['compressed_kb'] for item in results)
+            self.stats.update({
+                'backups': self.stats['backups'] + 1,
+                'last_backup': now,
+                'last_path': backup_path,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+                'blocked_ms': round(result['blocked_ms'], 1),
+                'max_blocked_ms': round(result['max_blocked_ms'], 2),
+                'steps': result['steps'],
+                'size_kb': round(size_kb),
+                'compressed_kb': round(compressed_kb)
+            })
+            logger.info(
+                f"💾 Резервная копия создана: {', '.join(item['path'] for item in results)} "
+                f"({size_kb:.0f} КБ -> {compressed_kb:.0f} КБ), "
+                f"за {self.stats['duration_ms']:.0f} мс, блокировка записи {result['blocked_ms']:.1f} мс "
+                f"(макс. {result['max_blocked_ms']:.2f} мс за {result['steps']} порций)"
+            )
+        except Exception as e:
+            self.stats['failures'] += 1
+            logger.error(f"❌ Ошибка при создании резервной копии: {e}")
+            backup_path = None
+
+        self.apply_retention()
+        return backup_path
+
+    def _list_backups(self, prefix: str = BACKUP_PREFIX) -> List[tuple]:
+        """Сжатые копии в каталоге с префиксом prefix: (время снятия, путь), от новых к старым"""
+        backups = []
+        for file_name in os.listdir(self.backup_dir):
+            if not (file_name.startswith(prefix) and file_name.endswith(BACKUP_SUFFIX)):
+                continue
+            try:
+                taken_at = datetime.strptime(file_name[len(prefix):-len(BACKUP_SUFFIX)], BACKUP_TIME_FORMAT)
+            except ValueError:
+                continue
+            backups.append((taken_at, os.path.join(self.backup_dir, file_name)))
+        return sorted(backups, reverse=True)
+
+    def select_kept(self, backups: List[tuple]) -> set:
+        """
+        Копии, которые остаются по ротации: самая новая копия в каждом из последних
+        keep_hourly часов, keep_daily дней и keep_weekly недель (backups от новых к старым)
+        """
+        kept = set()
+        for limit, bucket in (
+            (self.keep_hourly, lambda taken_at: taken_at.strftime("%Y%m%d%H")),
+            (self.keep_daily, lambda taken_at: taken_at.date()),
+            (self.keep_weekly, lambda taken_at: taken_at.isocalendar()[:2])
+        ):
+            seen = set()
+            for taken_at, path in backups:
+                key = bucket(taken_at)
+                if key in seen:
+                    continue
+                if len(seen) >= limit:
+                    break
+                seen.add(key)
+                kept.add(path)
+        return kept
+
+    def apply_retention(self) -> int:
+        """Удаление копий, не попавших в ротацию (отдельно для каждого файла БД)"""
+        try:
+            removed = 0
+            for prefix in BACKUP_PREFIXES.values():
+                backups = self._list_backups(prefix)
+                kept = self.select_kept(backups)
+                for _, path in backups:
+                    if path not in kept:
+                        os.remove(path)
+                        removed += 1
+                        logger.info(f"🗑️ Удалена устаревшая резервная копия: {path}")
+            self.stats['removed'] += removed
+            return removed
+        except Exception as e:
+            logger.error(f"❌ Ошибка при ротации резервных копий: {e}")
+            return 0
+
+    def _seconds_until_due(self) -> float:
+        """Сколько секунд осталось до следующей копии по времени последней сохраненной"""
+        try:
+            backups = self._list_backups() if os.path.isdir(self.backup_dir) else []
+        except OSError:
+            backups = []
+        if not backups:
+            return 0
+        age = (datetime.now() - backups[0][0]).total_seconds()
+        return max(0.0, self.interval - age)
+
+    def get_stats(self) -> Dict:
+        """Статистика резервного копирования и число хранимых копий"""
+        stats = dict(self.stats)
+        try:
+            stats['stored'] = sum(
+                len(self._list_backups(prefix)) for prefix in BACKUP_PREFIXES.values()
+            ) if os.path.isdir(self.backup_dir) else 0
+        except OSError:
+            stats['stored'] = None
+        return stats
+
+    async def start(self):
+        """Периодическое резервное копирование"""
+        logger.info(f"💾 Запуск резервного копирования БД (каждые {self.interval // 60} мин)")
+        loop = asyncio.get_running_loop()
+        while self._running:
+            try:
+                # После перезапуска бота не снимаем копию, если последняя еще свежая
+                delay = self._seconds_until_due()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await loop.run_in_executor(self._executor, self.create_backup)
+            except asyncio.CancelledError:
+                logger.info("🛑 Резервное копирование остановлено")
+                break
+            except Exception as e:
+                logger.error(f"❌ Ошибка в задаче резервного копирования: {e}")
+                await asyncio.sleep(60)
+
+    def stop(self):
+        """Остановка резервного копирования"""
+        self._running = False
+        self._executor.shutdown(wait=True)
+
+
+backup_service = BackupService(
+    interval_minutes=config.BACKUP_INTERVAL_MINUTES,
+    keep_hourly=config.BACKUP_KEEP_HOURLY,
+    keep_daily=config.BACKUP_KEEP_DAILY,
+    keep_weekly=config.BACKUP_KEEP_WEEKLY
+)
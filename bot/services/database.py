@@ -138,12 +138,7 @@ class Database:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(None, lambda: self.schedule_collection.document('current').set(schedule_data))
             logger.info("Расписание успешно обновлено в Firebase")
-            
-            # Сохраняем в SQLite
-            from bot.database import db as sqlite_db
-            await sqlite_db.save_schedule(schedule_data)
-            logger.info("Расписание успешно обновлено в SQLite")
-            
+            # В SQLite расписание уже опубликовано парсером (publish_schedule)
             return True
         except Exception as e:
             logger.error(f"Ошибка при обновлении расписания: {e}")
@@ -0,0 +1,273 @@
+import asyncio
+import copy
+import time
+from threading import Lock
+from typing import Optional
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+from bot.config import logger
+
+# Ресурсы, которые не нужны для чтения таблицы расписания
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css'
+]
+
+CHROME_PROCESS_NAMES = ('chrome', 'chromium', 'chromedriver')
+
+# Картинки и шрифты отключаем еще и на уровне настроек профиля
+CONTENT_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.managed_default_content_settings.fonts': 2
+}
+
+# Аргументы, с которыми два браузера не могут работать одновременно: фиксированный
+# порт отладки занимает первый Chrome, --single-process ломает управление процессами
+EXCLUSIVE_ARGUMENTS = ('--remote-debugging-port', '--single-process')
+
+
+def build_chrome_options(base: Options, prefs: Optional[dict] = None) -> Options:
+    """Новые настройки для одного драйвера на основе общих; общие настройки не меняются"""
+    options = Options()
+    for argument in base.arguments:
+        if not argument.startswith(EXCLUSIVE_ARGUMENTS):
+            options.add_argument(argument)
+    if base.binary_location:
+        options.binary_location = base.binary_location
+    for name, value in base.experimental_options.items():
+        options.add_experimental_option(name, copy.deepcopy(value))
+    if prefs:
+        options.add_experimental_option('prefs', {**options.experimental_options.get('prefs', {}), **prefs})
+    return options
+
+
+class _PooledDriver:
+    """Драйвер Chrome из пула со счетчиком использований"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+        self.driver_pid = self._get_driver_pid(driver)
+
+    @staticmethod
+    def _get_driver_pid(driver) -> Optional[int]:
+        try:
+            return driver.service.process.pid
+        except Exception:
+            return None
+
+    def process_tree(self) -> list:
+        """Процесс chromedriver и все запущенные им процессы Chrome"""
+        if not self.driver_pid:
+            return []
+        try:
+            root = psutil.Process(self.driver_pid)
+            return [root] + root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def rss_mb(self) -> float:
+        """Суммарная занятая память всех процессов драйвера в МБ"""
+        total = 0
+        for proc in self.process_tree():
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / 1024 / 1024
+
+
+class ChromeDriverPool:
+    """
+    Пул долгоживущих драйверов Chrome для плановых обновлений расписания.
+
+    Путь к chromedriver определяется один раз, драйвер переиспользуется между
+    запусками парсера и пересоздается после max_uses использований, при
+    превышении max_rss_mb или если браузер перестал отвечать.
+    options - общий шаблон: каждый драйвер получает свою копию настроек.
+    """
+
+    def __init__(self, options: Options, size: int = 1, max_uses: int = 20, max_rss_mb: int = 700):
+        self.options = options
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.max_rss_mb = max_rss_mb
+        self._driver_path = None
+        self._idle = []
+        self._busy = {}
+        self._lock = Lock()
+        self._closed = False
+        self.stats = {
+            'created': 0,
+            'reused': 0,
+            'recycled': 0,
+            'crashed': 0,
+            'reaped': 0
+        }
+
+    def _get_driver_path(self) -> str:
+        """Путь к chromedriver, определяется один раз за время жизни пула"""
+        if self._driver_path is None:
+            self._driver_path = ChromeDriverManager().install()
+            logger.info(f"ChromeDriver найден: {self._driver_path}")
+        return self._driver_path
+
+    def _create(self) -> _PooledDriver:
+        """Запуск нового экземпляра Chrome"""
+        start = time.perf_counter()
+        driver = webdriver.Chrome(
+            service=Service(self._get_driver_path()),
+            options=build_chrome_options(self.options, CONTENT_PREFS)
+        )
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logger.warning(f"Не удалось включить блокировку ресурсов в Chrome: {e}")
+
+        self.stats['created'] += 1
+        logger.info(f"🚀 Запущен новый драйвер Chrome за {time.perf_counter() - start:.2f} сек")
+        return _PooledDriver(driver)
+
+    @staticmethod
+    def _is_alive(pooled: _PooledDriver) -> bool:
+        """Проверка, что браузер еще отвечает"""
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _dispose(self, pooled: _PooledDriver, reason: str):
+        """Закрытие драйвера с добиванием оставшихся процессов Chrome"""
+        processes = pooled.process_tree()
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии драйвера Chrome: {e}")
+
+        _, alive = psutil.wait_procs(processes, timeout=5)
+        for proc in alive:
+            try:
+                proc.kill()
+            except psutil.Error:
+                continue
+        if alive:
+            psutil.wait_procs(alive, timeout=3)
+            self.stats['reaped'] += len(alive)
+
+        logger.info(f"♻️ Драйвер Chrome закрыт ({reason}), использований: {pooled.uses}")
+
+    def acquire(self):
+        """Получение прогретого драйвера из пула или запуск нового"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Пул драйверов Chrome закрыт")
+            pooled = self._idle.pop() if self._idle else None
+
+        while pooled is not None and not self._is_alive(pooled):
+            self.stats['crashed'] += 1
+            self._dispose(pooled, "браузер не отвечает")
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+
+        if pooled is None:
+            self.reap_zombies()
+            pooled = self._create()
+        else:
+            self.stats['reused'] += 1
+
+        with self._lock:
+            self._busy[id(pooled.driver)] = pooled
+        return pooled.driver
+
+    async def acquire_async(self):
+        """acquire в потоке: запуск Chrome занимает секунды и не должен блокировать цикл событий"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.acquire)
+
+    async def release_async(self, driver, failed: bool = False):
+        """release в потоке: закрытие драйвера ждет завершения процессов Chrome"""
+        await asyncio.get_running_loop().run_in_executor(None, self.release, driver, failed)
+
+    def release(self, driver, failed: bool = False):
+        """Возврат драйвера в пул. Сломанные и отработавшие свое драйверы пересоздаются"""
+        with self._lock:
+            pooled = self._busy.pop(id(driver), None)
+        if pooled is None:
+            return
+
+        pooled.uses += 1
+        reason = None
+        if failed:
+            reason = "ошибка во время парсинга"
+        elif pooled.uses >= self.max_uses:
+            reason = f"достигнут лимит использований ({self.max_uses})"
+        else:
+            rss = pooled.rss_mb()
+            if rss > self.max_rss_mb:
+                reason = f"превышен лимит памяти ({rss:.0f} МБ > {self.max_rss_mb} МБ)"
+
+        if reason is None:
+            with self._lock:
+                if not self._closed and len(self._idle) < self.size:
+                    self._idle.append(pooled)
+                    return
+            reason = "пул закрыт или заполнен"
+
+        self.stats['recycled'] += 1
+        self._dispose(pooled, reason)
+
+    def reap_zombies(self) -> int:
+        """Завершение зависших и зомби-процессов Chrome, не принадлежащих пулу"""
+        with self._lock:
+            owned = {
+                proc.pid
+                for pooled in self._idle + list(self._busy.values())
+                for proc in pooled.process_tree()
+            }
+
+        reaped = 0
+        try:
+            children = psutil.Process().children(recursive=True)
+        except psutil.Error:
+            return 0
+
+        for proc in children:
+            try:
+                if proc.pid in owned:
+                    continue
+                if proc.status() == psutil.STATUS_ZOMBIE:
+                    # Зомби уже завершен - достаточно забрать код возврата
+                    proc.wait(timeout=0)
+                    reaped += 1
+                elif proc.name().lower().startswith(CHROME_PROCESS_NAMES):
+                    proc.kill()
+                    proc.wait(timeout=3)
+                    reaped += 1
+            except (psutil.Error, psutil.TimeoutExpired):
+                continue
+
+        if reaped:
+            self.stats['reaped'] += reaped
+            logger.warning(f"🧹 Завершено {reaped} зависших процессов Chrome")
+        return reaped
+
+    def close(self):
+        """Закрытие всех драйверов пула"""
+        with self._lock:
+            self._closed = True
+            drivers = self._idle + list(self._busy.values())
+            self._idle = []
+            self._busy = {}
+
+        for pooled in drivers:
+            self._dispose(pooled, "остановка пула")
+        self.reap_zombies()
+        logger.info(f"✅ Пул драйверов Chrome закрыт. Статистика: {self.stats}")
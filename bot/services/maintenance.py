@@ -0,0 +1,151 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict
+
+from bot.config import logger, config
+from bot.database import db as sqlite_db
+from bot.utils.date_helpers import get_moscow_time, is_update_window, UPDATE_HOURS
+
+
+class MaintenanceService:
+    """
+    Обслуживание базы данных внутри бота в тихие часы (вне окна обновления расписания).
+
+    Раз в сутки выполняются PRAGMA optimize, возврат свободных страниц порциями
+    (incremental_vacuum), контрольная точка WAL и проверка целостности. Каждая операция
+    держит запись только на одну короткую порцию, весь проход ограничен time_budget секунд.
+    """
+
+    def __init__(self, db=sqlite_db, time_budget: int = 60, pages_per_slice: int = 256,
+                 slice_pause: float = 0.2, integrity_check_days: int = 7, check_interval: int = 600):
+        self.db = db
+        self.time_budget = time_budget
+        self.pages_per_slice = max(1, pages_per_slice)
+        self.slice_pause = slice_pause
+        self.integrity_check_days = max(1, integrity_check_days)
+        self.check_interval = check_interval
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="maintenance")
+        self._last_window = None
+        self._last_full_check = None
+        self.stats = {
+            'runs': 0,
+            'failures': 0,
+            'last_run': None,
+            'duration_ms': None,
+            'reclaimed_pages': None,
+            'integrity': None,
+            'checkpoint': None,
+            'before': None,
+            'after': None
+        }
+
+    @staticmethod
+    def _window_key(moment: datetime):
+        """Сутки, к которым относятся тихие часы: ночь с 19:00 до 07:00 считается одним окном"""
+        return (moment - timedelta(hours=UPDATE_HOURS[0])).date()
+
+    async def _run(self, func, *args):
+        """Выполнение операции с БД в потоке обслуживания"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def run_pass(self) -> Dict:
+        """Один проход обслуживания (по очереди для каждого файла БД)"""
+        start = time.monotonic()
+        deadline = start + self.time_budget
+        now = datetime.now()
+
+        # Полная проверка раз в integrity_check_days дней, в остальные дни quick_check
+        full = self._last_full_check is None or now - self._last_full_check >= timedelta(days=self.integrity_check_days)
+        check_name = "integrity_check" if full else "quick_check"
+        reclaimed = {}
+        integrity = {}
+        checkpoint = {}
+        before = {}
+        after = {}
+
+        for scope in self.db.scopes:
+            scope_start = time.monotonic()
+            before[scope] = await self._run(self.db.get_storage_stats, scope)
+
+            await self._run(self.db.optimize, scope)
+
+            # Свободные страницы возвращаются порциями, между порциями бот работает с БД как обычно
+            reclaimed[scope] = 0
+            while time.monotonic() < deadline:
+                freed = await self._run(self.db.incremental_vacuum, self.pages_per_slice, scope)
+                reclaimed[scope] += freed
+                if freed < self.pages_per_slice:
+                    break
+                await asyncio.sleep(self.slice_pause)
+
+            checkpoint[scope] = await self._run(self.db.checkpoint, 'TRUNCATE', scope)
+            integrity[scope] = await self._run(
+                self.db.integrity_check, full, max(1.0, deadline - time.monotonic()), scope
+            )
+            after[scope] = await self._run(self.db.get_storage_stats, scope)
+
+            if integrity[scope] is None:
+                logger.warning(f"⚠️ {check_name} ({scope}) не уложился в отведенное время, проверка перенесена")
+            elif integrity[scope] != 'ok':
+                logger.error(f"❌ {check_name} ({scope}) обнаружил ошибки в базе данных: {integrity[scope]}")
+            logger.info(
+                f"🧹 Обслуживание БД ({scope}) за {(time.monotonic() - scope_start) * 1000:.0f} мс: "
+                f"страниц {before[scope]['page_count']} -> {after[scope]['page_count']}, "
+                f"свободных {before[scope]['freelist_count']} -> {after[scope]['freelist_count']} "
+                f"(возвращено {reclaimed[scope]}), "
+                f"WAL {before[scope]['wal_kb']} КБ -> {after[scope]['wal_kb']} КБ, "
+                f"{check_name}: {integrity[scope] or 'прерван'}"
+            )
+
+        if full and all(result is not None for result in integrity.values()):
+            self._last_full_check = now
+
+        self.stats.update({
+            'runs': self.stats['runs'] + 1,
+            'last_run': now,
+            'duration_ms': round((time.monotonic() - start) * 1000, 1),
+            'reclaimed_pages': sum(reclaimed.values()),
+            'integrity': integrity,
+            'checkpoint': checkpoint,
+            'before': before,
+            'after': after
+        })
+        return self.stats
+
+    def get_stats(self) -> Dict:
+        """Статистика обслуживания"""
+        return dict(self.stats)
+
+    async def start(self):
+        """Запуск обслуживания: проверка раз в check_interval секунд, один проход за тихие часы"""
+        logger.info("🧹 Запуск обслуживания БД в тихие часы")
+        while self._running:
+            try:
+                moment = get_moscow_time()
+                window = self._window_key(moment)
+                if not is_update_window(moment) and window != self._last_window:
+                    self._last_window = window
+                    await self.run_pass()
+                await asyncio.sleep(self.check_interval)
+            except asyncio.CancelledError:
+                logger.info("🛑 Обслуживание БД остановлено")
+                break
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.error(f"❌ Ошибка при обслуживании БД: {e}")
+                await asyncio.sleep(self.check_interval)
+
+    def stop(self):
+        """Остановка обслуживания"""
+        self._running = False
+        self._executor.shutdown(wait=True)
+
+
+maintenance_service = MaintenanceService(
+    time_budget=config.MAINTENANCE_TIME_BUDGET,
+    integrity_check_days=config.INTEGRITY_CHECK_DAYS
+)
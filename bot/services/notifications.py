@@ -5,6 +5,7 @@ from bot.config import config, logger,WEEKDAYS, MONTHS
 from bot.database.db_adapter import db_adapter as db
 from bot.middlewares.schedule_formatter import ScheduleFormatter
 from bot.utils.academic_reset import AcademicYearReset
+from bot.utils import schedule_calendar
 import asyncio
 import time
 
@@ -13,27 +14,8 @@ class NotificationManager:
         self.bot = bot
         self.formatter = ScheduleFormatter()
         self._running = True
-        self._initialize_tables()
         self.academic_reset = AcademicYearReset(bot)
 
-    def _initialize_tables(self):
-        """Инициализация необходимых таблиц"""
-        try:
-            # Создаем таблицу для хранения последних проверенных дат
-            query = """
-            CREATE TABLE IF NOT EXISTS last_checked_dates (
-                id INTEGER PRIMARY KEY,
-                dates TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-            db.db.execute_query(query)
-            logger.info("Таблица last_checked_dates успешно инициализирована")
-        except Exception as e:
-            logger.error(f"Ошибка при инициализации таблиц: {e}")
-            import traceback
-            logger.error(f"Трассировка: {traceback.format_exc()}")
-
     async def start_notifications(self):
         """Запуск проверки уведомлений"""
         logger.info("🔔 Запуск системы мониторинга")
@@ -83,59 +65,27 @@ class NotificationManager:
         try:
             logger.info("📊 Начало проверки новых дат в расписании")
             
-            # Получаем текущее расписание
-            schedule = await db.get_schedule()
-            if not schedule:
+            # Для поиска новых дат нужны только даты, сами пары не загружаем
+            schedule_dates = await db.get_schedule_dates()
+            if not schedule_dates:
                 logger.info("❌ Расписание пусто, нет данных для проверки уведомлений")
                 return False
 
-            logger.info(f"📋 Получено расписание с {len(schedule)} датами")
+            logger.info(f"📋 Получено расписание с {len(schedule_dates)} датами")
             
             # Получаем даты из расписания
             current_dates = set()
             invalid_dates = []
             
-            # Словарь для преобразования месяцев
-            month_mapping = {
-                'янв': '01', 'фев': '02', 'мар': '03', 'апр': '04',
-                'мая': '05', 'май': '05', 'июн': '06', 'июл': '07', 'авг': '08',
-                'сен': '09', 'окт': '10', 'ноя': '11', 'дек': '12',
-            }
-            
-            for date_str in schedule.keys():
-                try:
-                    # Попытка распознать формат DD.MM.YYYY
-                    if '.' in date_str:
-                        datetime.strptime(date_str, "%d.%m.%Y")
-                        current_dates.add(date_str)
-                    # Попытка распознать формат DD-MMM
-                    elif '-' in date_str:
-                        day, month_abbr = date_str.split('-')
-                        day = day.strip()
-                        month_abbr = month_abbr.strip().lower()[:3]  # Берем только первые 3 буквы
-                        
-                        if month_abbr in month_mapping:
-                            month_num = month_mapping[month_abbr]
-                            year = datetime.now().year
-                            
-                            # Формируем дату в формате DD.MM.YYYY
-                            formatted_date = f"{day.zfill(2)}.{month_num}.{year}"
-                            
-                            # Проверяем, что дата валидна
-                            datetime.strptime(formatted_date, "%d.%m.%Y")
-                            
-                            logger.info(f"🔄 Преобразована дата: {date_str} -> {formatted_date}")
-                            current_dates.add(formatted_date)
-                        else:
-                            logger.warning(f"⚠️ Неизвестное сокращение месяца: {month_abbr} в дате {date_str}")
-                            invalid_dates.append(date_str)
-                    else:
-                        invalid_dates.append(date_str)
-                        logger.warning(f"⚠️ Некорректный формат даты: {date_str}")
-                except ValueError as e:
+            for row in schedule_dates:
+                date_str = row['date']
+                # ISO-дата сохраняется при записи расписания, для старых строк разбираем исходную дату
+                parsed_date = schedule_calendar.parse_schedule_date(row['iso_date'] or date_str)
+                if parsed_date:
+                    current_dates.add(parsed_date.strftime("%d.%m.%Y"))
+                else:
                     invalid_dates.append(date_str)
-                    logger.warning(f"⚠️ Ошибка при обработке даты {date_str}: {e}")
-                    continue
+                    logger.warning(f"⚠️ Некорректный формат даты: {date_str}")
             
             if invalid_dates:
                 logger.warning(f"⚠️ Обнаружено {len(invalid_dates)} дат с некорректным форматом")
@@ -190,31 +140,11 @@ class NotificationManager:
                 
                 # Форматируем даты для удобного отображения
                 formatted_dates = []
-                for date_str in sorted(new_dates):
+                for date_str in sorted(new_dates, key=lambda value: datetime.strptime(value, "%d.%m.%Y")):
                     try:
                         date = datetime.strptime(date_str, "%d.%m.%Y")
-                        
-                        # Получаем день недели
-                        weekday_num = date.weekday()  # 0 - понедельник, 6 - воскресенье
-                        weekday_names = {
-                            0: "понедельник",
-                            1: "вторник",
-                            2: "среда",
-                            3: "четверг",
-                            4: "пятница",
-                            5: "суббота",
-                            6: "воскресенье"
-                        }
-                        weekday = weekday_names.get(weekday_num, "")
-                        
-                        # Получаем месяц и форматируем его
-                        month_num = date.month
-                        months = {
-                            1: 'январь', 2: 'февраль', 3: 'март', 4: 'апрель',
-                            5: 'май', 6: 'июнь', 7: 'июль', 8: 'август',
-                            9: 'сентябрь', 10: 'октябрь', 11: 'ноябрь', 12: 'декабрь'
-                        }
-                        month_name = months.get(month_num, "")
+                        weekday = schedule_calendar.weekday_name(date.weekday())
+                        month_name = schedule_calendar.MONTH_NAMES[date.month]
                         
                         # Форматируем дату в нужном формате
                         formatted_date = f"{date.day} {month_name} ({weekday})"
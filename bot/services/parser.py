@@ -3,7 +3,7 @@ import asyncio
 from bs4 import BeautifulSoup
 from datetime import datetime
 from bot.services.database import Database
-from bot.config import logger, WEEKDAYS, format_date
+from bot.config import logger, WEEKDAYS, format_date, config
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -15,10 +15,14 @@ import time
 from threading import Lock
 from webdriver_manager.chrome import ChromeDriverManager
 import requests.exceptions
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Optional
 import locale
 from bot.utils.date_helpers import format_russian_date, parse_russian_date
+from bot.utils import schedule_calendar
+from bot.utils.schedule_fingerprint import PAGE_KEY, fingerprint_schedule, diff_dates
+from bot.services.driver_pool import build_chrome_options
 import platform
+import psutil
 
 user_lock = Lock()
 
@@ -28,45 +32,164 @@ if platform.system() == 'Windows':
 else:
     locale.setlocale(locale.LC_ALL, 'ru_RU.UTF-8')
 
-class ScheduleParser:
-    def __init__(self):
-        self.url = "https://bartc.by/index.php/obuchayushchemusya/dnevnoe-otdelenie/tekushchee-raspisanie"
-        self.db = Database()
-        
-        # Добавляем словарь для месяцев
-        self.MONTH_MAP = {
-            'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4,
-            'май': 5, 'мая': 5, 'июн': 6, 'июл': 7, 'авг': 8,
-            'сен': 9, 'окт': 10, 'нояб': 11, 'дек': 12
+# Ожидание события init.dt: callback(true), когда все таблицы DataTables инициализированы,
+# callback(false), если на странице нет jQuery DataTables
+DATATABLES_WAIT_SCRIPT = """
+var timeoutMs = arguments[0];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+var timer = null;
+var finished = false;
+
+function finish(value) {
+    if (!finished) {
+        finished = true;
+        clearInterval(timer);
+        done(value);
+    }
+}
+
+function ready() {
+    var $ = window.jQuery;
+    if (!$ || !$.fn || !$.fn.dataTable) {
+        return false;
+    }
+    var dt = $.fn.dataTable.tables();
+    if (!dt.length) {
+        return false;
+    }
+    for (var i = 0; i < dt.length; i++) {
+        var settings = $(dt[i]).DataTable().settings()[0];
+        if (!settings || !settings._bInitComplete) {
+            return false;
         }
-        
-        # Добавляем словарь для дней недели с номерами
-        self.WEEKDAY_MAP = {
-            'понедельник': 0,
-            'вторник': 1,
-            'среда': 2,
-            'четверг': 3,
-            'пятница': 4,
-            'суббота': 5,
-            'воскресенье': 6
+    }
+    return true;
+}
+
+function check() {
+    if (ready()) {
+        finish(true);
+    } else if (Date.now() - started > timeoutMs) {
+        finish(false);
+    } else if (document.readyState === 'complete' && Date.now() - started > 2000
+               && !(window.jQuery && window.jQuery.fn && window.jQuery.fn.dataTable)) {
+        // Страница загружена, а плагина DataTables на ней нет
+        finish(false);
+    }
+}
+
+if (ready()) {
+    finish(true);
+} else {
+    if (window.jQuery) {
+        window.jQuery(document).on('init.dt', check);
+    }
+    timer = setInterval(check, 100);
+}
+"""
+
+# Все строки всех таблиц DataTables с текстом ячеек ari-tbl-col-N, в исходном порядке.
+# Сохраненный поиск и сортировка посетителя не учитываются (search: 'none', order: 'index').
+# При deferRender у неотрисованных строк нет DOM-узла - их ячейки берутся из data().
+# read - сколько строк удалось разобрать, total - сколько строк в таблицах (recordsTotal)
+DATATABLES_ROWS_SCRIPT = """
+var $ = window.jQuery;
+if (!$ || !$.fn || !$.fn.dataTable) {
+    return null;
+}
+
+var COL_RE = /(?:^|\\s)ari-tbl-col-(\\d+)(?:\\s|$)/;
+
+function cellText(node) {
+    var parts = [];
+    var walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT, null);
+    while (walker.nextNode()) {
+        var text = walker.currentNode.nodeValue.trim();
+        if (text) {
+            parts.push(text);
         }
-        
-        # Обратный словарь для дней недели
-        self.WEEKDAY_REVERSE = {
-            0: 'понедельник',
-            1: 'вторник',
-            2: 'среда',
-            3: 'четверг',
-            4: 'пятница',
-            5: 'суббота',
-            6: 'воскресенье'
+    }
+    return parts.join('');
+}
+
+function htmlText(html) {
+    var box = document.createElement('div');
+    box.innerHTML = html == null ? '' : String(html);
+    return cellText(box);
+}
+
+var result = [];
+var read = 0;
+var total = 0;
+$.fn.dataTable.tables().forEach(function (table) {
+    var api = $(table).DataTable();
+    var settings = api.settings()[0];
+    total += api.page.info().recordsTotal;
+
+    // Классы колонок для строк без DOM-узла: заголовок и настройки колонки
+    var colClasses = api.columns().indexes().toArray().map(function (index) {
+        var header = api.column(index).header();
+        return ((header && header.className) || '') + ' ' + (settings.aoColumns[index].sClass || '');
+    });
+
+    var selector = {search: 'none', order: 'index'};
+    var nodes = api.rows(selector).nodes().toArray();
+    var data = api.rows(selector).data().toArray();
+    data.forEach(function (values, i) {
+        var row = nodes[i];
+        var cols = {};
+        if (row) {
+            var cells = row.querySelectorAll('td, th');
+            read++;
+            if (!cells.length) {
+                return;
+            }
+            row.querySelectorAll('td').forEach(function (cell, index) {
+                var match = COL_RE.exec(cell.className);
+                if (match && !(match[1] in cols)) {
+                    cols[match[1]] = cellText(cell);
+                }
+                // Отрисованная строка уточняет классы колонок для строк без узла
+                if (match && colClasses[index] !== undefined && !COL_RE.test(colClasses[index])) {
+                    colClasses[index] += ' ' + cell.className;
+                }
+            });
+            result.push({first: cellText(cells[0]), cols: cols});
+            return;
+        }
+
+        // Строка еще не отрисована: ячейки из исходных данных (массив HTML по колонкам)
+        if (!Array.isArray(values) || !values.length) {
+            return;
+        }
+        var texts = values.map(htmlText);
+        texts.forEach(function (text, index) {
+            var match = COL_RE.exec(colClasses[index] || '');
+            if (match && !(match[1] in cols)) {
+                cols[match[1]] = text;
+            }
+        });
+        if (!Object.keys(cols).length && texts.some(Boolean)) {
+            // Колонки не сопоставить - строка не считается прочитанной
+            return;
         }
+        read++;
+        result.push({first: texts[0], cols: cols});
+    });
+});
+return {rows: result, read: read, total: total};
+"""
+
+class ScheduleParser:
+    def __init__(self, driver_pool=None):
+        self.url = "https://bartc.by/index.php/obuchayushchemusya/dnevnoe-otdelenie/tekushchee-raspisanie"
+        self.db = Database()
         
         # Настройка Chrome options
         self.chrome_options = Options()
         self.chrome_options.add_argument("--headless=new")
         self.chrome_options.add_argument("--disable-gpu")
-        self.chrome_options.add_argument("--remote-debugging-port=9222")
         self.chrome_options.add_argument("--disable-extensions")
         self.chrome_options.add_argument("--disable-dev-shm-usage")
         self.chrome_options.add_argument("--no-sandbox")
@@ -77,89 +200,50 @@ class ScheduleParser:
         self.chrome_options.add_argument("--start-maximized")
         self.chrome_options.add_argument("--disable-blink-features=AutomationControlled")
         self.chrome_options.add_argument("--memory-pressure-off")
-        self.chrome_options.add_argument("--single-process")
         self.chrome_options.add_argument("--ignore-certificate-errors")
 
+        # Движок парсинга: 'auto' (HTTP с откатом на Selenium), 'http' или 'selenium'
+        self.engine = config.PARSER_ENGINE if config.PARSER_ENGINE in ('auto', 'http', 'selenium') else 'auto'
+        self.http_timeout = 30
+        self.http_headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                          '(KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+            'Accept-Language': 'ru-RU,ru;q=0.9'
+        }
+        # Последние замеры времени и ресурсов по каждому движку
+        self.engine_stats = {}
+
+        # Режим Selenium: 'datatables' (все строки одним вызовом API) или 'paging' (переключение страниц)
+        self.selenium_mode = config.SELENIUM_MODE if config.SELENIUM_MODE in ('datatables', 'paging') else 'datatables'
+        self.datatables_timeout = 30
+
+        # Результат сравнения последнего парсинга с сохраненными отпечатками
+        self.last_result_changed = True
+        self.changed_dates = {'added': [], 'changed': [], 'removed': []}
+        # Количество вставленных, измененных и удаленных записей при последнем сохранении
+        self.last_save_counts = None
+
+        # Пул прогретых драйверов Chrome (если не задан - драйвер создается на каждый запуск)
+        self.driver_pool = driver_pool
+
     async def parse_schedule(self) -> tuple:
         """Парсинг расписания"""
-        driver = None
         try:
-            logger.info("Начало парсинга расписания")
-            
-            # Используем ChromeDriverManager для автоматической установки и управления ChromeDriver
-            driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=self.chrome_options
-            )
-            
-            # Увеличиваем таймауты
-            driver.set_page_load_timeout(45)
-            driver.implicitly_wait(30)
-            
-            driver.get(self.url)
-            logger.info("Страница загружена")
-            
-            # Увеличиваем время ожидания таблицы
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "table"))
-            )
-            
-            # Даем дополнительное время на загрузку JavaScript
-            await asyncio.sleep(3)
-            
-            schedule_data = {}
-            group_set = set()
-            teacher_set = set()
-
-            while True:
-                html = driver.page_source
-                soup = BeautifulSoup(html, 'html.parser')
-                schedule_tables = soup.find_all('table')
-
-                if not schedule_tables:
-                    return None, None, "❌ Расписание не найдено"
-
-                current_day = ""
-
-                for table in schedule_tables:
-                    rows = table.find_all('tr')
-                    for row in rows:
-                        cells = row.find_all(['td', 'th'])
-                        if not cells:
-                            continue
-
-                        date_cell = cells[0].get_text(strip=True)
-                        if len(date_cell) > 0:
-                            try:
-                                # Пропускаем заголовок таблицы
-                                if date_cell.lower() == 'дата':
-                                    continue
-                                    
-                                current_day = date_cell.strip('()')
-                                if current_day not in schedule_data:
-                                    schedule_data[current_day] = {}
-
-                                group_cell = row.find('td', class_='ari-tbl-col-1')
-                                if group_cell:
-                                    group = group_cell.get_text(strip=True)
-                                    group_set.add(group)
-
-                                    lesson_data = self._extract_lesson_data(row)
-                                    if lesson_data:
-                                        if group not in schedule_data[current_day]:
-                                            schedule_data[current_day][group] = []
-                                        schedule_data[current_day][group].append(lesson_data)
-                                        
-                                        # Добавляем преподавателя в множество, если он есть
-                                        if lesson_data['teacher']:
-                                            teacher_set.add(lesson_data['teacher'])
-
-                            except ValueError as ve:
-                                logger.warning(f"Ошибка обработки даты: {ve}")
-                                continue
-
-                if not self._go_to_next_page(driver):
-                    break
+            logger.info(f"Начало парсинга расписания (движок: {self.engine})")
+
+            result = None
+            if self.engine in ('auto', 'http'):
+                result = await self._run_engine('http', self._parse_with_http)
+                if result is None and self.engine == 'auto':
+                    logger.warning("HTTP-движок не нашел таблиц расписания, переключаемся на Selenium")
+
+            if result is None and self.engine in ('auto', 'selenium'):
+                result = await self._run_engine('selenium', self._parse_with_selenium)
+
+            if result is None:
+                return None, [], [], "❌ Расписание не найдено"
+
+            schedule_data, group_set, teacher_set = result
 
             # Сортируем и сохраняем списки
             groups_list = sorted(list(group_set))
@@ -167,21 +251,46 @@ class ScheduleParser:
 
             logger.info(f"Найдено групп: {len(groups_list)}")
             logger.info(f"Найдено преподавателей: {len(teachers_list)}")
+
+            # Запросы к БД идут через потоки async_db, чтобы публикация и ожидание блокировки записи
+            # не останавливали цикл событий (парсер запускается и из обработчика админ-панели)
+            from bot.database import async_db
+
+            # Сравниваем отпечаток результата с сохраненным, чтобы не перезаписывать неизменившееся расписание
+            page_hash, date_hashes = fingerprint_schedule(schedule_data, groups_list, teachers_list)
+            stored = {}
+            try:
+                stored = await async_db.get_schedule_fingerprints()
+            except Exception as e:
+                logger.warning(f"Не удалось получить отпечатки расписания: {e}")
+
+            stored_page_hash = stored.pop(PAGE_KEY, None)
+            self.changed_dates = diff_dates(stored, date_hashes)
+            self.last_result_changed = page_hash != stored_page_hash
+
+            if not self.last_result_changed:
+                logger.info("🟰 Расписание не изменилось с прошлой проверки, сохранение пропущено")
+                return schedule_data, groups_list, teachers_list, None
+
+            logger.info(
+                f"Изменения в расписании: новых дат {len(self.changed_dates['added'])}, "
+                f"измененных {len(self.changed_dates['changed'])}, "
+                f"удаленных {len(self.changed_dates['removed'])}"
+            )
             
             # Сохраняем списки в базу данных
             if len(groups_list) > 0 or len(teachers_list) > 0:
                 try:
-                    # Сохраняем в SQLite
-                    from bot.database import db as sqlite_db
-                    sqlite_db.save_groups(groups_list)
-                    sqlite_db.save_teachers(teachers_list)
-                    logger.info(f"Списки сохранены в SQLite: {len(groups_list)} групп и {len(teachers_list)} преподавателей")
-                    
-                    # Сохраняем расписание
                     if schedule_data:
-                        # Сохраняем в SQLite
-                        sqlite_db.save_schedule(schedule_data)
-                        logger.info("Расписание сохранено в SQLite")
+                        # Группы, преподаватели, расписание и отпечатки публикуются одним снимком:
+                        # читатели видят либо прошлое, либо новое расписание целиком
+                        self.last_save_counts = await async_db.publish_schedule(
+                            schedule_data,
+                            groups_list,
+                            teachers_list,
+                            fingerprints={PAGE_KEY: page_hash, **date_hashes}
+                        )
+                        logger.info(f"Списки сохранены в SQLite: {len(groups_list)} групп и {len(teachers_list)} преподавателей")
                     else:
                         logger.error("Расписание пусто!")
                         return None, [], [], "❌ Не удалось получить расписание"
@@ -200,30 +309,251 @@ class ScheduleParser:
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             return None, [], [], f"❌ Ошибка при получении расписания. Попробуйте позже."
-            
+
+    async def _run_engine(self, name: str, engine) -> Optional[tuple]:
+        """Запуск движка парсинга с замером времени и потребляемых ресурсов"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rss_start = psutil.Process().memory_info().rss
+
+        try:
+            result = await engine()
         finally:
-            if driver:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            rss_delta = (psutil.Process().memory_info().rss - rss_start) / 1024 / 1024
+            self.engine_stats[name] = {
+                'wall': wall,
+                'cpu': cpu,
+                'rss_delta_mb': rss_delta,
+                'timestamp': datetime.now()
+            }
+            logger.info(
+                f"⏱️ Движок {name}: {wall:.2f} сек, CPU процесса бота: {cpu:.2f} сек, "
+                f"изменение RSS: {rss_delta:+.1f} МБ"
+            )
+
+        if result is not None:
+            schedule_data, group_set, _ = result
+            lessons_count = sum(len(lessons) for groups in schedule_data.values() for lessons in groups.values())
+            logger.info(f"Движок {name}: {len(schedule_data)} дат, {len(group_set)} групп, {lessons_count} пар")
+        return result
+
+    async def _parse_with_http(self) -> Optional[tuple]:
+        """Получение расписания без браузера: загрузка HTML через aiohttp и разбор таблиц"""
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.http_timeout)
+            async with aiohttp.ClientSession(timeout=timeout, headers=self.http_headers) as session:
+                async with session.get(self.url, ssl=False) as response:
+                    response.raise_for_status()
+                    html = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Не удалось загрузить страницу расписания через HTTP: {e}")
+            return None
+
+        schedule_data = {}
+        group_set = set()
+        teacher_set = set()
+
+        tables_count = self._parse_html(html, schedule_data, group_set, teacher_set)
+        if not tables_count or not any(schedule_data.values()):
+            # Таблица могла подгружаться скриптом DataTables - без браузера ее не получить
+            logger.info(f"HTTP-движок: таблиц {tables_count}, строк расписания не найдено")
+            return None
+
+        return schedule_data, group_set, teacher_set
+
+    async def _parse_with_selenium(self) -> Optional[tuple]:
+        """Получение расписания через headless Chrome"""
+        driver = None
+        failed = True
+        try:
+            # Запуск Chrome занимает секунды - в потоке, чтобы не блокировать цикл событий
+            if self.driver_pool:
+                driver = await self.driver_pool.acquire_async()
+            else:
+                driver = await asyncio.get_running_loop().run_in_executor(None, self._start_driver)
+
+            # Загрузка страницы и ожидание DataTables блокируют до десятков секунд - тоже в потоке
+            result = await asyncio.get_running_loop().run_in_executor(None, self._scrape_with_driver, driver)
+            failed = False
+            return result
+
+        finally:
+            if driver and self.driver_pool:
+                await self.driver_pool.release_async(driver, failed=failed)
+            elif driver:
                 try:
-                    driver.quit()
+                    await asyncio.get_running_loop().run_in_executor(None, driver.quit)
                     logger.info("Драйвер Chrome закрыт")
                 except Exception as e:
                     logger.error(f"Ошибка при закрытии драйвера: {e}")
 
-    def _extract_lesson_data(self, row):
-        """Извлечение данных о паре из строки таблицы"""
-        number = row.find('td', class_='ari-tbl-col-2')
-        discipline = row.find('td', class_='ari-tbl-col-3')
-        teacher = row.find('td', class_='ari-tbl-col-4')
-        classroom = row.find('td', class_='ari-tbl-col-5')
-        subgroup = row.find('td', class_='ari-tbl-col-6')
+    def _scrape_with_driver(self, driver) -> Optional[tuple]:
+        """Загрузка страницы в драйвере и разбор расписания (блокирующий вызов, выполняется в потоке)"""
+        driver.set_page_load_timeout(45)
+
+        schedule_data = {}
+        group_set = set()
+        teacher_set = set()
+
+        rows = None
+        if self.selenium_mode == 'datatables':
+            # Без неявных ожиданий: каждый find_element не должен ждать до 30 секунд
+            driver.implicitly_wait(0)
+            driver.get(self.url)
+            logger.info("Страница загружена")
+            rows = self._extract_datatables_rows(driver)
+            if rows is None:
+                logger.warning("DataTables API недоступен, переключаемся на постраничный разбор")
+
+        if rows is not None:
+            if not rows:
+                return None
+            self._parse_rows(rows, schedule_data, group_set, teacher_set)
+        elif not self._parse_pages(driver, schedule_data, group_set, teacher_set):
+            return None
+
+        return schedule_data, group_set, teacher_set
+
+    def _start_driver(self):
+        """Запуск отдельного драйвера Chrome без пула"""
+        # Используем ChromeDriverManager для автоматической установки и управления ChromeDriver
+        return webdriver.Chrome(
+            service=Service(ChromeDriverManager().install()),
+            options=build_chrome_options(self.chrome_options)
+        )
+
+    def _extract_datatables_rows(self, driver) -> Optional[list]:
+        """
+        Получение всех строк таблиц одним вызовом DataTables API, без переключения страниц.
+
+        Возвращает список строк вида (текст первой ячейки, {номер колонки: текст})
+        или None, если на странице нет DataTables или часть строк не удалось прочитать.
+        """
+        driver.set_script_timeout(self.datatables_timeout)
+        try:
+            initialized = driver.execute_async_script(DATATABLES_WAIT_SCRIPT, (self.datatables_timeout - 1) * 1000)
+        except Exception as e:
+            logger.warning(f"Не дождались инициализации DataTables: {e}")
+            return None
+        if not initialized:
+            return None
+
+        extracted = driver.execute_script(DATATABLES_ROWS_SCRIPT)
+        if extracted is None:
+            return None
+        if extracted['read'] < extracted['total']:
+            # Часть строк не удалось прочитать - надежнее постраничный разбор
+            logger.warning(
+                f"DataTables: прочитано {extracted['read']} строк из {extracted['total']}"
+            )
+            return None
+
+        rows = [
+            (row['first'], {int(col): text for col, text in row['cols'].items()})
+            for row in extracted['rows']
+        ]
+        logger.info(f"Получено {len(rows)} строк из DataTables за один вызов")
+        return rows
+
+    def _parse_pages(self, driver, schedule_data: dict, group_set: set, teacher_set: set) -> bool:
+        """Постраничный разбор таблицы с переключением страниц DataTables"""
+        driver.implicitly_wait(30)
+        driver.get(self.url)
+        logger.info("Страница загружена")
+
+        # Увеличиваем время ожидания таблицы
+        WebDriverWait(driver, 30).until(
+            EC.presence_of_element_located((By.TAG_NAME, "table"))
+        )
+
+        # Даем дополнительное время на загрузку JavaScript (метод выполняется в потоке)
+        time.sleep(3)
+
+        while True:
+            if not self._parse_html(driver.page_source, schedule_data, group_set, teacher_set):
+                return False
+
+            if not self._go_to_next_page(driver):
+                return True
+
+    def _parse_html(self, html: str, schedule_data: dict, group_set: set, teacher_set: set) -> int:
+        """Разбор таблиц расписания из HTML. Возвращает количество найденных таблиц"""
+        soup = BeautifulSoup(html, 'html.parser')
+        schedule_tables = soup.find_all('table')
+
+        rows = []
+        for table in schedule_tables:
+            for row in table.find_all('tr'):
+                cells = row.find_all(['td', 'th'])
+                if not cells:
+                    continue
+
+                cols = {}
+                for cell in row.find_all('td'):
+                    for css_class in cell.get('class') or []:
+                        if css_class.startswith('ari-tbl-col-') and css_class[12:].isdigit():
+                            cols.setdefault(int(css_class[12:]), cell.get_text(strip=True))
+                rows.append((cells[0].get_text(strip=True), cols))
 
-        if any([number, discipline, teacher, classroom]):
+        self._parse_rows(rows, schedule_data, group_set, teacher_set)
+        return len(schedule_tables)
+
+    def _parse_rows(self, rows: list, schedule_data: dict, group_set: set, teacher_set: set):
+        """Разбор строк таблицы: (текст первой ячейки, {номер колонки ari-tbl-col-N: текст})"""
+        current_day = ""
+
+        for date_cell, cols in rows:
+            if len(date_cell) > 0:
+                try:
+                    # Пропускаем заголовок таблицы
+                    if date_cell.lower() == 'дата':
+                        continue
+
+                    current_day = date_cell.strip('()')
+                    if current_day not in schedule_data:
+                        schedule_data[current_day] = {}
+
+                    # Дата и день недели вычисляются один раз при разборе и сохраняются в БД
+                    iso_date = schedule_calendar.to_iso(current_day)
+                    weekday = schedule_calendar.weekday_of(current_day)
+
+                    if 1 in cols:
+                        group = cols[1]
+                        group_set.add(group)
+
+                        lesson_data = self._extract_lesson_data(cols)
+                        if lesson_data:
+                            lesson_data['iso_date'] = iso_date
+                            lesson_data['weekday'] = weekday
+                            if group not in schedule_data[current_day]:
+                                schedule_data[current_day][group] = []
+                            schedule_data[current_day][group].append(lesson_data)
+
+                            # Добавляем преподавателя в множество, если он есть
+                            if lesson_data['teacher']:
+                                teacher_set.add(lesson_data['teacher'])
+
+                except ValueError as ve:
+                    logger.warning(f"Ошибка обработки даты: {ve}")
+                    continue
+
+    def _extract_lesson_data(self, cols: dict):
+        """Извлечение данных о паре из колонок строки таблицы"""
+        number = cols.get(2)
+        discipline = cols.get(3)
+        teacher = cols.get(4)
+        classroom = cols.get(5)
+        subgroup = cols.get(6)
+
+        if any(value is not None for value in (number, discipline, teacher, classroom)):
             return {
-                'number': int(number.get_text(strip=True)) if number and number.get_text(strip=True).isdigit() else 0,
-                'discipline': discipline.get_text(strip=True) if discipline else '',
-                'teacher': teacher.get_text(strip=True) if teacher else '',
-                'classroom': classroom.get_text(strip=True) if classroom else '',
-                'subgroup': subgroup.get_text(strip=True) if subgroup else '0',
+                'number': int(number) if number and number.isdigit() else 0,
+                'discipline': discipline or '',
+                'teacher': teacher or '',
+                'classroom': classroom or '',
+                'subgroup': subgroup if subgroup is not None else '0',
                 'group': ''  # Добавляем пустое поле для группы
             }
         return None
@@ -264,133 +594,45 @@ class ScheduleParser:
 
     def _parse_date(self, date_str: str) -> datetime:
         """Парсинг даты из различных форматов"""
-        try:
-            # Очищаем строку от скобок и пробелов
-            date_str = date_str.strip('()').strip()
-            
-            # Пропускаем заголовок таблицы
-            if date_str.lower() == 'дата':
-                return None
-            
-            # Пробуем формат '05-март'
-            if '-' in date_str:
-                day, month = date_str.split('-')
-                day = day.strip()
-                month = month.strip().lower()
-                
-                # Проверяем, является ли day числом
-                if not day.isdigit():
-                    raise ValueError(f"Некорректный день: {day}")
-                
-                # Добавляем специальную обработку для "мая"
-                if month == "мая":
-                    month_num = 5
-                else:
-                    # Пробуем сначала полное название месяца
-                    month_num = self.MONTH_MAP.get(month)
-                    
-                    # Затем пробуем первые 3 буквы, если полное название не найдено
-                    if not month_num and len(month) > 3:
-                        month_short = month[:3]
-                        month_num = self.MONTH_MAP.get(month_short)
-                
-                if not month_num:
-                    raise ValueError(f"Неизвестный месяц: {month}")
-                
-                # Получаем текущий год и месяц
-                current_year = datetime.now().year
-                current_month = datetime.now().month
-                
-                # Если месяц меньше текущего, значит это следующий год
-                year = current_year if month_num >= current_month else current_year + 1
-                
-                return datetime.strptime(f"{day.zfill(2)}-{month_num}-{year}", "%d-%m-%Y")
-            
-            # Пробуем формат '24.12.2023'
-            else:
-                return datetime.strptime(date_str, '%d.%m.%Y')
-                
-        except Exception as e:
-            logger.error(f"Ошибка при обработке даты {date_str}: {e}")
-            return None
+        return schedule_calendar.to_datetime(date_str)
 
     def _format_date_with_weekday(self, date_str: str) -> str:
         """Форматирует дату с днем недели на русском"""
-        try:
-            parsed_date = self._parse_date(date_str)
-            if not parsed_date:
-                logger.error(f"Не удалось распарсить дату: {date_str}")
-                return date_str
-            
-            # Получаем номер дня недели (0-6, где 0 - понедельник)
-            weekday = parsed_date.weekday()
-            logger.info(f"Получен номер дня недели: {weekday} для даты {date_str}")
-            
-            # Получаем русское название дня недели
-            rus_weekday = self.WEEKDAY_REVERSE.get(weekday)
-            if rus_weekday:
-                formatted_date = f"{date_str} ({rus_weekday})"
-                logger.info(f"Отформатированная дата: {formatted_date}")
-                return formatted_date
-            
-            logger.warning(f"Не найден русский день недели для номера {weekday}")
-            return date_str
-            
-        except Exception as e:
-            logger.error(f"Ошибка форматирования даты {date_str}: {e}")
-            return date_str
+        return schedule_calendar.format_with_weekday(date_str)
 
     async def get_schedule_for_day(self, day: str, user_data: dict) -> Union[Dict[str, List[Dict]], str]:
         """Получение расписания на конкретный день"""
         try:
-            from bot.database import db as sqlite_db
+            from bot.database import async_db
+
+            target_weekday_num = schedule_calendar.weekday_number(day)
+            if target_weekday_num is None:
+                return f"❌ Некорректный день недели: {day}"
 
             role = user_data.get('role')
             if role == 'Студент':
                 target = user_data.get('selected_group')
                 if not target:
                     return "❌ Не выбрана группа"
-                schedule = sqlite_db.get_schedule_by_group(target)
+                schedule = await async_db.get_schedule_by_group(target, weekday=target_weekday_num)
+                has_schedule = bool(schedule) or await async_db.has_schedule(group_name=target)
             else:
                 target = user_data.get('selected_teacher')
                 if not target:
                     return "❌ Не выбран преподаватель"
-                schedule = sqlite_db.get_schedule_by_teacher(target)
+                schedule = await async_db.get_schedule_by_teacher(target, weekday=target_weekday_num)
+                has_schedule = bool(schedule) or await async_db.has_schedule(teacher_name=target)
 
-            if not schedule:
+            if not has_schedule:
                 return ("ℹ️ Информация о расписании\n\n"
                        "В данный момент расписание обновляется на сайте БТК.\n"
                        "Пожалуйста, повторите запрос через несколько минут.")
 
-            target_weekday_num = self.WEEKDAY_MAP.get(day.lower())
-            if target_weekday_num is None:
-                return f"❌ Некорректный день недели: {day}"
-
-            grouped_schedule: Dict[str, List[Dict]] = {}
-            
-            # Фильтруем расписание по дню недели и группируем по датам
-            for lesson in schedule:
-                try:
-                    date_str = lesson['date']
-                    parsed_date = self._parse_date(date_str)
-                    
-                    if parsed_date and parsed_date.weekday() == target_weekday_num:
-                        formatted_date_with_weekday = self._format_date_with_weekday(date_str)
-                        if formatted_date_with_weekday not in grouped_schedule:
-                            grouped_schedule[formatted_date_with_weekday] = []
-                        grouped_schedule[formatted_date_with_weekday].append(lesson)
-                except Exception as e:
-                    logger.error(f"Ошибка при обработке даты {date_str}: {e}")
-                    continue
-
-            if not grouped_schedule:
+            if not schedule:
                 return f"ℹ️ Расписание на {day}\n\nРасписание на этот день не загружено на сайте БТК или занятий нет."
 
-            # Сортируем пары по номеру для каждой даты
-            for date_key in grouped_schedule:
-                grouped_schedule[date_key].sort(key=lambda x: x['lesson_number'])
-            
-            return grouped_schedule
+            # Записи уже отфильтрованы и отсортированы в SQL по дате и номеру пары
+            return self._group_by_date(schedule)
 
         except Exception as e:
             logger.error(f"Ошибка при получении расписания на день: {e}")
@@ -399,43 +641,39 @@ class ScheduleParser:
     async def get_full_schedule(self, user_data: dict) -> dict:
         """Получение полного расписания на неделю"""
         try:
-            from bot.database import db as sqlite_db
+            from bot.database import async_db
 
             # Для преподавателя
             if user_data.get('role') == 'Преподаватель':
                 teacher = user_data.get('selected_teacher')
                 if not teacher:
                     return {}
-                schedule = sqlite_db.get_schedule_by_teacher(teacher)
+                schedule = await async_db.get_schedule_by_teacher(teacher)
             # Для студента
             else:
                 group = user_data.get('selected_group')
                 if not group:
                     return {}
-                schedule = sqlite_db.get_schedule_by_group(group)
+                schedule = await async_db.get_schedule_by_group(group)
 
             if not schedule:
                 return {}
 
-            # Группируем расписание по датам
-            formatted_schedule = {}
-            for lesson in schedule:
-                date = lesson['date']
-                formatted_date = self._format_date_with_weekday(date)
-                if formatted_date not in formatted_schedule:
-                    formatted_schedule[formatted_date] = []
-                formatted_schedule[formatted_date].append(lesson)
-
-            # Сортируем пары по номеру для каждой даты
-            for date in formatted_schedule:
-                formatted_schedule[date].sort(key=lambda x: x['lesson_number'])
-
-            return formatted_schedule
+            return self._group_by_date(schedule)
 
         except Exception as e:
             logger.error(f"Ошибка при получении полного расписания: {e}")
             return {}
 
+    @staticmethod
+    def _group_by_date(schedule: List[Dict]) -> Dict[str, List[Dict]]:
+        """Группировка отсортированных пар по датам вида '17-июнь (вторник)'"""
+        grouped_schedule: Dict[str, List[Dict]] = {}
+        for lesson in schedule:
+            formatted_date = schedule_calendar.format_with_weekday(lesson['date'], lesson.get('weekday'))
+            grouped_schedule.setdefault(formatted_date, []).append(lesson)
+        return grouped_schedule
+
     async def cleanup(self):
         """Очистка ресурсов после парсинга"""
         if hasattr(self, 'driver') and self.driver:
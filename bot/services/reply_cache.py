@@ -0,0 +1,161 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from bot.config import logger
+from bot.database import db as sqlite_db
+from bot.middlewares.schedule_formatter import ScheduleFormatter
+from bot.services.parser import ScheduleParser
+from bot.utils.schedule_calendar import WEEKDAY_NAMES
+
+# Ключ полного расписания на неделю вместо дня недели
+FULL_SCHEDULE = 'full'
+
+# Дни недели на кнопках выбора расписания (воскресенья в расписании нет)
+SCHEDULE_DAYS = WEEKDAY_NAMES[:6]
+
+# Роль пользователя -> поле с группой или преподавателем, для которых строится ответ
+ROLE_TARGETS = {
+    'Студент': 'selected_group',
+    'Преподаватель': 'selected_teacher'
+}
+
+
+class ScheduleReplyCache:
+    """
+    Готовые тексты ответов с расписанием.
+
+    Ключ ответа - (роль, группа или преподаватель, день недели или 'full', номер снимка
+    расписания в памяти). При смене снимка кэш очищается целиком, после каждого
+    обновления расписания ответы для всех групп и преподавателей строятся заранее.
+    Кэшируются только ответы с расписанием: сообщения об ошибках и о пустом
+    расписании строятся при каждом запросе.
+    """
+
+    def __init__(self, db=sqlite_db, parser: Optional[ScheduleParser] = None):
+        self.db = db
+        self.parser = parser or ScheduleParser()
+        self._replies: Dict[tuple, str] = {}
+        self._generation = None
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bypass': 0,
+            'invalidations': 0,
+            'warmed': 0,
+            'warm_ms': None,
+            'last_warm': None
+        }
+
+    def _key(self, user_data: dict, day: str) -> Optional[tuple]:
+        """Ключ ответа; None - ответ не кэшируется (нет снимка расписания или не выбрана цель)"""
+        store = self.db.schedule_store
+        role = user_data.get('role')
+        field = ROLE_TARGETS.get(role)
+        target = user_data.get(field) if field else None
+        if store is None or not target:
+            return None
+
+        if store.generation != self._generation:
+            # Новый снимок расписания: ответы прошлого снимка больше не нужны
+            self._replies = {}
+            self._generation = store.generation
+            self.stats['invalidations'] += 1
+        return role, target, day, store.generation
+
+    async def _get(self, key: Optional[tuple], render: Callable[[], Awaitable[Tuple[str, bool]]],
+                   record: bool = True) -> Tuple[str, bool]:
+        """Ответ из кэша или построенный render(); render возвращает (текст, найдено ли расписание)"""
+        if key is None:
+            self.stats['bypass'] += record
+            return await render()
+
+        reply = self._replies.get(key)
+        if reply is not None:
+            self.stats['hits'] += record
+            return reply, True
+
+        self.stats['misses'] += record
+        reply, found = await render()
+        if found and key[3] == self._generation:
+            self._replies[key] = reply
+        return reply, found
+
+    async def _render_day(self, day: str, user_data: dict) -> Tuple[str, bool]:
+        """Текст расписания на день недели"""
+        schedule_data = await self.parser.get_schedule_for_day(day.lower(), user_data)
+
+        if isinstance(schedule_data, dict):
+            if schedule_data:
+                return ScheduleFormatter.format_schedule(schedule_data, day, user_data), True
+            # Словарь пустой, значит занятий нет
+            return f"ℹ️ Расписание на {day.lower()}\n\nВ ближайшие дни занятий нет.", False
+        if isinstance(schedule_data, str):
+            # Сообщение об ошибке или об отсутствии расписания
+            return schedule_data, False
+        return "❌ Произошла неизвестная ошибка при получении расписания.", False
+
+    async def _render_full(self, user_data: dict) -> Tuple[str, bool]:
+        """Текст полного расписания на неделю"""
+        schedule_data = await self.parser.get_full_schedule(user_data)
+        if not schedule_data:
+            return "❌ Расписание не найдено", False
+        return ScheduleFormatter.format_full_schedule(schedule_data, user_data), True
+
+    async def day_reply(self, day: str, user_data: dict, record: bool = True) -> Tuple[str, bool]:
+        """Ответ с расписанием на день ('Понедельник'): (текст, найдено ли расписание)"""
+        key = self._key(user_data, day.lower())
+        return await self._get(key, lambda: self._render_day(day, user_data), record)
+
+    async def full_reply(self, user_data: dict, record: bool = True) -> Tuple[str, bool]:
+        """Ответ с полным расписанием на неделю: (текст, найдено ли расписание)"""
+        key = self._key(user_data, FULL_SCHEDULE)
+        return await self._get(key, lambda: self._render_full(user_data), record)
+
+    async def warm(self) -> int:
+        """Построение ответов для всех групп и преподавателей текущего снимка расписания"""
+        store = self.db.schedule_store
+        if store is None:
+            return 0
+
+        start = time.perf_counter()
+        warmed = 0
+        try:
+            for role, field in ROLE_TARGETS.items():
+                targets = store.group_ranges if field == 'selected_group' else store.teacher_ranges
+                for target in list(targets):
+                    user_data = {'role': role, field: target}
+                    await self.full_reply(user_data, record=False)
+                    for day in SCHEDULE_DAYS:
+                        await self.day_reply(day.capitalize(), user_data, record=False)
+                    warmed += 1 + len(SCHEDULE_DAYS)
+                    # Между целями отдаем управление обработке сообщений
+                    await asyncio.sleep(0)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при прогреве кэша ответов с расписанием: {e}")
+
+        self.stats.update({
+            'warmed': warmed,
+            'warm_ms': round((time.perf_counter() - start) * 1000, 1),
+            'last_warm': datetime.now()
+        })
+        logger.info(
+            f"🔥 Кэш ответов с расписанием прогрет (снимок {store.generation}): "
+            f"{len(self._replies)} ответов за {self.stats['warm_ms']:.0f} мс"
+        )
+        return warmed
+
+    def get_stats(self) -> Dict:
+        """Статистика кэша: попадания, промахи, число ответов и снимок расписания"""
+        stats = dict(self.stats)
+        requests = stats['hits'] + stats['misses']
+        stats.update({
+            'entries': len(self._replies),
+            'generation': self._generation,
+            'hit_rate': round(stats['hits'] / requests * 100, 1) if requests else 0.0
+        })
+        return stats
+
+
+reply_cache = ScheduleReplyCache()
@@ -1,26 +1,37 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-from datetime import datetime, timezone, timedelta
 from bot.services.parser import ScheduleParser
+from bot.services.driver_pool import ChromeDriverPool
 from bot.services.database import Database
-from bot.config import logger
+from bot.config import logger, config
 from bot.services.notifications import NotificationManager
+from bot.services.reply_cache import reply_cache
+from bot.utils.date_helpers import get_moscow_time, is_update_window, UPDATE_HOURS
 
 class ScheduleUpdater:
     def __init__(self):
         self.parser = ScheduleParser()
+        # Долгоживущий драйвер Chrome, чтобы не запускать браузер на каждое обновление
+        self.driver_pool = ChromeDriverPool(
+            self.parser.chrome_options,
+            max_uses=config.CHROME_MAX_USES,
+            max_rss_mb=config.CHROME_MAX_RSS_MB
+        )
+        self.parser.driver_pool = self.driver_pool
         self.db = Database()
         self.last_update = None
         self.update_count = 0
         self.error_count = 0
+        # Проверки, в которых расписание не изменилось и запись в БД была пропущена
+        self.unchanged_count = 0
+        self.last_check = None
         self._running = True
         self._executor = ThreadPoolExecutor(max_workers=1)
 
     def get_moscow_time(self):
         """Получение текущего времени в Москве"""
-        moscow_tz = timezone(timedelta(hours=3))
-        return datetime.now(moscow_tz)
+        return get_moscow_time()
 
     async def _run_parser_in_thread(self):
         """Запуск парсера в отдельном потоке"""
@@ -40,8 +51,11 @@ class ScheduleUpdater:
                 return
 
             current_hour = moscow_time.hour
-            if not (7 <= current_hour < 19):
-                logger.info(f"⏱️ Время {current_hour}:00 МСК вне диапазона обновления (7:00-19:00)")
+            if not is_update_window(moscow_time):
+                logger.info(
+                    f"⏱️ Время {current_hour}:00 МСК вне диапазона обновления "
+                    f"({UPDATE_HOURS[0]}:00-{UPDATE_HOURS[1]}:00)"
+                )
                 return
 
             logger.info(f"🔄 Начало планового обновления расписания (время МСК: {moscow_time.strftime('%H:%M')})")
@@ -58,6 +72,19 @@ class ScheduleUpdater:
                 logger.warning("⚠️ Получены пустые данные при обновлении расписания")
                 return
 
+            self.last_check = moscow_time
+            if not self.parser.last_result_changed:
+                self.unchanged_count += 1
+                logger.info(
+                    f"🟰 Расписание не изменилось, обновление БД и уведомления пропущены "
+                    f"(без изменений: {self.unchanged_count}, обновлений: {self.update_count})"
+                )
+                return
+
+            # Парсер уже опубликовал новый снимок расписания: ответы готовятся сразу,
+            # до того как пользователи придут за ними и независимо от шагов ниже
+            await reply_cache.warm()
+
             # Обновляем расписание в базе данных
             groups_count = len(groups_list) if groups_list else 0
             teachers_count = len(teachers_list) if teachers_list else 0
@@ -73,8 +100,8 @@ class ScheduleUpdater:
                 if update_success:
                     logger.info("✅ Расписание успешно обновлено в базе данных")
                 else:
+                    # Снимок в SQLite уже опубликован парсером, ошибка копии не отменяет уведомления
                     logger.error("❌ Ошибка при обновлении расписания в базе данных")
-                    return
                     
                 # Обновляем время кэша
                 cache_update_success = await self.db.update_cache_time()
@@ -137,6 +164,10 @@ class ScheduleUpdater:
         logger.info("🛑 Остановка планировщика обновления расписания")
         self._running = False
         self._executor.shutdown(wait=True)
+        try:
+            self.driver_pool.close()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при закрытии пула драйверов Chrome: {e}")
         logger.info("✅ Планировщик успешно остановлен")
 
 async def start_scheduler(bot):
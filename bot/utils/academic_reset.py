@@ -44,8 +44,7 @@ class AcademicYearReset:
             
             # Получаем количество пользователей перед сбросом
             try:
-                all_users = await db.get_all_users()
-                users_count = len(all_users)
+                users_count = await db.count_users()
                 logger.info(f"📊 Количество пользователей перед сбросом: {users_count}")
             except Exception as e:
                 logger.error(f"❌ Ошибка при получении списка пользователей: {e}")
@@ -65,11 +64,15 @@ class AcademicYearReset:
             # Сброс выбранных групп и преподавателей
             try:
                 logger.info("🔄 Сброс выбранных групп и преподавателей")
+                # Выбор, сделанный до сброса, должен записаться раньше него
+                await db.async_db.flush_user_writes()
                 query = """
                 UPDATE user_settings 
                 SET selected_group = NULL, selected_teacher = NULL
                 """
-                db.db.execute_query(query)
+                await db.async_db.execute_query(query)
+                # Массовое изменение прошло мимо методов пользователей - справочник в памяти читается заново
+                await db.async_db.reload_user_directory()
                 logger.info("✅ Выбранные группы и преподаватели успешно сброшены")
             except Exception as e:
                 logger.error(f"❌ Ошибка при сбросе групп и преподавателей: {e}")
@@ -130,10 +133,10 @@ class AcademicYearReset:
             CREATE TABLE IF NOT EXISTS user_settings_backup_{backup_date} AS 
                 SELECT * FROM user_settings;
             """
-            db.db.execute_query(user_tables_backup)
+            await db.async_db.execute_query(user_tables_backup)
             
             # Проверяем, что резервные копии созданы
-            tables = db.db.execute_query(
+            tables = await db.async_db.execute_query(
                 """
                 SELECT name FROM sqlite_master 
                 WHERE type='table' AND 
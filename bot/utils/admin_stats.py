@@ -0,0 +1,64 @@
+"""
+Тексты статистики пользователей для админ-панели.
+
+Данные берутся из сводки get_user_stats (счетчики user_stats), роли
+старых записей ('student', 'teacher') учитываются вместе с русскими.
+"""
+
+from datetime import timedelta
+from typing import Any, Dict, Iterable
+
+STUDENT_ROLES = ('Студент', 'student')
+TEACHER_ROLES = ('Преподаватель', 'teacher')
+
+
+def count_roles(user_stats: Dict[str, Any], roles: Iterable[str]) -> int:
+    """Число пользователей с одной из ролей"""
+    return sum(user_stats['roles'].get(role, 0) for role in roles)
+
+
+def student_groups(user_stats: Dict[str, Any]) -> Dict[str, int]:
+    """Число студентов по выбранным группам"""
+    group_stats = {}
+    for role in STUDENT_ROLES:
+        for group, count in user_stats['groups'].get(role, {}).items():
+            group_stats[group] = group_stats.get(group, 0) + count
+    return group_stats
+
+
+def format_stats_text(user_stats: Dict[str, Any], uptime: timedelta, cached_groups: int, cached_teachers: int) -> str:
+    """Детальная статистика бота (кнопка admin_stats)"""
+    return (
+        "📊 <b>Детальная статистика бота</b>\n\n"
+        f"⏱️ <b>Время работы:</b>\n"
+        f"   • Дней: {uptime.days}\n"
+        f"   • Часов: {uptime.seconds // 3600}\n"
+        f"   • Минут: {(uptime.seconds % 3600) // 60}\n\n"
+        f"👥 <b>Пользователи:</b>\n"
+        f"   • Всего: {user_stats['total']}\n"
+        f"   • Студентов: {count_roles(user_stats, STUDENT_ROLES)}\n"
+        f"   • Преподавателей: {count_roles(user_stats, TEACHER_ROLES)}\n"
+        f"   • С уведомлениями: {user_stats['notifications']}\n"
+        f"   • Заблокированных: {user_stats['banned']}\n\n"
+        f"💾 <b>Кэш:</b>\n"
+        f"   • Групп: {cached_groups}\n"
+        f"   • Преподавателей: {cached_teachers}"
+    )
+
+
+def format_users_text(user_stats: Dict[str, Any]) -> str:
+    """Статистика пользователей по группам (кнопка admin_users)"""
+    group_stats = student_groups(user_stats)
+
+    users_text = "👥 Статистика пользователей\n\n"
+
+    users_text += "📊 Распределение по группам:\n"
+    for group in sorted(group_stats.keys()):
+        users_text += f"• {group}: {group_stats[group]} чел.\n"
+
+    users_text += "\n📈 Общая статистика:\n"
+    users_text += f"• Всего пользователей: {user_stats['total']}\n"
+    users_text += f"• Студентов: {count_roles(user_stats, STUDENT_ROLES)}\n"
+    users_text += f"• Преподавателей: {count_roles(user_stats, TEACHER_ROLES)}\n"
+    users_text += f"• Количество групп: {len(group_stats)}\n"
+    return users_text
@@ -1,7 +1,13 @@
 import locale
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
 from typing import Optional
 
+MOSCOW_TZ = timezone(timedelta(hours=3))
+
+# Часы (МСК, начало и конец), в которые планировщик обновляет расписание по будням и субботам.
+# Остальное время и воскресенье - тихие часы
+UPDATE_HOURS = (7, 19)
+
 # Установка локали
 try:
     locale.setlocale(locale.LC_TIME, 'ru_RU.UTF-8')
@@ -24,4 +30,12 @@ def parse_russian_date(date_str: str) -> Optional[datetime]:
     try:
         return datetime.strptime(date_str, '%d %B %Y')
     except ValueError:
-        return None 
\ No newline at end of file
+        return None 
+
+def get_moscow_time() -> datetime:
+    """Текущее время в Москве"""
+    return datetime.now(MOSCOW_TZ)
+
+def is_update_window(moment: datetime) -> bool:
+    """Время, в которое планировщик обновляет расписание"""
+    return moment.weekday() != 6 and UPDATE_HOURS[0] <= moment.hour < UPDATE_HOURS[1]
@@ -0,0 +1,222 @@
+"""
+Статистика SQL-запросов к SQLite.
+
+Для каждого нормализованного запроса (литералы заменены на ?, пробелы схлопнуты)
+хранится гистограмма времени выполнения, ожидание и удержание блокировки записи
+(для чтения - ожидание соединения из пула), число повторов и возвращенных строк.
+Данные лежат в памяти и ограничены: не более max_statements запросов и
+slow_log_size последних медленных запросов.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы, мс (последняя корзина - все, что дольше)
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+# Ключ, в который складываются запросы сверх лимита max_statements
+OVERFLOW_KEY = "<прочие запросы>"
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(query: str) -> str:
+    """Запрос без литералов и лишних пробелов: одинаковые запросы с разными значениями совпадают"""
+    text = _WHITESPACE.sub(" ", query).strip()
+    text = _STRING_LITERAL.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    return _PLACEHOLDER_LIST.sub("(?...)", text)
+
+
+class _StatementStats:
+    """Накопленная статистика одного нормализованного запроса"""
+
+    __slots__ = (
+        'calls', 'errors', 'retries', 'rows', 'total_ms', 'max_ms',
+        'lock_wait_ms', 'lock_hold_ms', 'max_lock_wait_ms', 'buckets'
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.lock_wait_ms = 0.0
+        self.lock_hold_ms = 0.0
+        self.max_lock_wait_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def percentile(self, fraction: float) -> float:
+        """Верхняя граница корзины, в которую попадает заданная доля вызовов"""
+        target = self.calls * fraction
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+class QueryTimer:
+    """Замер одного вызова execute_query/execute_many"""
+
+    __slots__ = ('query', 'started', 'lock_wait', 'lock_hold', 'retries')
+
+    def __init__(self, query: str):
+        self.query = query
+        self.started = time.perf_counter()
+        self.lock_wait = 0.0
+        self.lock_hold = 0.0
+        self.retries = 0
+
+    @contextmanager
+    def locked(self, lock):
+        """Захват блокировки с замером ожидания и удержания"""
+        wait_start = time.perf_counter()
+        with lock:
+            acquired = time.perf_counter()
+            self.lock_wait += acquired - wait_start
+            try:
+                yield
+            finally:
+                self.lock_hold += time.perf_counter() - acquired
+
+
+class QueryStats:
+    """Ограниченное по памяти хранилище статистики запросов"""
+
+    def __init__(self, max_statements: int = 200, slow_threshold_ms: float = SLOW_QUERY_MS, slow_log_size: int = 50):
+        self.max_statements = max_statements
+        self.slow_threshold_ms = slow_threshold_ms
+        self.enabled = True
+        self._statements: Dict[str, _StatementStats] = {}
+        self._slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+
+    def start(self, query: str) -> QueryTimer:
+        """Начало замера запроса"""
+        return QueryTimer(query)
+
+    def finish(self, timer: QueryTimer, rows: int = 0, error: bool = False) -> None:
+        """Запись результата замера"""
+        if not self.enabled:
+            return
+        elapsed_ms = (time.perf_counter() - timer.started) * 1000
+        lock_wait_ms = timer.lock_wait * 1000
+        lock_hold_ms = timer.lock_hold * 1000
+        key = normalize_sql(timer.query)
+        bucket = len(LATENCY_BUCKETS_MS)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                bucket = index
+                break
+
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    key = OVERFLOW_KEY
+                    stats = self._statements.get(key)
+                if stats is None:
+                    stats = self._statements[key] = _StatementStats()
+            stats.calls += 1
+            stats.errors += error
+            stats.retries += timer.retries
+            stats.rows += rows
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.lock_wait_ms += lock_wait_ms
+            stats.lock_hold_ms += lock_hold_ms
+            stats.max_lock_wait_ms = max(stats.max_lock_wait_ms, lock_wait_ms)
+            stats.buckets[bucket] += 1
+
+            slow = elapsed_ms >= self.slow_threshold_ms
+            if slow:
+                self._slow_log.append({
+                    'time': datetime.now(),
+                    'query': key,
+                    'ms': round(elapsed_ms, 1),
+                    'lock_wait_ms': round(lock_wait_ms, 1),
+                    'lock_hold_ms': round(lock_hold_ms, 1),
+                    'retries': timer.retries,
+                    'rows': rows,
+                    'thread': threading.current_thread().name
+                })
+
+        if slow:
+            logger.warning(
+                f"🐢 Медленный запрос {elapsed_ms:.0f} мс (ожидание блокировки {lock_wait_ms:.0f} мс, "
+                f"удержание {lock_hold_ms:.0f} мс, повторов {timer.retries}, строк {rows}): {key[:200]}"
+            )
+
+    def top(self, limit: int = 10, order_by: str = 'total_ms') -> List[Dict]:
+        """Запросы с наибольшим суммарным временем (или другим полем статистики)"""
+        with self._lock:
+            items = [
+                {
+                    'query': key,
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'retries': stats.retries,
+                    'rows': stats.rows,
+                    'total_ms': round(stats.total_ms, 1),
+                    'avg_ms': round(stats.total_ms / stats.calls, 2) if stats.calls else 0.0,
+                    'p95_ms': stats.percentile(0.95),
+                    'max_ms': round(stats.max_ms, 1),
+                    'lock_wait_ms': round(stats.lock_wait_ms, 1),
+                    'lock_hold_ms': round(stats.lock_hold_ms, 1),
+                    'max_lock_wait_ms': round(stats.max_lock_wait_ms, 1),
+                    'histogram': list(stats.buckets)
+                }
+                for key, stats in self._statements.items()
+            ]
+        items.sort(key=lambda item: item[order_by], reverse=True)
+        return items[:limit]
+
+    def slow_queries(self, limit: int = 10) -> List[Dict]:
+        """Последние медленные запросы, новые первыми"""
+        with self._lock:
+            return list(self._slow_log)[-limit:][::-1]
+
+    def totals(self) -> Dict:
+        """Суммарные показатели по всем запросам"""
+        with self._lock:
+            statements = list(self._statements.values())
+            slow = len(self._slow_log)
+        return {
+            'statements': len(statements),
+            'calls': sum(stats.calls for stats in statements),
+            'errors': sum(stats.errors for stats in statements),
+            'retries': sum(stats.retries for stats in statements),
+            'total_ms': round(sum(stats.total_ms for stats in statements), 1),
+            'lock_wait_ms': round(sum(stats.lock_wait_ms for stats in statements), 1),
+            'lock_hold_ms': round(sum(stats.lock_hold_ms for stats in statements), 1),
+            'slow': slow,
+            'since': self.started_at
+        }
+
+    def reset(self) -> None:
+        """Сброс накопленной статистики"""
+        with self._lock:
+            self._statements.clear()
+            self._slow_log.clear()
+            self.started_at = datetime.now()
@@ -0,0 +1,82 @@
+"""
+Ограничение частоты запросов по алгоритму GCRA (generic cell rate algorithm).
+
+Состояние ключа - одно число: теоретическое время следующего запроса (TAT) по
+time.monotonic(). Проверка и учет запроса - O(1) без списков и datetime.
+Ключ с TAT в прошлом ничем не отличается от нового, поэтому такие записи
+удаляются периодической очисткой без потери ограничения: память зависит только
+от числа пользователей, писавших за последние burst / rate секунд.
+"""
+
+import time
+from typing import Any, Dict, Hashable, Optional
+
+# Погрешность сложения интервалов: без нее последний запрос пачки может не пройти
+EPSILON = 1e-9
+
+
+class GCRALimiter:
+    """
+    rate запросов за period секунд с пачкой до burst запросов подряд.
+    Один экземпляр хранит корзины для любого числа ключей (user_id или None для общей корзины)
+    """
+
+    __slots__ = ('interval', 'tolerance', 'sweep_interval', 'sweep_size', '_tats', '_next_sweep', 'sweeps')
+
+    def __init__(self, rate: float, period: float = 1.0, burst: Optional[int] = None,
+                 sweep_interval: float = 60.0, sweep_size: int = 100_000):
+        if rate <= 0 or period <= 0:
+            raise ValueError("rate и period должны быть положительными")
+        burst = burst or max(int(rate), 1)
+        # Интервал между запросами при равномерном потоке и допустимое опережение графика
+        self.interval = period / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.sweep_interval = sweep_interval
+        self.sweep_size = sweep_size
+        self._tats: Dict[Hashable, float] = {}
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.sweeps = 0
+
+    def retry_after(self, key: Hashable, now: float) -> float:
+        """Секунды до разрешенного запроса; 0 - запрос можно выполнить сейчас (без учета)"""
+        wait = self._tats.get(key, now) - self.tolerance - now
+        return wait if wait > EPSILON else 0.0
+
+    def consume(self, key: Hashable, now: float) -> None:
+        """Учет разрешенного запроса"""
+        tat = self._tats.get(key, now)
+        self._tats[key] = (tat if tat > now else now) + self.interval
+        if now >= self._next_sweep or len(self._tats) >= self.sweep_size:
+            self.sweep(now)
+
+    def hit(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Проверка и учет запроса: 0 - разрешен, иначе секунды до разрешенного запроса"""
+        if now is None:
+            now = time.monotonic()
+        wait = self.retry_after(key, now)
+        if not wait:
+            self.consume(key, now)
+        return wait
+
+    def sweep(self, now: float) -> int:
+        """Удаление ключей, у которых корзина уже полная (TAT в прошлом)"""
+        expired = [key for key, tat in self._tats.items() if tat <= now]
+        for key in expired:
+            del self._tats[key]
+        self.sweeps += 1
+        self._next_sweep = now + self.sweep_interval
+        # Оставшиеся ключи активны прямо сейчас: следующая очистка по размеру - после удвоения
+        self.sweep_size = max(self.sweep_size, len(self._tats) * 2)
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'tracked': len(self._tats),
+            'sweeps': self.sweeps,
+            'interval_ms': round(self.interval * 1000, 1),
+            'burst': round(self.tolerance / self.interval) + 1
+        }
+
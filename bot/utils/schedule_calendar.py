@@ -0,0 +1,121 @@
+"""
+Единый разбор дат расписания.
+
+Сайт БТК отдает даты в виде '17-июнь' (без года), иногда '17.06.2025'.
+Все модули бота используют этот модуль вместо собственных словарей месяцев,
+а результат разбора кэшируется.
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
+
+WEEKDAY_NAMES = (
+    'понедельник', 'вторник', 'среда', 'четверг',
+    'пятница', 'суббота', 'воскресенье'
+)
+
+WEEKDAY_NUMBERS = {name: number for number, name in enumerate(WEEKDAY_NAMES)}
+
+# Месяцы в именительном падеже
+MONTH_NAMES = {
+    1: 'январь', 2: 'февраль', 3: 'март', 4: 'апрель',
+    5: 'май', 6: 'июнь', 7: 'июль', 8: 'август',
+    9: 'сентябрь', 10: 'октябрь', 11: 'ноябрь', 12: 'декабрь'
+}
+
+# Сокращения месяцев, по которым распознаются и полные названия в любом падеже
+MONTH_PREFIXES = {
+    'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4,
+    'май': 5, 'мая': 5, 'июн': 6, 'июл': 7, 'авг': 8,
+    'сен': 9, 'окт': 10, 'ноя': 11, 'дек': 12
+}
+
+
+def month_number(name: str) -> Optional[int]:
+    """Номер месяца по названию или сокращению ('июнь', 'июня', 'нояб', 'дек')"""
+    return MONTH_PREFIXES.get(name.strip().lower()[:3])
+
+
+def weekday_number(name: str) -> Optional[int]:
+    """Номер дня недели (0 - понедельник) по русскому названию"""
+    return WEEKDAY_NUMBERS.get(name.strip().lower())
+
+
+def weekday_name(weekday: int) -> str:
+    """Русское название дня недели по номеру (0 - понедельник)"""
+    return WEEKDAY_NAMES[weekday]
+
+
+@lru_cache(maxsize=4096)
+def _parse(date_str: str, today: date) -> Optional[date]:
+    # Отрезаем день недели из отформатированной строки: '17-июнь (вторник)'
+    value = date_str.strip().split(' ')[0].strip('()')
+
+    if '-' in value and not value[:4].isdigit():
+        day, _, month = value.partition('-')
+        month_num = month_number(month)
+        if not day.strip().isdigit() or not month_num:
+            return None
+
+        # Год на сайте не указывается: берем ближайшую к сегодняшнему дню дату,
+        # чтобы январь, опубликованный в декабре, попал в следующий год
+        candidates = []
+        for year in (today.year - 1, today.year, today.year + 1):
+            try:
+                candidates.append(date(year, month_num, int(day)))
+            except ValueError:
+                continue
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: abs(candidate - today))
+
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_schedule_date(date_str: str, today: date = None) -> Optional[date]:
+    """
+    Разбор даты расписания: '17-июнь', '05-мар', '17-июнь (вторник)', '17.06.2025', '2025-06-17'.
+    Возвращает None, если строку распознать не удалось.
+    """
+    if not date_str:
+        return None
+    return _parse(date_str, today or date.today())
+
+
+def to_iso(date_str: str) -> Optional[str]:
+    """Дата расписания в формате ISO (YYYY-MM-DD)"""
+    parsed = parse_schedule_date(date_str)
+    return parsed.isoformat() if parsed else None
+
+
+def weekday_of(date_str: str) -> Optional[int]:
+    """Номер дня недели даты расписания (0 - понедельник)"""
+    parsed = parse_schedule_date(date_str)
+    return parsed.weekday() if parsed else None
+
+
+def format_with_weekday(date_str: str, weekday: int = None) -> str:
+    """Дата с днем недели: '17-июнь (вторник)'"""
+    if weekday is None:
+        weekday = weekday_of(date_str)
+    if weekday is None:
+        return date_str
+    return f"{date_str} ({WEEKDAY_NAMES[weekday]})"
+
+
+def to_datetime(date_str: str) -> Optional[datetime]:
+    """Дата расписания как datetime (для сортировки и совместимости со старым кодом)"""
+    parsed = parse_schedule_date(date_str)
+    return datetime(parsed.year, parsed.month, parsed.day) if parsed else None
+
+
+def cache_info():
+    """Статистика кэша разбора дат"""
+    return _parse.cache_info()
+
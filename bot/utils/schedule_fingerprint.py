@@ -0,0 +1,58 @@
+import hashlib
+import json
+from typing import Dict, List, Tuple
+
+# Ключ отпечатка всей страницы в таблице schedule_fingerprints
+PAGE_KEY = '__page__'
+
+
+def _normalize_lesson(lesson: dict) -> list:
+    """Приведение пары к каноническому виду (порядок полей и пробелы не влияют на отпечаток)"""
+    return [
+        int(lesson.get('number', 0) or 0),
+        str(lesson.get('subgroup', '0') or '0').strip(),
+        str(lesson.get('discipline', '') or '').strip(),
+        str(lesson.get('teacher', '') or '').strip(),
+        str(lesson.get('classroom', '') or '').strip()
+    ]
+
+
+def _hash(data) -> str:
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def fingerprint_date(groups: Dict[str, List[dict]]) -> str:
+    """Отпечаток расписания одной даты"""
+    normalized = {
+        group.strip(): sorted(_normalize_lesson(lesson) for lesson in lessons)
+        for group, lessons in groups.items()
+        if lessons
+    }
+    return _hash(normalized)
+
+
+def fingerprint_schedule(schedule_data: Dict[str, Dict[str, List[dict]]],
+                         groups: List[str], teachers: List[str]) -> Tuple[str, Dict[str, str]]:
+    """
+    Отпечатки результата парсинга: общий для всей страницы и отдельный для каждой даты.
+
+    Returns:
+        (отпечаток страницы, {дата: отпечаток даты})
+    """
+    date_hashes = {date: fingerprint_date(date_groups) for date, date_groups in schedule_data.items()}
+    page_hash = _hash({
+        'dates': date_hashes,
+        'groups': sorted(group.strip() for group in groups),
+        'teachers': sorted(teacher.strip() for teacher in teachers)
+    })
+    return page_hash, date_hashes
+
+
+def diff_dates(old_hashes: Dict[str, str], new_hashes: Dict[str, str]) -> Dict[str, List[str]]:
+    """Сравнение отпечатков по датам: добавленные, измененные и удаленные даты"""
+    return {
+        'added': [date for date in new_hashes if date not in old_hashes],
+        'changed': [date for date in new_hashes if date in old_hashes and old_hashes[date] != new_hashes[date]],
+        'removed': [date for date in old_hashes if date not in new_hashes]
+    }
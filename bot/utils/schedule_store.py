@@ -0,0 +1,181 @@
+"""
+Расписание в памяти процесса.
+
+Все пары (несколько тысяч строк) хранятся колонками в массивах array: строки
+интернированы в одну таблицу, в колонках лежат только их номера. Для групп и
+преподавателей заранее построены перестановки строк с диапазонами (начало, конец)
+для каждого имени, для дат - диапазоны в основном порядке строк. Поэтому чтение
+расписания на день или на неделю - это обход нескольких десятков элементов без SQL.
+
+Снимок неизменяем: после сохранения расписания строится новый ScheduleStore и
+ссылка на него заменяется целиком, читатели видят либо старый, либо новый снимок.
+"""
+
+import sys
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+# Колонки, которые загружаются из представления schedule, в порядке строк LOAD_QUERY
+LOAD_QUERY = """
+SELECT date, iso_date, weekday, group_name, teacher_name, lesson_number, discipline, classroom, subgroup
+FROM schedule
+ORDER BY iso_date, date, group_id, lesson_number
+"""
+
+_STRING_COLUMNS = ('date', 'iso_date', 'group_name', 'teacher_name', 'discipline', 'classroom', 'subgroup')
+
+
+class ScheduleStore:
+    """Неизменяемый колоночный снимок расписания с индексами по группе, преподавателю и дате"""
+
+    __slots__ = (
+        'strings', 'columns', 'lesson_number', 'weekday', 'count',
+        'group_order', 'group_ranges', 'teacher_order', 'teacher_ranges',
+        'date_ranges', 'dates', 'build_ms', 'generation'
+    )
+
+    def __init__(self, rows=(), generation: int = 0):
+        """
+        rows - строки LOAD_QUERY (словари или sqlite3.Row) в порядке дата, группа, номер пары;
+        generation - номер снимка, растет при каждой пересборке (ключ кэшей, построенных по снимку)
+        """
+        start = time.perf_counter()
+        self.generation = generation
+        # Номер 0 зарезервирован за NULL
+        self.strings: List[Optional[str]] = [None]
+        string_ids: Dict[Optional[str], int] = {None: 0}
+        self.columns = {column: array('I') for column in _STRING_COLUMNS}
+        self.lesson_number = array('h')
+        self.weekday = array('b')
+        self.date_ranges: Dict[str, Tuple[int, int]] = {}
+        self.dates: List[Tuple[str, Optional[str]]] = []
+
+        for position, row in enumerate(rows):
+            for column, values in self.columns.items():
+                value = row[column]
+                string_id = string_ids.get(value)
+                if string_id is None:
+                    string_id = string_ids[value] = len(self.strings)
+                    self.strings.append(sys.intern(value) if isinstance(value, str) else value)
+                values.append(string_id)
+            self.lesson_number.append(row['lesson_number'] or 0)
+            self.weekday.append(-1 if row['weekday'] is None else row['weekday'])
+
+            # Строки упорядочены по дате, поэтому пары одной даты идут подряд
+            date = row['date']
+            if self.dates and self.dates[-1][0] == date:
+                self.date_ranges[date] = (self.date_ranges[date][0], position + 1)
+            else:
+                self.dates.append((date, row['iso_date']))
+                self.date_ranges[date] = (position, position + 1)
+
+        self.count = len(self.lesson_number)
+        self.group_order, self.group_ranges = self._build_index('group_name')
+        self.teacher_order, self.teacher_ranges = self._build_index('teacher_name')
+        self.build_ms = (time.perf_counter() - start) * 1000
+
+    def _build_index(self, column: str) -> Tuple[array, Dict[str, Tuple[int, int]]]:
+        """
+        Перестановка строк, сгруппированная по значению колонки, и диапазон каждого значения.
+        Сортировка устойчивая, внутри значения сохраняется порядок по дате и номеру пары
+        """
+        values = self.columns[column]
+        order = array('I', sorted(range(self.count), key=values.__getitem__))
+        ranges = {}
+        for position, row in enumerate(order):
+            name = self.strings[values[row]]
+            if not name:
+                continue
+            first = ranges.get(name)
+            ranges[name] = (first[0] if first else position, position + 1)
+        return order, ranges
+
+    def _lesson(self, row: int) -> Dict[str, Any]:
+        """Пара в формате строк get_schedule_by_group/get_schedule_by_teacher"""
+        strings = self.strings
+        columns = self.columns
+        weekday = self.weekday[row]
+        return {
+            'date': strings[columns['date'][row]],
+            'group_name': strings[columns['group_name'][row]],
+            'teacher_name': strings[columns['teacher_name'][row]],
+            'lesson_number': self.lesson_number[row],
+            'discipline': strings[columns['discipline'][row]],
+            'classroom': strings[columns['classroom'][row]],
+            'subgroup': strings[columns['subgroup'][row]],
+            'iso_date': strings[columns['iso_date'][row]],
+            'weekday': None if weekday < 0 else weekday
+        }
+
+    def _select(self, order: array, ranges: Dict[str, Tuple[int, int]], name: str,
+                date: str = None, weekday: int = None) -> List[Dict[str, Any]]:
+        """Пары одного значения индекса с фильтром по дате и дню недели"""
+        bounds = ranges.get(name)
+        if bounds is None:
+            return []
+        if date and date not in self.date_ranges:
+            return []
+        strings = self.strings
+        dates = self.columns['date']
+        result = []
+        for position in range(*bounds):
+            row = order[position]
+            if date and strings[dates[row]] != date:
+                continue
+            if weekday is not None and self.weekday[row] != weekday:
+                continue
+            result.append(self._lesson(row))
+        return result
+
+    def by_group(self, group_name: str, date: str = None, weekday: int = None) -> List[Dict[str, Any]]:
+        """Пары группы по дате и номеру пары (weekday: 0 - понедельник)"""
+        return self._select(self.group_order, self.group_ranges, group_name, date, weekday)
+
+    def by_teacher(self, teacher_name: str, date: str = None, weekday: int = None) -> List[Dict[str, Any]]:
+        """Пары преподавателя по дате и номеру пары (weekday: 0 - понедельник)"""
+        return self._select(self.teacher_order, self.teacher_ranges, teacher_name, date, weekday)
+
+    def has_group(self, group_name: str) -> bool:
+        """Есть ли хотя бы одна пара у группы"""
+        return group_name in self.group_ranges
+
+    def has_teacher(self, teacher_name: str) -> bool:
+        """Есть ли хотя бы одна пара у преподавателя"""
+        return teacher_name in self.teacher_ranges
+
+    def full_schedule(self) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """Все расписание в виде {дата: {группа: [пары]}} в формате get_full_schedule"""
+        strings = self.strings
+        columns = self.columns
+        schedule = {}
+        for date, (start, end) in self.date_ranges.items():
+            groups = schedule[date] = {}
+            for row in range(start, end):
+                groups.setdefault(strings[columns['group_name'][row]], []).append({
+                    'number': self.lesson_number[row],
+                    'discipline': strings[columns['discipline'][row]],
+                    'teacher': strings[columns['teacher_name'][row]],
+                    'classroom': strings[columns['classroom'][row]],
+                    'subgroup': strings[columns['subgroup'][row]] or '0'
+                })
+        return schedule
+
+    def schedule_dates(self) -> List[Dict[str, Any]]:
+        """Список дат расписания в формате get_schedule_dates"""
+        return [{'date': date, 'iso_date': iso_date} for date, iso_date in self.dates]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Размер снимка: число пар, строк, индексов и примерный объем массивов в памяти"""
+        arrays = list(self.columns.values()) + [self.lesson_number, self.weekday, self.group_order, self.teacher_order]
+        return {
+            'lessons': self.count,
+            'strings': len(self.strings) - 1,
+            'groups': len(self.group_ranges),
+            'teachers': len(self.teacher_ranges),
+            'dates': len(self.dates),
+            'generation': self.generation,
+            'arrays_kb': round(sum(values.itemsize * len(values) for values in arrays) / 1024, 1),
+            'strings_kb': round(sum(sys.getsizeof(value) for value in self.strings if value) / 1024, 1),
+            'build_ms': round(self.build_ms, 2)
+        }
@@ -0,0 +1,227 @@
+"""
+Справочник пользователей в памяти процесса для выбора получателей рассылок.
+
+Пользователь занимает одну позицию в массивах: id в array('q'), номер выбранной
+группы в array('I') и байт состояния в bytearray (жив, уведомления, бан и номер
+роли). Позиция ищется по id в словаре, поэтому добавление, изменение и удаление
+пользователя - O(1); смена группы дополнительно правит массив позиций группы
+(десятки-сотни элементов, сдвиг на стороне C).
+
+Выборка без группы проходит байты состояния на стороне C: bytes.translate
+переводит каждое состояние в 0 или 1 по таблице фильтров, itertools.compress
+отбирает id. Выборка по группе проверяет только позиции этой группы.
+
+Позиции только добавляются: у удаленного пользователя байт состояния обнуляется,
+место освобождается при следующей полной загрузке.
+"""
+
+import sys
+import threading
+from array import array
+from itertools import compress
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+# Биты байта состояния; старшие биты - номер роли
+ALIVE = 1
+NOTIFICATIONS = 2
+BANNED = 4
+ROLE_SHIFT = 3
+MAX_ROLES = 256 >> ROLE_SHIFT
+FLAGS_MASK = (1 << ROLE_SHIFT) - 1
+
+
+class UserDirectory:
+    """Компактный изменяемый справочник пользователей: id, роль, группа, уведомления, бан"""
+
+    def __init__(self, rows: Iterable = ()):
+        """rows - словари или sqlite3.Row с user_id, role, selected_group, notifications_enabled, is_banned"""
+        self._lock = threading.Lock()
+        self._reset()
+        with self._lock:
+            for row in rows:
+                self._insert(row['user_id'], row['role'], row['selected_group'],
+                             row['notifications_enabled'], row['is_banned'])
+
+    def _reset(self) -> None:
+        """Пустой справочник"""
+        self.ids = array('q')
+        self.groups = array('I')
+        self.states = bytearray()
+        self._positions: Dict[int, int] = {}
+        # Позиции пользователей каждой группы (кроме номера 0 - группа не выбрана)
+        self._members: Dict[int, array] = {}
+        self.role_names: List[Optional[str]] = []
+        self._role_codes: Dict[Optional[str], int] = {}
+        self.group_names: List[Optional[str]] = [None]
+        self._group_ids: Dict[Optional[str], int] = {None: 0}
+        # Таблицы bytes.translate для уже встречавшихся сочетаний фильтров
+        self._tables: Dict[tuple, bytes] = {}
+
+    def replace(self, rows: Iterable) -> None:
+        """Полная перезагрузка из строк БД (освобождает позиции удаленных пользователей)"""
+        fresh = UserDirectory(rows)
+        with self._lock:
+            for name in ('ids', 'groups', 'states', '_positions', '_members', 'role_names',
+                         '_role_codes', 'group_names', '_group_ids', '_tables'):
+                setattr(self, name, getattr(fresh, name))
+
+    def _group_id(self, name: Optional[str]) -> int:
+        """Номер группы; новые группы добавляются"""
+        group_id = self._group_ids.get(name)
+        if group_id is None:
+            group_id = self._group_ids[name] = len(self.group_names)
+            self.group_names.append(name)
+        return group_id
+
+    def _role_code(self, role: Optional[str]) -> int:
+        """Номер роли; новые роли добавляются"""
+        code = self._role_codes.get(role)
+        if code is None:
+            if len(self.role_names) >= MAX_ROLES:
+                raise ValueError(f"Справочник пользователей хранит не больше {MAX_ROLES} ролей")
+            code = self._role_codes[role] = len(self.role_names)
+            self.role_names.append(role)
+        return code
+
+    def _set_role(self, position: int, role: Optional[str]) -> None:
+        self.states[position] = self.states[position] & FLAGS_MASK | self._role_code(role) << ROLE_SHIFT
+
+    def _set_flag(self, position: int, flag: int, value) -> None:
+        if value:
+            self.states[position] |= flag
+        else:
+            self.states[position] &= ~flag & 0xFF
+
+    def _set_group(self, position: int, group: Optional[str]) -> None:
+        old_id = self.groups[position]
+        new_id = self._group_id(group or None)
+        if old_id == new_id:
+            return
+        if old_id:
+            self._members[old_id].remove(position)
+        if new_id:
+            members = self._members.get(new_id)
+            if members is None:
+                members = self._members[new_id] = array('I')
+            members.append(position)
+        self.groups[position] = new_id
+
+    def _insert(self, user_id: int, role: Optional[str], group: Optional[str] = None,
+                notifications_enabled=True, is_banned=False) -> None:
+        """Новая позиция в конце массивов (вызывается под блокировкой)"""
+        position = len(self.ids)
+        state = ALIVE | self._role_code(role) << ROLE_SHIFT
+        if notifications_enabled:
+            state |= NOTIFICATIONS
+        if is_banned:
+            state |= BANNED
+        self.ids.append(user_id)
+        self.groups.append(0)
+        self.states.append(state)
+        self._positions[user_id] = position
+        self._set_group(position, group)
+
+    def add(self, user_id: int, role: Optional[str] = None) -> None:
+        """Новый пользователь со значениями по умолчанию; существующий не меняется (как INSERT OR IGNORE)"""
+        with self._lock:
+            if user_id not in self._positions:
+                self._insert(user_id, role)
+
+    def update(self, user_id: int, **fields) -> None:
+        """Изменение role, is_banned, selected_group, notifications_enabled; другие поля не хранятся"""
+        with self._lock:
+            position = self._positions.get(user_id)
+            if position is None:
+                return
+            if 'role' in fields:
+                self._set_role(position, fields['role'])
+            if 'selected_group' in fields:
+                self._set_group(position, fields['selected_group'])
+            if 'notifications_enabled' in fields:
+                self._set_flag(position, NOTIFICATIONS, fields['notifications_enabled'])
+            if 'is_banned' in fields:
+                self._set_flag(position, BANNED, fields['is_banned'])
+
+    def remove(self, user_id: int) -> None:
+        """Удаление пользователя: позиция помечается пустой и выходит из группы"""
+        with self._lock:
+            position = self._positions.pop(user_id, None)
+            if position is None:
+                return
+            self.states[position] = 0
+            self._set_group(position, None)
+
+    def _table(self, role=None, notifications_enabled: bool = None, banned: bool = None) -> bytes:
+        """Таблица bytes.translate: 1 для байтов состояния, подходящих под фильтры (под блокировкой)"""
+        if role is None:
+            codes = None
+        else:
+            roles = [role] if isinstance(role, str) else role
+            codes = frozenset(self._role_codes[name] for name in roles if name in self._role_codes)
+        key = (codes, notifications_enabled, banned)
+        table = self._tables.get(key)
+        if table is None:
+            table = bytes(
+                1 if state & ALIVE
+                and (codes is None or state >> ROLE_SHIFT in codes)
+                and (notifications_enabled is None or bool(state & NOTIFICATIONS) == notifications_enabled)
+                and (banned is None or bool(state & BANNED) == banned)
+                else 0
+                for state in range(256)
+            )
+            self._tables[key] = table
+        return table
+
+    def _group_positions(self, group: str) -> List[int]:
+        """Позиции участников группы в порядке добавления (под блокировкой)"""
+        return sorted(self._members.get(self._group_ids.get(group, -1), ()))
+
+    def select(self, role: Union[str, List[str]] = None, group: str = None,
+               notifications_enabled: bool = None, banned: bool = None) -> List[int]:
+        """
+        id пользователей, подходящих под все заданные фильтры, в порядке добавления.
+        role - одна роль или список ролей; None у фильтра - без ограничения
+        """
+        with self._lock:
+            table = self._table(role, notifications_enabled, banned)
+            if group is not None:
+                ids, states = self.ids, self.states
+                return [ids[position] for position in self._group_positions(group) if table[states[position]]]
+            return list(compress(self.ids, self.states.translate(table)))
+
+    def count(self, role: Union[str, List[str]] = None, group: str = None,
+              notifications_enabled: bool = None, banned: bool = None) -> int:
+        """Число пользователей, подходящих под фильтры select"""
+        with self._lock:
+            table = self._table(role, notifications_enabled, banned)
+            if group is not None:
+                states = self.states
+                return sum(table[states[position]] for position in self._group_positions(group))
+            return self.states.translate(table).count(1)
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._positions
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._positions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Число пользователей и память массивов, индексов по id и группам и справочника групп"""
+        with self._lock:
+            arrays_bytes = sum(values.itemsize * len(values) for values in (self.ids, self.groups)) + len(self.states)
+            # Словарь позиций со своими int-ключами и позиции участников групп
+            index_bytes = (sys.getsizeof(self._positions) + sum(sys.getsizeof(user_id) for user_id in self._positions)
+                           + sum(members.itemsize * len(members) for members in self._members.values()))
+            groups_bytes = sum(sys.getsizeof(name) for name in self.group_names if name)
+            alive_roles = {state >> ROLE_SHIFT for state in set(self.states) if state & ALIVE}
+            return {
+                'users': len(self._positions),
+                'positions': len(self.ids),
+                'roles': len(alive_roles),
+                'groups': len([members for members in self._members.values() if members]),
+                'arrays_kb': round(arrays_bytes / 1024, 1),
+                'index_kb': round(index_bytes / 1024, 1),
+                'total_kb': round((arrays_bytes + index_bytes + groups_bytes) / 1024, 1)
+            }
@@ -0,0 +1,53 @@
+"""
+Микробенчмарк GCRALimiter: python -m tests.bench_rate_limiter
+
+Сравнивает стоимость запроса с прежним способом (список datetime на пользователя,
+пересобираемый на каждый запрос) и показывает время очистки устаревших ключей.
+"""
+
+import random
+import sys
+import time
+from datetime import datetime
+
+from bot.utils.rate_limiter import GCRALimiter
+
+USERS = 200_000
+HITS = 1_000_000
+
+
+def bench_gcra(sequence: list) -> GCRALimiter:
+    limiter = GCRALimiter(rate=5, period=1.0, sweep_interval=1.0)
+    start = time.perf_counter()
+    limited = sum(1 for user_id in sequence if limiter.hit(user_id))
+    elapsed = time.perf_counter() - start
+    dict_kb = sys.getsizeof(limiter._tats) / 1024
+    print(f"GCRA: {len(sequence)} запросов от {USERS} пользователей: {elapsed / len(sequence) * 1e9:.0f} нс на запрос, "
+          f"ограничено {limited}, ключей {len(limiter)}, словарь {dict_kb:.0f} КБ, очисток {limiter.sweeps}")
+    return limiter
+
+
+def bench_datetime_lists(sequence: list) -> None:
+    history = {}
+    start = time.perf_counter()
+    for user_id in sequence:
+        now = datetime.now()
+        requests = [request for request in history.get(user_id, []) if (now - request).total_seconds() <= 1]
+        if len(requests) < 5:
+            requests.append(now)
+        history[user_id] = requests
+    print(f"Список datetime: {(time.perf_counter() - start) / len(sequence) * 1e9:.0f} нс на запрос")
+
+
+def bench_sweep(limiter: GCRALimiter) -> None:
+    start = time.perf_counter()
+    removed = limiter.sweep(time.monotonic() + 2)
+    print(f"Очистка {removed} ключей за {(time.perf_counter() - start) * 1000:.1f} мс, осталось {len(limiter)}")
+
+
+if __name__ == "__main__":
+    user_ids = [random.randrange(10**6, 7 * 10**9) for _ in range(USERS)]
+    sequence = [random.choice(user_ids) for _ in range(HITS)]
+    limiter = bench_gcra(sequence)
+    bench_datetime_lists(sequence[:200_000])
+    bench_sweep(limiter)
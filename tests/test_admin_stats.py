@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+import pytest
+
+from bot.database.sqlite_db2 import SQLiteDatabase
+from bot.utils.admin_stats import format_stats_text, format_users_text
+
+
+@pytest.fixture(params=[False, True], ids=['one-file', 'users-file'])
+def db(request, tmp_path):
+    users_path = str(tmp_path / 'users.db') if request.param else None
+    database = SQLiteDatabase(str(tmp_path / 'stats.db'), users_path)
+    # (user_id, роль, группа, уведомления, бан)
+    users = [
+        (1, 'Студент', 'ГРУППА-1', 1, 0),
+        (2, 'student', 'ГРУППА-1', 0, 0),
+        (3, 'Студент', 'ГРУППА-2', 1, 1),
+        (4, 'Преподаватель', None, 1, 0),
+        (5, 'teacher', None, 0, 0),
+        (6, 'Гость', None, 1, 0),
+    ]
+    for user_id, role, group, notifications, banned in users:
+        database.create_user(user_id, role=role)
+        database.update_user_settings(user_id, selected_group=group, notifications_enabled=notifications)
+        if banned:
+            database.update_user(user_id, is_banned=1)
+    database.flush_user_writes()
+    yield database
+    database.close()
+
+
+def test_stats_panel(db):
+    text = format_stats_text(db.get_user_stats(), timedelta(days=2, hours=3, minutes=4), 12, 34)
+
+    assert "• Дней: 2\n   • Часов: 3\n   • Минут: 4" in text
+    assert "• Всего: 6\n" in text
+    assert "• Студентов: 3\n" in text
+    assert "• Преподавателей: 2\n" in text
+    assert "• С уведомлениями: 4\n" in text
+    assert "• Заблокированных: 1\n" in text
+    assert text.endswith("• Групп: 12\n   • Преподавателей: 34")
+
+
+def test_users_panel(db):
+    text = format_users_text(db.get_user_stats())
+
+    assert "• ГРУППА-1: 2 чел.\n• ГРУППА-2: 1 чел.\n" in text
+    assert "• Всего пользователей: 6\n" in text
+    assert "• Студентов: 3\n" in text
+    assert "• Преподавателей: 2\n" in text
+    assert "• Количество групп: 2\n" in text
+
+
+def test_panels_follow_user_changes(db):
+    db.update_user_settings(2, selected_group='ГРУППА-2')
+    db.update_user(5, role='Студент')
+    db.update_user_settings(5, selected_group='ГРУППА-3')
+    db.delete_user(1)
+    db.flush_user_writes()
+
+    text = format_users_text(db.get_user_stats())
+
+    assert "• ГРУППА-2: 2 чел.\n• ГРУППА-3: 1 чел.\n" in text
+    assert "ГРУППА-1" not in text
+    assert "• Студентов: 3\n" in text
+    assert "• Преподавателей: 1\n" in text
+    assert "• Всего пользователей: 5\n" in text
+
+
+def test_counters_match_rebuild(db):
+    db.update_user(4, is_banned=1)
+    db.update_user_settings(6, notifications_enabled=0)
+    db.flush_user_writes()
+    counters = db.get_user_stats()
+
+    db.rebuild_user_stats()
+
+    assert db.get_user_stats() == counters
+    assert format_stats_text(counters, timedelta(0), 0, 0) == format_stats_text(db.get_user_stats(), timedelta(0), 0, 0)
+
+
+def test_empty_database(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / 'empty.db'))
+    try:
+        text = format_users_text(database.get_user_stats())
+    finally:
+        database.close()
+    assert "• Всего пользователей: 0\n" in text
+    assert "• Количество групп: 0\n" in text
@@ -0,0 +1,83 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from bot.database.migrations import SCHEMA_VERSION
+from bot.database.sqlite_db2 import SQLiteDatabase
+
+# База из репозитория в формате до миграций (PRAGMA user_version = 0). Тесты работают с копией
+SHIPPED_DB = Path(__file__).resolve().parent.parent / "bot" / "database" / "bot_new.db"
+
+
+def table_names(path):
+    conn = sqlite3.connect(f"{Path(path).as_uri()}?mode=ro", uri=True)
+    try:
+        return {name: kind for name, kind in conn.execute("SELECT name, type FROM sqlite_master")}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def legacy_path(tmp_path):
+    path = tmp_path / "legacy.db"
+    shutil.copy(SHIPPED_DB, path)
+    conn = sqlite3.connect(path)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        lessons = conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+    finally:
+        conn.close()
+    if version != 0:
+        pytest.skip("база из репозитория уже переведена на новую схему")
+    return str(path), lessons
+
+
+def test_new_database_gets_latest_version(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "new.db"))
+    try:
+        assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        db.close()
+    tables = table_names(tmp_path / "new.db")
+    assert tables['schedule'] == 'view'
+    assert tables['user_stats'] == 'table'
+
+
+def test_legacy_database_is_migrated(legacy_path):
+    path, lessons = legacy_path
+    db = SQLiteDatabase(path)
+    try:
+        assert db.conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert db.execute_query("SELECT COUNT(*) AS count FROM schedule")[0]['count'] == lessons
+        assert db.get_user_stats()['total'] == db.count_users()
+    finally:
+        db.close()
+
+    tables = table_names(path)
+    assert tables['schedule'] == 'view'
+    assert {'lessons', 'disciplines', 'classrooms', 'schedule_generations'} <= tables.keys()
+
+    # Повторное открытие не применяет миграции заново
+    db = SQLiteDatabase(path)
+    try:
+        assert db.execute_query("SELECT COUNT(*) AS count FROM lessons")[0]['count'] == lessons
+    finally:
+        db.close()
+
+
+def test_user_tables_move_to_users_file(legacy_path, tmp_path):
+    path, _ = legacy_path
+    users_path = str(tmp_path / "users.db")
+    db = SQLiteDatabase(path, users_path)
+    try:
+        users = db.count_users()
+        assert db.get_user_stats()['total'] == users
+    finally:
+        db.close()
+
+    assert not {'users', 'user_settings', 'user_stats'} & table_names(path).keys()
+    assert {'users', 'user_settings', 'user_stats'} <= table_names(users_path).keys()
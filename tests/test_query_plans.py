@@ -0,0 +1,186 @@
+"""
+Планы выполнения горячих запросов к SQLite (EXPLAIN QUERY PLAN) на временной базе.
+
+Запрос не должен сортировать во временном B-дереве и просматривать таблицу целиком.
+Полный просмотр разрешен только запросам из FULL_SCANS - выгрузкам всей таблицы, -
+и только тем шагом плана, который там записан.
+"""
+
+import ast
+from pathlib import Path
+
+import pytest
+
+from bot.database.sqlite_db2 import SQLiteDatabase
+
+ADAPTER_PATH = Path(__file__).resolve().parent.parent / "bot" / "database" / "db_adapter.py"
+
+
+def _reload_schedule_store(db):
+    db.reload_schedule_store()
+    db.schedule_store = None
+
+
+def _reload_user_directory(db):
+    db.reload_user_directory()
+    db.user_directory = None
+
+
+# Горячие методы чтения: снимок расписания и справочник пользователей отключены,
+# поэтому все выборки идут в SQLite
+HOT_READS = [
+    ('reload_schedule_store', _reload_schedule_store),
+    ('reload_user_directory', _reload_user_directory),
+    ('get_user', lambda db: db.get_user(1)),
+    ('schedule_by_group', lambda db: db.get_schedule_by_group('ГРУППА')),
+    ('schedule_by_group_date', lambda db: db.get_schedule_by_group('ГРУППА', date='17-июнь')),
+    ('schedule_by_group_weekday', lambda db: db.get_schedule_by_group('ГРУППА', weekday=1)),
+    ('schedule_by_teacher', lambda db: db.get_schedule_by_teacher('Преподаватель')),
+    ('schedule_by_teacher_date', lambda db: db.get_schedule_by_teacher('Преподаватель', date='17-июнь')),
+    ('schedule_by_teacher_weekday', lambda db: db.get_schedule_by_teacher('Преподаватель', weekday=1)),
+    ('has_schedule_group', lambda db: db.has_schedule(group_name='ГРУППА')),
+    ('has_schedule_teacher', lambda db: db.has_schedule(teacher_name='Преподаватель')),
+    ('get_full_schedule', lambda db: db.get_full_schedule()),
+    ('get_schedule_dates', lambda db: db.get_schedule_dates()),
+    ('get_all_groups', lambda db: db.get_all_groups()),
+    ('get_all_teachers', lambda db: db.get_all_teachers()),
+    ('get_schedule_fingerprints', lambda db: db.get_schedule_fingerprints()),
+    ('users_page', lambda db: db.get_users_page(0, 100)),
+    ('users_page_notifications', lambda db: db.get_users_page(
+        0, 100, ['role', 'selected_group'], notifications_enabled=True)),
+    ('users_page_group', lambda db: db.get_users_page(0, 100, ['user_id'], group='ГРУППА')),
+    ('count_users', lambda db: db.count_users()),
+    ('count_users_notifications', lambda db: db.count_users(notifications_enabled=True)),
+    ('count_users_banned', lambda db: db.count_users(banned=True)),
+    ('get_user_stats', lambda db: db.get_user_stats()),
+]
+
+# Разрешенные полные просмотры: запрос -> шаги плана SCAN
+FULL_SCANS = {
+    # Снимок расписания и выгрузки всего расписания читают покрывающий индекс по дням
+    'reload_schedule_store': {'SCAN l USING INDEX idx_lessons_day_cover'},
+    'get_full_schedule': {'SCAN l USING COVERING INDEX idx_lessons_day_cover'},
+    'get_schedule_dates': {'SCAN l USING COVERING INDEX idx_lessons_day_cover'},
+    'get_all_groups': {'SCAN groups USING COVERING INDEX sqlite_autoindex_groups_1'},
+    'get_all_teachers': {'SCAN teachers USING COVERING INDEX sqlite_autoindex_teachers_1'},
+    'get_schedule_fingerprints': {'SCAN schedule_fingerprints'},
+    # Подсчеты без справочника в памяти - запасной путь, обычно count_users отвечает из памяти
+    'count_users': {'SCAN u'},
+    'count_users_notifications': {'SCAN us'},
+    'count_users_banned': {'SCAN u'},
+    # Счетчики по сочетаниям роль/группа/уведомления/бан - сотни строк
+    'get_user_stats': {'SCAN user_stats'},
+    # Выгрузки всех пользователей из db_adapter
+    'db_adapter.get_all_users': {'SCAN u'},
+    'db_adapter.get_banned_users': {'SCAN u'},
+}
+
+
+def adapter_selects():
+    """Статические SELECT из db_adapter.py: (имя метода, запрос)"""
+    tree = ast.parse(ADAPTER_PATH.read_text(encoding='utf-8'))
+    statements = []
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for node in ast.walk(function):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                text = node.value.strip()
+                if text.upper().startswith('SELECT') and 'FROM' in text.upper():
+                    statements.append((f"db_adapter.{function.name}", text))
+    return statements
+
+
+ADAPTER_SELECTS = adapter_selects()
+
+
+class Tracer:
+    """Запись запросов, выполненных соединениями базы"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+
+    def selects(self):
+        return [query for query in self.queries if query.lstrip().upper().startswith('SELECT')]
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['one-file', 'users-file'])
+def plans_db(request, tmp_path_factory):
+    """Пустая база по schema.sql с трассировкой всех соединений"""
+    directory = tmp_path_factory.mktemp('plans')
+    users_path = str(directory / 'users.db') if request.param else None
+    db = SQLiteDatabase(str(directory / 'plans.db'), users_path)
+    db.execute_query("ANALYZE")
+    db.schedule_store = None
+    db.user_directory = None
+
+    tracer = Tracer()
+    create_read_connection = db._create_read_connection
+
+    def create_traced_connection():
+        conn = create_read_connection()
+        conn.set_trace_callback(tracer)
+        return conn
+
+    db._create_read_connection = create_traced_connection
+    for conn in [db.conn, db.users_conn, *db._read_pool.queue]:
+        if conn is not None:
+            conn.set_trace_callback(tracer)
+
+    yield db, tracer
+    db.close()
+
+
+def explain(db, query):
+    """План выполнения запроса; параметры подставляются как NULL"""
+    conn = db._create_read_connection()
+    try:
+        conn.set_trace_callback(None)
+        params = (None,) * query.count('?')
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    finally:
+        conn.close()
+
+
+def assert_plans(db, name, queries):
+    """Нет сортировок во временном B-дереве и просмотров, кроме разрешенных для запроса"""
+    allowed = FULL_SCANS.get(name, set())
+    scans = set()
+    for query in queries:
+        plan = explain(db, query)
+        scans.update(step for step in plan if step.startswith('SCAN'))
+        problems = [
+            step for step in plan
+            if 'USE TEMP B-TREE' in step or (step.startswith('SCAN') and step not in allowed)
+        ]
+        assert not problems, f"{name}: {' '.join(query.split())}\n" + "\n".join(plan)
+    # Разрешение, которое больше не нужно, убирается из FULL_SCANS
+    assert allowed <= scans, f"{name}: в плане нет разрешенного просмотра {allowed - scans}"
+
+
+def test_import_does_not_open_working_database():
+    assert SQLiteDatabase._instance is None
+
+
+@pytest.mark.parametrize('name, call', HOT_READS, ids=[name for name, _ in HOT_READS])
+def test_hot_read_plans(plans_db, name, call):
+    db, tracer = plans_db
+    tracer.queries.clear()
+    call(db)
+    queries = tracer.selects()
+    assert queries, f"{name}: запросов к SQLite не было"
+    assert_plans(db, name, queries)
+
+
+@pytest.mark.parametrize('name, query', ADAPTER_SELECTS, ids=[name for name, _ in ADAPTER_SELECTS])
+def test_adapter_query_plans(plans_db, name, query):
+    db, _ = plans_db
+    assert_plans(db, name, [query])
+
+
+def test_full_scans_are_known_queries():
+    known = {name for name, _ in HOT_READS} | {name for name, _ in ADAPTER_SELECTS}
+    assert set(FULL_SCANS) <= known
@@ -0,0 +1,101 @@
+import random
+import time
+
+import pytest
+
+from bot.utils.rate_limiter import GCRALimiter
+
+
+def test_burst_then_limited():
+    limiter = GCRALimiter(rate=5, period=1.0)
+    assert [limiter.hit(1, now=100.0) for _ in range(5)] == [0] * 5
+    # Шестой запрос той же секунды ждет один интервал
+    assert limiter.hit(1, now=100.0) == pytest.approx(0.2)
+
+
+def test_custom_burst():
+    limiter = GCRALimiter(rate=1, period=1.0, burst=3)
+    assert [limiter.hit('key', now=0.0) == 0 for _ in range(4)] == [True, True, True, False]
+    assert limiter.get_stats()['burst'] == 3
+
+
+def test_refill_one_request_per_interval():
+    limiter = GCRALimiter(rate=5, period=1.0)
+    for _ in range(5):
+        limiter.hit(1, now=100.0)
+    assert limiter.hit(1, now=100.1) == pytest.approx(0.1)
+    assert limiter.hit(1, now=100.2) == 0
+    assert limiter.hit(1, now=100.2) > 0
+
+
+def test_full_refill_after_period():
+    limiter = GCRALimiter(rate=5, period=1.0)
+    for _ in range(5):
+        limiter.hit(1, now=100.0)
+    assert [limiter.hit(1, now=101.0) for _ in range(5)] == [0] * 5
+    assert limiter.hit(1, now=101.0) > 0
+
+
+def test_limited_request_is_not_counted():
+    limiter = GCRALimiter(rate=5, period=1.0)
+    for _ in range(5):
+        limiter.hit(1, now=100.0)
+    # Отклоненные запросы не отодвигают следующий разрешенный
+    for _ in range(10):
+        assert limiter.hit(1, now=100.0) > 0
+    assert limiter.hit(1, now=100.2) == 0
+
+
+def test_keys_are_independent():
+    limiter = GCRALimiter(rate=1, period=1.0)
+    assert limiter.hit(1, now=0.0) == 0
+    assert limiter.hit(1, now=0.0) > 0
+    assert limiter.hit(2, now=0.0) == 0
+    assert limiter.hit(None, now=0.0) == 0
+
+
+def test_sweep_keeps_active_keys():
+    limiter = GCRALimiter(rate=5, period=1.0)
+    for _ in range(5):
+        limiter.hit(1, now=100.0)
+    limiter.hit(2, now=99.0)
+
+    assert limiter.sweep(100.0) == 1
+    assert len(limiter) == 1
+    # Ключ с непустой корзиной остался - ограничение не потеряно
+    assert limiter.hit(1, now=100.0) > 0
+
+
+def test_sweep_does_not_change_decisions():
+    swept = GCRALimiter(rate=1, period=1.0, sweep_interval=0.05)
+    reference = GCRALimiter(rate=1, period=1.0, sweep_interval=float('inf'), sweep_size=10**9)
+    rng = random.Random(7)
+    # Время очистки отсчитывается от time.monotonic() при создании
+    now = time.monotonic()
+    limited = 0
+    for _ in range(20_000):
+        now += rng.expovariate(50)
+        user_id = rng.randrange(50)
+        allowed = swept.hit(user_id, now=now) == 0
+        assert allowed == (reference.hit(user_id, now=now) == 0)
+        limited += not allowed
+    assert limited > 0
+    assert swept.sweeps > 0
+    assert len(swept) < len(reference)
+
+
+def test_sweep_by_size():
+    limiter = GCRALimiter(rate=1, period=1.0, sweep_interval=float('inf'), sweep_size=4)
+    for user_id in range(3):
+        limiter.hit(user_id, now=0.0)
+    # Четвертый ключ достигает порога: ключи первых трех еще активны и остаются
+    limiter.hit(3, now=0.5)
+    assert limiter.sweeps == 1
+    assert len(limiter) == 4
+    assert limiter.sweep_size == 8
+
+
+@pytest.mark.parametrize('rate, period', [(0, 1.0), (5, 0), (-1, 1.0)])
+def test_invalid_arguments(rate, period):
+    with pytest.raises(ValueError):
+        GCRALimiter(rate=rate, period=period)
@@ -0,0 +1,197 @@
+import pytest
+
+from bot.database.sqlite_db2 import SQLiteDatabase
+
+
+def lesson(number, discipline, teacher, classroom='101', subgroup='0'):
+    return {'number': number, 'discipline': discipline, 'teacher': teacher,
+            'classroom': classroom, 'subgroup': subgroup}
+
+
+SCHEDULE = {
+    '16-июнь': {
+        'ГРУППА-1': [lesson(1, 'Математика', 'Иванов И.И.'), lesson(2, 'Физика', 'Петров П.П.')],
+        'ГРУППА-2': [lesson(1, 'Химия', 'Сидоров С.С.', '202')],
+    },
+    '17-июнь': {
+        'ГРУППА-1': [lesson(3, 'История', 'Иванов И.И.', subgroup='1')],
+    },
+}
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / 'schedule.db'))
+    yield database
+    database.close()
+
+
+def publish(db, schedule, fingerprints=None):
+    groups = sorted({group for groups in schedule.values() for group in groups})
+    teachers = sorted({item['teacher'] for groups in schedule.values()
+                       for lessons in groups.values() for item in lessons})
+    return db.publish_schedule(schedule, groups, teachers, fingerprints)
+
+
+def lesson_ids(db):
+    rows = db.execute_query("SELECT schedule_id, date, group_name, lesson_number, discipline FROM schedule")
+    return {(row['date'], row['group_name'], row['lesson_number']): (row['schedule_id'], row['discipline'])
+            for row in rows}
+
+
+def test_publish_builds_schedule(db):
+    counts = publish(db, SCHEDULE, {'page': 'hash'})
+
+    assert counts['lessons'] == 4
+    assert counts['inserted'] == 4
+    assert db.get_all_groups() == ['ГРУППА-1', 'ГРУППА-2']
+    assert db.get_full_schedule() == SCHEDULE
+    assert db.get_schedule_fingerprints() == {'page': 'hash'}
+    assert [row['discipline'] for row in db.get_schedule_by_teacher('Иванов И.И.')] == ['Математика', 'История']
+
+
+def test_republish_keeps_ids(db):
+    publish(db, SCHEDULE)
+    before = lesson_ids(db)
+
+    counts = publish(db, SCHEDULE)
+
+    assert counts['unchanged'] == 4
+    assert counts['inserted'] == counts['updated'] == counts['deleted'] == 0
+    assert lesson_ids(db) == before
+
+
+def test_changed_lesson_keeps_id_and_new_lessons_follow(db):
+    publish(db, SCHEDULE)
+    before = lesson_ids(db)
+    changed = {date: {group: list(lessons) for group, lessons in groups.items()} for date, groups in SCHEDULE.items()}
+    changed['16-июнь']['ГРУППА-2'] = [lesson(1, 'Биология', 'Новиков Н.Н.', '202')]
+    changed['17-июнь']['ГРУППА-2'] = [lesson(2, 'Химия', 'Сидоров С.С.')]
+
+    counts = publish(db, changed)
+    after = lesson_ids(db)
+
+    assert (counts['inserted'], counts['updated'], counts['deleted']) == (1, 1, 0)
+    key = ('16-июнь', 'ГРУППА-2', 1)
+    assert after[key] == (before[key][0], 'Биология')
+    assert after[('17-июнь', 'ГРУППА-2', 2)][0] > max(schedule_id for schedule_id, _ in before.values())
+
+
+def test_rollback_restores_previous_generation(db):
+    assert db.rollback_schedule() is False
+
+    publish(db, SCHEDULE, {'page': 'first'})
+    smaller = {'16-июнь': SCHEDULE['16-июнь']}
+    publish(db, smaller, {'page': 'second'})
+    assert len(lesson_ids(db)) == 3
+
+    assert db.rollback_schedule() is True
+    assert db.get_full_schedule() == SCHEDULE
+    # Отпечатки сброшены, чтобы следующая проверка сайта опубликовала актуальное расписание
+    assert db.get_schedule_fingerprints() == {}
+    assert db.publish_stats['rollbacks'] == 1
+
+    # Повторный откат возвращает последнее опубликованное поколение
+    assert db.rollback_schedule() is True
+    assert db.get_full_schedule() == smaller
+
+
+def test_lock_hold_is_recorded(db):
+    publish(db, SCHEDULE)
+    publish(db, SCHEDULE)
+    db.rollback_schedule()
+
+    rows = db.execute_query("SELECT action, build_ms, lock_hold_ms FROM schedule_generations ORDER BY id")
+    assert [row['action'] for row in rows] == ['publish', 'publish', 'rollback']
+    assert all(row['lock_hold_ms'] is not None and row['lock_hold_ms'] > 0 for row in rows)
+    assert all(row['build_ms'] is not None for row in rows[:2])
+    assert db.publish_stats['max_lock_hold_ms'] >= db.publish_stats['lock_hold_ms'] > 0
+
+
+def snapshot_tables(db):
+    rows = db.execute_query("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%staging'") or []
+    return [row['name'] for row in rows]
+
+
+def test_staging_is_built_before_the_swap(db):
+    publish(db, SCHEDULE)
+    transactions = []
+    transaction = db.transaction
+
+    def recording_transaction(name, *args, **kwargs):
+        transactions.append(name)
+        return transaction(name, *args, **kwargs)
+
+    db.transaction = recording_transaction
+    publish(db, SCHEDULE)
+    del db.transaction
+
+    # Каждая теневая таблица собирается своей транзакцией, затем одна транзакция переключения
+    assert transactions == ['publish_schedule_staging'] * 5 + ['publish_schedule']
+    assert snapshot_tables(db) == []
+    rows = db.execute_query("SELECT name FROM sqlite_master WHERE tbl_name = 'lessons' AND type = 'index'")
+    indexes = {row['name'] for row in rows}
+    assert indexes == {'idx_lessons_g2_date', 'idx_lessons_g2_group_cover', 'idx_lessons_g2_teacher_cover', 'idx_lessons_g2_day_cover'}
+
+
+def test_failed_staging_keeps_published_schedule(db, monkeypatch):
+    publish(db, SCHEDULE, {'page': 'first'})
+    write_staging_table = db._write_staging_table
+
+    def failing_write(cursor, table, *args):
+        if table == 'lessons':
+            raise RuntimeError("сбой сборки")
+        return write_staging_table(cursor, table, *args)
+
+    monkeypatch.setattr(db, '_write_staging_table', failing_write)
+    with pytest.raises(RuntimeError):
+        publish(db, {'16-июнь': SCHEDULE['16-июнь']}, {'page': 'second'})
+
+    assert db.get_full_schedule() == SCHEDULE
+    assert db.get_schedule_fingerprints() == {'page': 'first'}
+    monkeypatch.undo()
+
+    smaller = {'16-июнь': SCHEDULE['16-июнь']}
+    publish(db, smaller, {'page': 'second'})
+    assert db.get_full_schedule() == smaller
+    assert snapshot_tables(db) == []
+    assert db.rollback_schedule() is True
+    assert db.get_full_schedule() == SCHEDULE
+
+
+def test_only_changes_are_written(db):
+    publish(db, SCHEDULE)
+    db.execute_query("UPDATE lessons SET created_at = '2000-01-01 00:00:00', updated_at = '2000-01-01 00:00:00'")
+    db.execute_query("UPDATE groups SET course = 3 WHERE group_name = 'ГРУППА-1'")
+    writes = []
+    write_staging_table = db._write_staging_table
+
+    def recording_write(cursor, table, changes, generation):
+        writes.append((table, {kind: len(rows) for kind, rows in changes.items()}))
+        return write_staging_table(cursor, table, changes, generation)
+
+    db._write_staging_table = recording_write
+    changed = {date: dict(groups) for date, groups in SCHEDULE.items()}
+    changed['16-июнь']['ГРУППА-2'] = [lesson(1, 'Химия', 'Сидоров С.С.', '305')]
+    del changed['17-июнь']
+    publish(db, changed)
+    del db._write_staging_table
+
+    assert dict(writes) == {
+        'groups': {'deleted': 0, 'inserted': 0},
+        'teachers': {'deleted': 0, 'inserted': 0},
+        'disciplines': {'deleted': 1, 'inserted': 0},
+        'classrooms': {'deleted': 1, 'inserted': 1},
+        'lessons': {'deleted': 1, 'updated': 1, 'inserted': 0},
+    }
+    rows = db.execute_query(
+        "SELECT group_name, classroom, created_at, updated_at FROM schedule ORDER BY group_name, lesson_number"
+    )
+    # Неизменившиеся пары скопированы как есть, у измененной обновлена только отметка изменения
+    assert [(row['group_name'], row['classroom'], row['created_at'], row['updated_at'] == '2000-01-01 00:00:00')
+            for row in rows] == [
+        ('ГРУППА-1', '101', '2000-01-01 00:00:00', True),
+        ('ГРУППА-1', '101', '2000-01-01 00:00:00', True),
+        ('ГРУППА-2', '305', '2000-01-01 00:00:00', False),
+    ]
+    assert db.execute_query("SELECT course FROM groups WHERE group_name = 'ГРУППА-1'")[0]['course'] == 3
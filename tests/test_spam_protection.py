@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+USER_ID = 42
+
+
+@pytest.fixture(scope='module')
+def spam(tmp_path_factory):
+    """Модуль spam_protection; экземпляр БД - временный файл, а не bot/database/bot_new.db"""
+    pytest.importorskip('aiogram')
+    pytest.importorskip('cachetools')
+    pytest.importorskip('dotenv')
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv('BOT_TOKEN', '123456:test')
+
+    from bot.database.sqlite_db2 import SQLiteDatabase
+    if SQLiteDatabase._instance is None:
+        SQLiteDatabase._instance = SQLiteDatabase(str(tmp_path_factory.mktemp('spam') / 'bot.db'))
+
+    from bot.middleware import spam_protection
+    yield spam_protection
+    monkeypatch.undo()
+
+
+class Database:
+    """Запросы к БД запрещены, если middleware получил user_context"""
+
+    def __init__(self, banned=(False, None)):
+        self.banned = banned
+        self.calls = []
+
+    async def is_user_banned(self, user_id):
+        self.calls.append(('is_user_banned', user_id))
+        return self.banned
+
+    async def ban_user(self, user_id, reason):
+        self.calls.append(('ban_user', user_id))
+
+    async def unban_user(self, user_id):
+        self.calls.append(('unban_user', user_id))
+
+
+def user_context(spam, banned=False, reason=None):
+    from bot.middleware.user_context import UserContext
+    row = {
+        'user_id': USER_ID, 'username': 'student', 'first_name': None, 'last_name': None,
+        'role': 'Студент', 'selected_group': 'ГРУППА', 'selected_teacher': None,
+        'notifications_enabled': 1, 'is_banned': int(banned), 'ban_reason': reason
+    }
+    return UserContext(USER_ID, row)
+
+
+def run(middleware, data, text='Расписание'):
+    answers, handled = [], []
+
+    async def answer(message_text, **kwargs):
+        answers.append(message_text)
+
+    async def handler(event, data):
+        handled.append(data.get('user_context'))
+        return 'ok'
+
+    event = SimpleNamespace(from_user=SimpleNamespace(id=USER_ID), text=text, answer=answer)
+    result = asyncio.run(middleware(handler, event, data))
+    return result, handled, answers
+
+
+def test_banned_user_from_context(spam, monkeypatch):
+    database = Database()
+    monkeypatch.setattr(spam, 'db', database)
+    middleware = spam.SpamProtection()
+
+    result, handled, answers = run(middleware, {'user_context': user_context(spam, banned=True, reason='флуд')})
+
+    assert result is None and handled == []
+    assert 'Причина: флуд' in answers[0]
+    assert database.calls == []
+
+
+def test_allowed_user_from_context(spam, monkeypatch):
+    database = Database(banned=(True, 'не должен читаться'))
+    monkeypatch.setattr(spam, 'db', database)
+    context = user_context(spam)
+
+    result, handled, answers = run(spam.SpamProtection(), {'user_context': context})
+
+    assert result == 'ok' and handled == [context] and answers == []
+    assert database.calls == []
+
+
+def test_unban_in_database_clears_memory_ban(spam, monkeypatch):
+    monkeypatch.setattr(spam, 'db', Database())
+    middleware = spam.SpamProtection()
+    asyncio.run(middleware.ban_user(USER_ID, reason='спам'))
+
+    result, _, _ = run(middleware, {'user_context': user_context(spam, banned=True, reason='спам')})
+    assert result is None
+
+    # Администратор снял бан: следующий загруженный пользователь не забанен
+    result, handled, _ = run(middleware, {'user_context': user_context(spam)})
+    assert result == 'ok' and len(handled) == 1
+    assert USER_ID not in middleware.banned_users
+
+
+def test_without_context_reads_database(spam, monkeypatch):
+    database = Database(banned=(True, 'из БД'))
+    monkeypatch.setattr(spam, 'db', database)
+
+    result, _, answers = run(spam.SpamProtection(), {})
+
+    assert result is None
+    assert 'Причина: из БД' in answers[0]
+    assert database.calls == [('is_user_banned', USER_ID)]
+
+
+def test_message_limit_warns(spam, monkeypatch):
+    monkeypatch.setattr(spam, 'db', Database())
+    middleware = spam.SpamProtection()
+    data = {'user_context': user_context(spam)}
+
+    results = [run(middleware, data)[0] for _ in range(middleware.message_limit)]
+    result, _, answers = run(middleware, data)
+
+    assert results == ['ok'] * middleware.message_limit
+    assert result is None
+    assert answers[0].startswith('⚠️ Предупреждение')
@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+
+from bot.database.sqlite_db2 import SQLiteDatabase
+from bot.database.user_writes import UserWriteQueue
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / 'users.db'))
+    # Длинное окно группировки: пачку записывает только flush()
+    database.user_writes = UserWriteQueue(database, delay=60)
+    yield database
+    database.close()
+
+
+def stored_user(db, user_id):
+    rows = db.execute_query(
+        """
+        SELECT u.role, u.is_banned, us.selected_group, us.notifications_enabled
+        FROM users u LEFT JOIN user_settings us ON u.user_id = us.user_id
+        WHERE u.user_id = ?
+        """,
+        (user_id,)
+    )
+    return rows[0] if rows else None
+
+
+@pytest.fixture
+def blocked_writer(db):
+    """Блокировка записи удерживается тестом: фоновый поток ждет ее с пачкой в работе"""
+    lock = db._lock('users')
+    lock.acquire()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            lock.release()
+
+    yield release
+    release()
+
+
+def wait_in_flight(queue, user_id):
+    # Пачка забрана фоновым потоком, когда изменения пользователя ушли из ожидающих
+    for _ in range(1000):
+        with queue._cond:
+            if user_id in queue._in_flight:
+                return
+        threading.Event().wait(0.001)
+    raise AssertionError("пачка не передана на запись")
+
+
+def test_changes_are_coalesced_into_one_batch(db):
+    db.create_user(1, username='first', role='Студент')
+    db.update_user_settings(1, selected_group='ГРУППА-1')
+    db.update_user_settings(1, selected_group='ГРУППА-2', notifications_enabled=0)
+    db.create_user(2, role='Преподаватель')
+    db.update_user(2, is_banned=1)
+
+    assert stored_user(db, 1) is None
+    assert db.flush_user_writes()
+
+    stats = db.user_writes.get_stats()
+    assert (stats['enqueued'], stats['batches'], stats['written'], stats['failures'], stats['pending']) == (5, 1, 2, 0, 0)
+    assert stored_user(db, 1) == {'role': 'Студент', 'is_banned': 0, 'selected_group': 'ГРУППА-2', 'notifications_enabled': 0}
+    assert stored_user(db, 2)['is_banned'] == 1
+
+
+def test_get_user_overlays_pending_changes(db):
+    db.create_user(1, username='first', role='Студент')
+    db.update_user_settings(1, selected_group='ГРУППА-1')
+
+    user = db.get_user(1)
+    assert (user['username'], user['role'], user['selected_group'], user['notifications_enabled']) == \
+        ('first', 'Студент', 'ГРУППА-1', 1)
+
+    db.flush_user_writes()
+    db.update_user(1, role='Преподаватель')
+    user = db.get_user(1)
+    assert (user['role'], user['selected_group']) == ('Преподаватель', 'ГРУППА-1')
+    assert stored_user(db, 1)['role'] == 'Студент'
+
+
+def test_get_user_overlays_batch_in_flight(db, blocked_writer):
+    db.create_user(1, role='Студент')
+    db.update_user_settings(1, selected_group='ГРУППА-1')
+    flushed = threading.Thread(target=db.flush_user_writes)
+    flushed.start()
+    wait_in_flight(db.user_writes, 1)
+
+    # Новое изменение ждет следующей пачки и накладывается поверх записываемой
+    db.update_user_settings(1, selected_group='ГРУППА-2')
+    assert [change.settings for change in db.user_writes.pending_for(1)] == [
+        {'selected_group': 'ГРУППА-1'}, {'selected_group': 'ГРУППА-2'}
+    ]
+    assert db.get_user(1)['selected_group'] == 'ГРУППА-2'
+
+    blocked_writer()
+    flushed.join(5)
+    assert db.flush_user_writes(timeout=5)
+    assert stored_user(db, 1)['selected_group'] == 'ГРУППА-2'
+    assert db.user_writes.get_stats()['batches'] == 2
+
+
+def test_flush_timeout(db, blocked_writer):
+    db.create_user(1, role='Студент')
+
+    assert db.flush_user_writes(timeout=0.05) is False
+    assert db.user_writes.get_stats()['pending'] == 1
+
+    blocked_writer()
+    assert db.flush_user_writes(timeout=5) is True
+    assert db.user_writes.get_stats()['pending'] == 0
+    assert stored_user(db, 1)['role'] == 'Студент'
+
+
+def test_failed_batch_is_retried_per_user(db):
+    db.create_user(1, role='Студент')
+    db.create_user(2, role='Студент')
+    # Несуществующая колонка: пачка целиком не записывается
+    db.user_writes.put(3, create=(None, None, None, 'Студент'), user={'no_such_column': 1})
+    db.create_user(4, role='Преподаватель')
+
+    assert db.flush_user_writes()
+
+    stats = db.user_writes.get_stats()
+    assert (stats['batches'], stats['written'], stats['failures']) == (1, 3, 1)
+    assert [user_id for user_id in (1, 2, 3, 4) if stored_user(db, user_id)] == [1, 2, 4]
+    assert db.get_user_stats()['total'] == 3
+
+
+def test_writes_after_close_are_immediate(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / 'closed.db'))
+    database.user_writes.close()
+    try:
+        database.create_user(1, role='Студент')
+        assert stored_user(database, 1)['role'] == 'Студент'
+        assert database.user_writes.get_stats()['written'] == 1
+    finally:
+        database.close()